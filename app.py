@@ -6,8 +6,11 @@ import re
 from datetime import datetime
 import io
 import json
+import logging
 import sys
 import os
+import shutil
+import tempfile
 
 # Adicionar o diretório src ao path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
@@ -15,6 +18,15 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 # Importar módulos locais
 from config import *
 from utils import *
+from cliente import EsajClient
+from cache import CacheResultados
+from checkpoint import gerar_id_lote
+from concorrencia import DisjuntorCircuito, LimitadorAdaptativo, LimitadorTaxa
+from exportacao import PARQUET_DISPONIVEL, ExportadorResultados
+from jobs import GerenciadorJobs, Job
+from lote import estimar_total_cpfs, processar_consultas
+from metricas import METRICAS, iniciar_servidor_metricas
+from monitoramento import SnapshotProcessos
 
 # Configuração da página
 st.set_page_config(
@@ -64,131 +76,481 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def processar_consultas(cpfs_validos, cpfs_invalidos, delay_consulta, mostrar_detalhes):
-    """Processa as consultas de CPF no e-SAJ"""
-    resultados_encontrados = []
-    resultados_nao_encontrados = []
+@st.cache_resource
+def obter_cliente_esaj():
+    """Cliente HTTP com pool de conexões compartilhado entre lotes e reruns"""
+    return EsajClient(pool_size=ESAJ_CONFIG["pool_size"])
+
+@st.cache_resource
+def obter_cache_resultados():
+    """Cache persistente de resultados compartilhado entre sessões"""
+    return CacheResultados()
+
+@st.cache_resource
+def obter_snapshot_processos():
+    """Snapshot dos processos por CPF do modo de monitoramento, compartilhado entre sessões"""
+    return SnapshotProcessos()
+
+@st.cache_resource
+def obter_gerenciador_jobs():
+    """Executor de lotes em segundo plano compartilhado entre reruns e sessões"""
+    return GerenciadorJobs()
+
+def hash_upload(uploaded_file):
+    """Hash do conteúdo do arquivo enviado, calculado uma única vez por upload da sessão"""
+    hashes = st.session_state.setdefault('hashes_upload', {})
+    if uploaded_file.file_id not in hashes:
+        # Apenas o upload atual: um arquivo substituído não é mais consultado
+        hashes.clear()
+        hashes[uploaded_file.file_id] = gerar_id_lote(uploaded_file)
+    return hashes[uploaded_file.file_id]
+
+@st.cache_data(max_entries=FILE_CONFIG["uploads_em_cache"], ttl=FILE_CONFIG["ttl_uploads_min"] * 60,
+               show_spinner="🔍 Validando CPFs...")
+def processar_upload(_uploaded_file, hash_conteudo):
+    """
+    CSV lido e validado uma vez por conteúdo
     
-    # Configurar logging
-    configurar_logging()
+    A chave é apenas `hash_conteudo` (o arquivo não entra no hash do cache):
+    reruns e outras sessões que enviam o mesmo arquivo recebem os DataFrames
+    prontos. `max_entries` e `ttl` limitam a memória com vários usuários.
+    """
+    _uploaded_file.seek(0)
+    return processar_csv(_uploaded_file)
+
+@st.cache_resource
+def iniciar_endpoint_metricas():
+    """Endpoint /metrics (Prometheus) do processo, se configurado"""
+    if not METRICAS_CONFIG["porta_prometheus"]:
+        return None
+    try:
+        return iniciar_servidor_metricas()
+    except OSError as e:
+        logging.getLogger(__name__).warning(f"⚠️ Endpoint de métricas indisponível: {e}")
+        return None
+
+def executar_job_lote(job, cpfs_validos, cpfs_invalidos, limitador, workers, cliente, cache, id_lote,
+                      arquivo_temporario=None, monitor=None):
+    """Corpo do job em segundo plano: executa o lote e guarda o necessário para exibir os resultados"""
+    disjuntor = DisjuntorCircuito()
+    # As linhas vão para disco à medida que cada CPF termina; o job guarda apenas os caminhos
+    exportador = ExportadorResultados(os.path.join(FILE_CONFIG["diretorio_resultados"], job.id),
+                                      monitoramento=monitor is not None)
+    job.contexto['limitador'] = limitador
+    job.contexto['disjuntor'] = disjuntor
+    job.contexto['exportador'] = exportador
+    job.registrar_limpeza(exportador.remover)
+    if isinstance(cpfs_invalidos, LeitorCsvEmBlocos):
+        # O CSV temporário de inválidos é oferecido para download até o job sair do histórico
+        job.registrar_limpeza(cpfs_invalidos.remover_invalidos)
+    try:
+        _, _, _, estatisticas_cache = processar_consultas(
+            cpfs_validos, workers=workers, cliente=cliente, cache=cache, id_lote=id_lote,
+            ao_concluir=job.registrar_progresso, limitador=limitador, disjuntor=disjuntor,
+            exportador=exportador, monitor=monitor
+        )
+    finally:
+        exportador.fechar()
+        if arquivo_temporario is not None:
+            os.remove(arquivo_temporario)
+    
+    if PARQUET_DISPONIVEL and exportador.contagens['encontrados']:
+        exportador.gerar_parquet()
+    if METRICAS_CONFIG["arquivo_json"]:
+        METRICAS.gravar_json(METRICAS_CONFIG["arquivo_json"])
+    return {
+        'exportador': exportador,
+        'cpfs_invalidos': cpfs_invalidos,
+        'estatisticas_cache': estatisticas_cache
+    }
+
+def submeter_lote(descricao, cpfs_validos, cpfs_invalidos, delay_consulta, workers, usar_cache,
+                  taxa_adaptativa, id_lote, arquivo_temporario=None, monitorar=False):
+    """Submete o lote ao executor em segundo plano e associa o job à sessão"""
+    if taxa_adaptativa:
+        # O intervalo escolhido vira a taxa inicial; o controlador ajusta a partir dela
+        limitador = LimitadorAdaptativo(1 / delay_consulta if delay_consulta > 0 else None)
+    else:
+        limitador = LimitadorTaxa.por_intervalo(delay_consulta)
     
-    # Barra de progresso
-    total_cpfs = len(cpfs_validos)
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+    job = obter_gerenciador_jobs().submeter(
+        descricao,
+        estimar_total_cpfs(cpfs_validos),
+        executar_job_lote,
+        cpfs_validos, cpfs_invalidos, limitador, workers,
+        obter_cliente_esaj(),
+        obter_cache_resultados() if usar_cache else None,
+        id_lote,
+        arquivo_temporario=arquivo_temporario,
+        monitor=obter_snapshot_processos() if monitorar else None
+    )
+    st.session_state['job_id'] = job.id
+    return job
+
+def iniciar_lote(uploaded_file, cpfs_validos, cpfs_invalidos, delay_consulta, workers, usar_cache,
+                 taxa_adaptativa=False, monitorar=False):
+    """Inicia o lote do arquivo enviado"""
+    arquivo_temporario = None
+    if isinstance(cpfs_validos, LeitorCsvEmBlocos):
+        # A thread do job lê de uma cópia em disco, sem disputar o arquivo enviado com os reruns
+        descritor, arquivo_temporario = tempfile.mkstemp(prefix="upload_", suffix=".csv")
+        with os.fdopen(descritor, 'wb') as destino:
+            uploaded_file.seek(0)
+            shutil.copyfileobj(uploaded_file, destino)
+        cpfs_validos = cpfs_invalidos = LeitorCsvEmBlocos(arquivo_temporario)
     
-    for contador, (idx, row) in enumerate(cpfs_validos.iterrows(), 1):
-        cpf = row['cpf']
-        nome = row['nome']
-        
-        # Atualizar barra de progresso
-        progress = contador / total_cpfs
-        progress_bar.progress(progress)
-        status_text.text(f"Processando {contador}/{total_cpfs}: {nome} ({cpf})")
-        
-        # Consultar e-SAJ
-        resultado = consultar_esaj(cpf, nome)
-        
-        if resultado['sucesso'] and resultado['encontrado']:
-            resultados_encontrados.append({
-                'cpf': cpf,
-                'nome': nome,
-                'nome_extraido': resultado['nome_extraido'],
-                'processos': resultado['processos'],
-                'total_processos': resultado['total_processos'],
-                'data_consulta': datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-            })
-            
-            if mostrar_detalhes:
-                st.success(f"✅ {nome} ({cpf}): {resultado['total_processos']} processos encontrados")
-        else:
-            resultados_nao_encontrados.append({
-                'cpf': cpf,
-                'nome': nome,
-                'data_consulta': datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-            })
-            
-            if mostrar_detalhes:
-                st.info(f"ℹ️ {nome} ({cpf}): Não encontrado")
-        
-        # Delay entre consultas
-        if delay_consulta > 0:
-            time.sleep(delay_consulta)
+    return submeter_lote(
+        f"{uploaded_file.name} ({datetime.now().strftime('%d/%m/%Y %H:%M')})",
+        cpfs_validos, cpfs_invalidos, delay_consulta, workers, usar_cache, taxa_adaptativa,
+        hash_upload(uploaded_file), arquivo_temporario, monitorar
+    )
+
+def reconsultar_erros(job, delay_consulta, workers, usar_cache, taxa_adaptativa=False, monitorar=False):
+    """Inicia um novo lote apenas com os CPFs que terminaram em erro"""
+    erros = pd.read_csv(job.resultado['exportador'].caminhos['erros'], dtype=str, encoding='utf-8-sig',
+                        usecols=['cpf', 'nome'])
+    return submeter_lote(
+        f"Erros de {job.descricao}",
+        erros, pd.DataFrame(columns=['cpf', 'nome']), delay_consulta, workers, usar_cache, taxa_adaptativa,
+        None, monitorar=monitorar
+    )
+
+@st.fragment(run_every=JOBS_CONFIG["intervalo_atualizacao"])
+def acompanhar_job(job_id, mostrar_detalhes):
+    """Atualiza periodicamente o progresso de um job em andamento"""
+    job = obter_gerenciador_jobs().obter(job_id)
+    if job is None:
+        return
     
-    # Limpar barra de progresso
-    progress_bar.empty()
-    status_text.empty()
+    # Ao terminar, recarregar a página inteira para exibir os resultados fora do fragmento
+    if not job.ativo:
+        st.rerun()
     
-    return resultados_encontrados, resultados_nao_encontrados
+    st.subheader(f"⏳ {job.descricao}")
+    status = "Na fila" if job.status == Job.PENDENTE else f"Processando {job.concluidos}/{job.total}"
+    st.progress(job.progresso, text=status)
+    
+    # O fragmento redesenha tudo a cada `intervalo_atualizacao`, não a cada CPF
+    if job.status == Job.EXECUTANDO:
+        vazao = job.vazao
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("🚀 Vazão", f"{vazao:.2f} CPFs/s" if vazao is not None else "-",
+                      help=f"Média dos últimos {JOBS_CONFIG['janela_vazao']}s")
+        with col2:
+            st.metric("⏱️ Tempo restante", formatar_duracao(job.segundos_restantes))
+        with col3:
+            st.metric("⌛ Decorrido", formatar_duracao(time.time() - job.iniciado_em))
+    
+    disjuntor = job.contexto.get('disjuntor')
+    if disjuntor is not None and disjuntor.estado != DisjuntorCircuito.FECHADO:
+        st.warning(f"🔴 e-SAJ indisponível: lote pausado, nova tentativa em {disjuntor.segundos_para_reabrir:.0f}s")
+    
+    limitador = job.contexto.get('limitador')
+    if isinstance(limitador, LimitadorAdaptativo):
+        p95 = limitador.latencia_p95
+        st.caption(
+            f"⚡ Taxa atual: {limitador.taxa:.2f} req/s"
+            f" · p95: {f'{p95:.2f}s' if p95 is not None else '-'}"
+            f" · reduções: {limitador.reducoes}"
+        )
+    
+    if st.button("⏹️ Cancelar lote", key=f"cancelar_{job.id}"):
+        job.cancelar()
+    
+    # Resultados parciais, lidos dos arquivos que o lote está gravando
+    exportador = job.contexto.get('exportador')
+    if exportador is not None and st.checkbox("📥 Baixar resultados parciais", key=f"parcial_{job.id}"):
+        rotulos = {'encontrados': "Encontrados", 'nao_encontrados': "Não Encontrados",
+                   'alteracoes': "Alterações", 'erros': "Erros"}
+        for coluna, tipo in zip(st.columns(len(exportador.tipos)), exportador.tipos):
+            if tipo == 'alteracoes':
+                linhas = exportador.contagens['novos'] + exportador.contagens['removidos']
+            else:
+                linhas = exportador.contagens[tipo]
+            with coluna:
+                st.download_button(
+                    label=f"📥 {rotulos[tipo]} ({linhas})",
+                    data=exportador.conteudo(tipo),
+                    file_name=f"parcial_{os.path.basename(exportador.caminhos[tipo])}",
+                    mime="text/csv",
+                    key=f"parcial_{tipo}_{job.id}"
+                )
+    
+    if mostrar_detalhes:
+        # Um único elemento rolável com as últimas consultas, do mais recente ao mais antigo
+        linhas = []
+        for evento in reversed(list(job.eventos)):
+            origem = " (cache)" if evento['cache'] else ""
+            if evento['erro']:
+                linhas.append(f"🚫 {evento['nome']} ({evento['cpf']}): Erro na consulta")
+            elif evento['encontrado']:
+                linhas.append(f"✅ {evento['nome']} ({evento['cpf']}): {evento['total_processos']} processos encontrados{origem}")
+            else:
+                linhas.append(f"ℹ️ {evento['nome']} ({evento['cpf']}): Não encontrado{origem}")
+        if linhas:
+            st.caption(f"📜 Últimas {len(linhas)} consultas")
+            with st.container(height=JOBS_CONFIG["altura_eventos"]):
+                st.text("\n".join(linhas))
 
-def mostrar_resultados(resultados_encontrados, resultados_nao_encontrados, cpfs_invalidos):
-    """Mostra os resultados das consultas"""
+def mostrar_job(job, mostrar_detalhes, parametros_lote):
+    """Mostra o estado de um job: progresso, resultados ou erro"""
+    if job.ativo:
+        acompanhar_job(job.id, mostrar_detalhes)
+    elif job.status == Job.CONCLUIDO:
+        st.subheader(f"📊 {job.descricao}")
+        resultado = job.resultado
+        mostrar_resultados(resultado['exportador'], resultado['cpfs_invalidos'], resultado['estatisticas_cache'])
+        total_erros = resultado['exportador'].contagens['erros']
+        if total_erros and st.button(f"🔁 Consultar novamente os {total_erros} CPFs com erro"):
+            reconsultar_erros(job, **parametros_lote)
+            st.rerun()
+        mostrar_estatisticas_conexao(obter_cliente_esaj())
+        mostrar_metricas(METRICAS)
+    elif job.status == Job.CANCELADO:
+        st.warning(f"⏹️ Lote cancelado após {job.concluidos} CPFs. Inicie novamente o mesmo arquivo para continuar de onde parou.")
+    else:
+        st.error(f"❌ Erro ao processar o lote: {job.erro}")
+
+def mostrar_lotes_recentes(gerenciador, job_atual_id):
+    """Lista os lotes conhecidos pelo executor, inclusive de outras sessões"""
+    jobs = [job for job in gerenciador.listar() if job.id != job_atual_id]
+    if not jobs:
+        return
+    
+    with st.expander(f"📚 Lotes recentes ({len(jobs)})"):
+        for job in jobs:
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.write(f"**{job.descricao}** — {job.status} ({job.concluidos}/{job.total})")
+            with col2:
+                if st.button("Abrir", key=f"abrir_{job.id}"):
+                    st.session_state['job_id'] = job.id
+                    st.rerun()
+
+def mostrar_resultados(exportador, cpfs_invalidos, estatisticas_cache=None):
+    """Mostra os resultados das consultas, lidos dos arquivos gravados durante o lote"""
+    
+    # Na leitura em blocos os CPFs inválidos ficam em um CSV em disco
+    leitura_em_blocos = isinstance(cpfs_invalidos, LeitorCsvEmBlocos)
+    total_invalidos = cpfs_invalidos.total_invalidos if leitura_em_blocos else len(cpfs_invalidos)
+    contagens = exportador.contagens
     
     # Métricas
-    col1, col2, col3, col4 = st.columns(4)
+    col1, col2, col3, col4, col5, col6 = st.columns(6)
     
     with col1:
-        st.metric("✅ Encontrados", len(resultados_encontrados))
+        st.metric("✅ Encontrados", contagens['encontrados'])
     
     with col2:
-        st.metric("❌ Não Encontrados", len(resultados_nao_encontrados))
+        st.metric("❌ Não Encontrados", contagens['nao_encontrados'])
     
     with col3:
-        st.metric("⚠️ CPFs Inválidos", len(cpfs_invalidos))
+        st.metric("⚠️ CPFs Inválidos", total_invalidos)
     
     with col4:
-        total_processos = sum(r.get('total_processos', 0) for r in resultados_encontrados)
-        st.metric("📋 Total Processos", total_processos)
+        st.metric("📋 Total Processos", contagens['processos'])
+    
+    with col5:
+        if estatisticas_cache:
+            st.metric(
+                "♻️ Cache",
+                f"{estatisticas_cache['taxa_acerto']:.0%}",
+                help=(f"{estatisticas_cache['acertos']} de {estatisticas_cache['consultas']} CPFs atendidos pelo cache; "
+                      f"{estatisticas_cache.get('duplicados', 0)} linhas repetidas e "
+                      f"{estatisticas_cache.get('compartilhadas', 0)} consultas compartilhadas com outros lotes "
+                      f"sem nova requisição")
+            )
+    
+    with col6:
+        st.metric(
+            "🚫 Erros",
+            contagens['erros'],
+            help=(f"{estatisticas_cache.get('retentativas', 0)} novas tentativas, "
+                  f"{estatisticas_cache.get('pausas_circuito', 0)} pausas por indisponibilidade")
+            if estatisticas_cache else None
+        )
+    
+    # Modo de monitoramento: apenas os processos que mudaram desde a execução anterior
+    if exportador.monitoramento:
+        mostrar_alteracoes(exportador)
     
     # Resultados encontrados
-    if resultados_encontrados:
-        st.success(f"✅ {len(resultados_encontrados)} CPFs com processos encontrados!")
+    elif contagens['encontrados']:
+        st.success(f"✅ {contagens['encontrados']} CPFs com processos encontrados!")
         
-        # Reformatar dados para CSV
-        df_encontrados_reformatado = reformatar_dados_para_csv(resultados_encontrados)
+        # Download direto do arquivo gravado durante o lote
+        with open(exportador.caminhos['encontrados'], 'rb') as arquivo:
+            st.download_button(
+                label="📥 Download CSV - Encontrados",
+                data=arquivo,
+                file_name=os.path.basename(exportador.caminhos['encontrados']),
+                mime="text/csv"
+            )
         
-        # Download CSV encontrados
-        csv_encontrados = df_encontrados_reformatado.to_csv(index=False, encoding='utf-8-sig')
-        st.download_button(
-            label="📥 Download CSV - Encontrados",
-            data=csv_encontrados,
-            file_name=f"cpfs_encontrados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv"
-        )
+        # Versão colunar tipada para análises (requer pyarrow)
+        if 'encontrados_parquet' in exportador.caminhos:
+            with open(exportador.caminhos['encontrados_parquet'], 'rb') as arquivo:
+                st.download_button(
+                    label="📥 Download Parquet - Encontrados",
+                    data=arquivo,
+                    file_name=os.path.basename(exportador.caminhos['encontrados_parquet']),
+                    mime="application/vnd.apache.parquet",
+                    help="Colunas tipadas e comprimidas: carregamento muito mais rápido que o CSV em ferramentas de análise"
+                )
         
         # Mostrar preview dos dados
         st.subheader("📊 Preview dos Dados Encontrados")
-        st.dataframe(df_encontrados_reformatado, use_container_width=True)
+        mostrar_previa(exportador, 'encontrados', contagens['processos'])
     
     # Resultados não encontrados
-    if resultados_nao_encontrados:
-        st.warning(f"⚠️ {len(resultados_nao_encontrados)} CPFs não encontrados")
-        
-        # Criar DataFrame para não encontrados
-        df_nao_encontrados = pd.DataFrame(resultados_nao_encontrados)
+    if contagens['nao_encontrados'] and not exportador.monitoramento:
+        st.warning(f"⚠️ {contagens['nao_encontrados']} CPFs não encontrados")
         
-        # Download CSV não encontrados
-        csv_nao_encontrados = df_nao_encontrados.to_csv(index=False, encoding='utf-8-sig')
-        st.download_button(
-            label="📥 Download CSV - Não Encontrados",
-            data=csv_nao_encontrados,
-            file_name=f"cpfs_nao_encontrados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv"
-        )
+        with open(exportador.caminhos['nao_encontrados'], 'rb') as arquivo:
+            st.download_button(
+                label="📥 Download CSV - Não Encontrados",
+                data=arquivo,
+                file_name=os.path.basename(exportador.caminhos['nao_encontrados']),
+                mime="text/csv"
+            )
         
         # Mostrar lista de não encontrados
         st.subheader("📋 CPFs Não Encontrados")
-        st.dataframe(df_nao_encontrados, use_container_width=True)
+        mostrar_previa(exportador, 'nao_encontrados', contagens['nao_encontrados'])
+    
+    # Falhas de consulta (timeout, erro de rede, HTTP): não significam "não encontrado"
+    if contagens['erros']:
+        st.error(f"🚫 {contagens['erros']} CPFs não puderam ser consultados")
+        
+        with open(exportador.caminhos['erros'], 'rb') as arquivo:
+            st.download_button(
+                label="📥 Download CSV - Erros",
+                data=arquivo,
+                file_name=os.path.basename(exportador.caminhos['erros']),
+                mime="text/csv",
+                help="O arquivo pode ser enviado novamente para repetir apenas estas consultas"
+            )
+        mostrar_previa(exportador, 'erros', contagens['erros'])
     
     # CPFs inválidos
-    if len(cpfs_invalidos) > 0:
+    if total_invalidos > 0 and leitura_em_blocos:
+        st.error(f"❌ {total_invalidos} CPFs inválidos encontrados")
+        with open(cpfs_invalidos.caminho_invalidos, 'rb') as arquivo_invalidos:
+            st.download_button(
+                label="📥 Download CSV - Inválidos",
+                data=arquivo_invalidos,
+                file_name=gerar_nome_arquivo("invalidos"),
+                mime="text/csv"
+            )
+    elif total_invalidos > 0:
         st.error(f"❌ {len(cpfs_invalidos)} CPFs inválidos encontrados")
         cpfs_invalidos_lista = cpfs_invalidos['cpf'].astype(str).tolist()
         st.write(f"**CPFs inválidos:** {', '.join(cpfs_invalidos_lista)}")
 
+def mostrar_alteracoes(exportador):
+    """Mostra os processos novos e removidos do lote de monitoramento"""
+    contagens = exportador.contagens
+    total = contagens['novos'] + contagens['removidos']
+    if not total:
+        st.info("🔔 Nenhuma alteração nos processos desde a última consulta destes CPFs")
+        return
+    
+    st.success(f"🔔 {contagens['novos']} processos novos e {contagens['removidos']} removidos desde a última consulta")
+    with open(exportador.caminhos['alteracoes'], 'rb') as arquivo:
+        st.download_button(
+            label="📥 Download CSV - Alterações",
+            data=arquivo,
+            file_name=os.path.basename(exportador.caminhos['alteracoes']),
+            mime="text/csv"
+        )
+    st.subheader("📊 Preview das Alterações")
+    mostrar_previa(exportador, 'alteracoes', total)
+
+def mostrar_previa(exportador, tipo, total_linhas):
+    """Mostra as primeiras linhas de um arquivo de resultados sem carregá-lo inteiro"""
+    limite = FILE_CONFIG["linhas_previa"]
+    st.dataframe(exportador.previa(tipo, limite), use_container_width=True)
+    if total_linhas > limite:
+        st.caption(f"Exibindo as primeiras {limite} de {total_linhas} linhas; o arquivo completo está no download.")
+
+def mostrar_estatisticas_conexao(cliente):
+    """Mostra tempos das requisições HTTP e o ganho do pool de conexões"""
+    estatisticas = cliente.estatisticas()
+    if estatisticas['total_requisicoes'] == 0:
+        return
+    
+    with st.expander("🔌 Conexões HTTP"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Requisições", estatisticas['total_requisicoes'])
+            st.metric("Sem resposta", estatisticas['requisicoes_falhas'],
+                      help="Falhas de DNS, conexão ou timeout; já incluídas nas requisições")
+            st.metric("Conexões abertas", estatisticas['conexoes_abertas'])
+        with col2:
+            st.metric("Tempo médio (conexão nova)", f"{estatisticas['tempo_medio_conexao_nova']:.3f}s")
+            st.metric("Tempo médio (conexão reutilizada)", f"{estatisticas['tempo_medio_conexao_reutilizada']:.3f}s")
+        with col3:
+            st.metric("Handshake evitado por requisição", f"{estatisticas['economia_estimada_por_requisicao']:.3f}s")
+        if estatisticas['leituras_interrompidas']:
+            st.caption(f"Leitura parcial: {estatisticas['leituras_interrompidas']} páginas sem processos "
+                       f"interrompidas, {estatisticas['bytes_evitados'] / 2 ** 20:.1f} MB não baixados "
+                       f"(~{estatisticas['tempo_economizado']:.1f}s de download); "
+                       f"{estatisticas['bytes_lidos'] / 2 ** 20:.1f} MB recebidos no total")
+
+ROTULOS_ETAPAS = {
+    "leitura_csv": "Leitura do CSV",
+    "validacao": "Validação dos CPFs",
+    "http_conexao": "Conexão HTTP (TCP+TLS)",
+    "http_primeiro_byte": "Até o primeiro byte",
+    "http_download": "Download do corpo",
+    "parse_html": "Parse do HTML",
+    "exportacao": "Gravação dos resultados",
+    "exportacao_parquet": "Geração do Parquet"
+}
+
+def mostrar_metricas(registro):
+    """Resume o tempo por etapa e os contadores acumulados no processo"""
+    etapas = registro.etapas()
+    if not etapas:
+        return
+    
+    with st.expander("⏱️ Tempo por etapa"):
+        st.caption("Acumulado de todos os lotes desde o início do servidor (p50/p95 estimados pelos buckets do histograma)")
+        em_ms = lambda valor: round(valor * 1000, 2) if valor is not None else None
+        st.dataframe(pd.DataFrame([
+            {
+                "Etapa": ROTULOS_ETAPAS.get(etapa, etapa),
+                "Medições": resumo["contagem"],
+                "Média (ms)": em_ms(resumo["media_s"]),
+                "p50 (ms)": em_ms(resumo["p50_s"]),
+                "p95 (ms)": em_ms(resumo["p95_s"]),
+                "Total (s)": round(resumo["total_s"], 2)
+            }
+            for etapa, resumo in etapas.items()
+        ]), hide_index=True, use_container_width=True)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Respostas HTTP 200", int(registro.contador("respostas_http", status=200)))
+        with col2:
+            st.metric("HTTP 429 / 5xx",
+                      int(registro.contador("respostas_http") - registro.contador("respostas_http", status=200)),
+                      help="Inclui qualquer status diferente de 200")
+        with col3:
+            st.metric("Retentativas", int(registro.contador("retentativas")))
+        with col4:
+            st.metric("Acertos de cache", int(registro.contador("cache_acertos")))
+        if METRICAS_CONFIG["porta_prometheus"]:
+            st.caption(f"📈 Prometheus: http://{METRICAS_CONFIG['endereco']}:{METRICAS_CONFIG['porta_prometheus']}/metrics")
+
 def main():
     """Função principal da aplicação"""
     
+    # Configurar logging (só tem efeito na primeira execução do processo)
+    configurar_logging()
+    iniciar_endpoint_metricas()
+    
     # Título principal
     st.markdown('<h1 class="main-header">🏛️ Revisa Consulta CPF e-SAJ</h1>', unsafe_allow_html=True)
     
@@ -205,11 +567,45 @@ def main():
         
         # Configurações de processamento
         delay_consulta = st.slider(
-            "⏱️ Delay entre consultas (segundos)",
-            min_value=0,
-            max_value=5,
-            value=2,
-            help="Tempo de espera entre cada consulta para evitar sobrecarga"
+            "⏱️ Intervalo entre requisições (segundos)",
+            min_value=0.0,
+            max_value=float(ESAJ_CONFIG["delay_max"]),
+            value=float(ESAJ_CONFIG["delay_default"]),
+            step=0.1,
+            help="Intervalo mínimo entre o início de duas requisições, somando todos os workers (taxa global)"
+        )
+        
+        workers = st.slider(
+            "🧵 Consultas simultâneas",
+            min_value=1,
+            max_value=ESAJ_CONFIG["workers_max"],
+            value=ESAJ_CONFIG["workers_default"],
+            help="Número de consultas em andamento ao mesmo tempo, todas respeitando a mesma taxa global"
+        )
+        
+        taxa_adaptativa = st.checkbox(
+            "⚡ Taxa adaptativa",
+            value=TAXA_CONFIG["adaptativo"],
+            help="Começa no intervalo escolhido e ajusta a taxa conforme o e-SAJ responde: "
+                 "sobe enquanto as respostas estão saudáveis e reduz à metade em 429/5xx, timeout ou latência alta"
+        )
+        
+        if taxa_adaptativa:
+            st.caption(f"Taxa entre {TAXA_CONFIG['taxa_min']} e {TAXA_CONFIG['taxa_max']} requisições/s")
+        elif delay_consulta > 0:
+            st.caption(f"Taxa global: {1 / delay_consulta:.2f} requisições/s")
+        
+        usar_cache = st.checkbox(
+            "♻️ Usar cache de resultados",
+            value=CACHE_CONFIG["habilitado"],
+            help=f"Reaproveita consultas feitas nas últimas {CACHE_CONFIG['ttl_horas']} horas sem acessar o e-SAJ"
+        )
+        
+        monitorar = st.checkbox(
+            "🔔 Monitorar alterações",
+            value=False,
+            help="Compara cada CPF com a consulta anterior e gera apenas os processos novos ou removidos; "
+                 "na primeira consulta de um CPF todos os processos aparecem como novos"
         )
         
         mostrar_detalhes = st.checkbox(
@@ -218,36 +614,58 @@ def main():
             help="Exibir progresso detalhado de cada consulta"
         )
     
+    gerenciador = obter_gerenciador_jobs()
+    job_atual = gerenciador.obter(st.session_state.get('job_id', ''))
+    lote_em_andamento = job_atual is not None and job_atual.ativo
+    
     # Processamento do arquivo
     if uploaded_file is not None:
         try:
-            # Processar CSV
-            cpfs_validos, cpfs_invalidos = processar_csv(uploaded_file)
-            
-            if len(cpfs_validos) > 0:
-                st.success(f"✅ Arquivo processado: {len(cpfs_validos)} CPFs válidos encontrados")
+            if uploaded_file.size > FILE_CONFIG["max_size_mb"] * 1024 * 1024:
+                # Arquivos grandes são lidos e validados em blocos durante as consultas
+                leitor = LeitorCsvEmBlocos(uploaded_file)
+                st.info(
+                    f"📦 Arquivo grande ({uploaded_file.size / (1024 * 1024):.1f} MB): "
+                    f"leitura em blocos de {leitor.tamanho_bloco} linhas; os CPFs serão validados durante as consultas"
+                )
                 
-                # Mostrar CPFs inválidos se houver
-                if len(cpfs_invalidos) > 0:
-                    cpfs_invalidos_lista = cpfs_invalidos['cpf'].astype(str).tolist()
-                    st.warning(f"⚠️ {len(cpfs_invalidos)} CPFs inválidos encontrados: {', '.join(cpfs_invalidos_lista)}")
-                
-                # Botão para iniciar consultas
-                if st.button("🚀 Iniciar Consultas", type="primary"):
-                    with st.spinner("Processando consultas..."):
-                        resultados_encontrados, resultados_nao_encontrados = processar_consultas(
-                            cpfs_validos, cpfs_invalidos, delay_consulta, mostrar_detalhes
-                        )
-                        
-                        # Mostrar resultados
-                        mostrar_resultados(resultados_encontrados, resultados_nao_encontrados, cpfs_invalidos)
+                if st.button("🚀 Iniciar Consultas", type="primary", disabled=lote_em_andamento):
+                    job_atual = iniciar_lote(uploaded_file, leitor, leitor, delay_consulta, workers, usar_cache, taxa_adaptativa, monitorar)
             else:
-                st.error("❌ Nenhum CPF válido encontrado no arquivo")
+                # Processar CSV
+                # Reruns (slider, checkbox, botões) reaproveitam a validação do mesmo conteúdo
+                cpfs_validos, cpfs_invalidos = processar_upload(uploaded_file, hash_upload(uploaded_file))
+                
+                if len(cpfs_validos) > 0:
+                    st.success(f"✅ Arquivo processado: {len(cpfs_validos)} CPFs válidos encontrados")
+                    
+                    # Mostrar CPFs inválidos se houver
+                    if len(cpfs_invalidos) > 0:
+                        cpfs_invalidos_lista = cpfs_invalidos['cpf'].astype(str).tolist()
+                        st.warning(f"⚠️ {len(cpfs_invalidos)} CPFs inválidos encontrados: {', '.join(cpfs_invalidos_lista)}")
+                    
+                    # Botão para iniciar consultas (executadas em segundo plano)
+                    if st.button("🚀 Iniciar Consultas", type="primary", disabled=lote_em_andamento):
+                        job_atual = iniciar_lote(uploaded_file, cpfs_validos, cpfs_invalidos, delay_consulta, workers, usar_cache, taxa_adaptativa, monitorar)
+                else:
+                    st.error("❌ Nenhum CPF válido encontrado no arquivo")
                 
         except Exception as e:
             st.error(f"❌ Erro ao processar arquivo: {str(e)}")
     
-    else:
+    # Lote da sessão: continua disponível entre reruns e após o término
+    if job_atual is not None:
+        mostrar_job(job_atual, mostrar_detalhes, {
+            'delay_consulta': delay_consulta,
+            'workers': workers,
+            'usar_cache': usar_cache,
+            'taxa_adaptativa': taxa_adaptativa,
+            'monitorar': monitorar
+        })
+    
+    mostrar_lotes_recentes(gerenciador, job_atual.id if job_atual is not None else None)
+    
+    if uploaded_file is None and job_atual is None:
         # Layout em duas colunas
         col1, col2 = st.columns([1, 1])
         
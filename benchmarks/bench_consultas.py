@@ -0,0 +1,172 @@
+"""
+Benchmark ponta a ponta das consultas contra o e-SAJ falso local
+
+Sobe `ServidorEsajFalso` em outro processo, aponta `ESAJ_CONFIG` para ele e
+executa `processar_consultas` (que chama `consultar_esaj`) em cada cenário e
+número de workers, sem limite de taxa, cache ou checkpoint. Reporta CPFs/s,
+requisições/s, p50/p99 da latência das requisições, memória e os KB lidos
+e evitados pela leitura parcial das páginas sem processos (compare com
+`--sem-leitura-parcial`, principalmente no cenário `banda_limitada`).
+Com `--processos-analise N` o HTML é analisado em N processos (`EtapaAnalise`)
+em vez das threads das consultas.
+
+Uso:
+    python benchmarks/bench_consultas.py [--cpfs 300] [--workers 1 4 16] [--cenarios normal sobrecarga]
+                                         [--memoria] [--sem-leitura-parcial] [--processos-analise 4]
+                                         [--json resultados.json]
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from unittest import mock
+from urllib.request import urlopen
+
+import pandas as pd
+
+# Adicionar os diretórios src e benchmarks ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from analise import EtapaAnalise
+from cliente import EsajClient
+from concorrencia import ConsultasEmAndamento, DisjuntorCircuito, LimitadorTaxa
+from config import ESAJ_CONFIG, RETENTATIVA_CONFIG
+from lote import processar_consultas
+from servidor_esaj import iniciar_em_processo
+
+CENARIOS = {
+    "normal": {"encontrados": 0.3, "paginados": 0.05, "latencia": "lognormal:0.05:0.5"},
+    "lento": {"encontrados": 0.3, "paginados": 0.05, "latencia": "lognormal:0.05:0.5",
+              "lentos": 0.05, "atraso_lento": 1.0},
+    "sobrecarga": {"encontrados": 0.3, "paginados": 0.05, "latencia": "lognormal:0.05:0.5",
+                   "erros_429": 0.05, "erros_500": 0.02},
+    "sem_latencia": {"encontrados": 0.3, "paginados": 0.05, "latencia": "fixa:0"},
+    # Páginas do tamanho das reais (~80 KB) em um link de ~8 Mbit/s por resposta
+    "banda_limitada": {"encontrados": 0.3, "paginados": 0.05, "latencia": "lognormal:0.05:0.5",
+                       "tamanho_enfeite": 80000, "banda": 1_000_000}
+}
+
+def gerar_cpfs(quantidade: int) -> pd.DataFrame:
+    """CPFs sintéticos distintos (o servidor falso não valida dígitos)"""
+    return pd.DataFrame({
+        "cpf": [f"{i * 7919 % 10 ** 11:011d}" for i in range(1, quantidade + 1)],
+        "nome": "Fulano de Tal"
+    })
+
+def percentil(valores, fracao: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * fracao))]
+
+def contagens_servidor(url_base: str) -> dict:
+    url = url_base.rsplit("/cpopg/", 1)[0] + "/__estatisticas"
+    with urlopen(url) as resposta:
+        return json.load(resposta)
+
+def medir(cpfs: pd.DataFrame, workers: int, url_base: str, memoria: bool, analise=None) -> dict:
+    """Executa um lote e devolve as métricas"""
+    latencias = []
+
+    def ao_concluir(cpf, nome, resultado):
+        if resultado.get("tempo_requisicao") is not None:
+            latencias.append(resultado["tempo_requisicao"])
+
+    cliente = EsajClient(pool_size=max(workers, ESAJ_CONFIG["pool_size"]))
+    antes = contagens_servidor(url_base)
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        encontrados, nao_encontrados, erros, estatisticas = processar_consultas(
+            cpfs, workers=workers, cliente=cliente, limitador=LimitadorTaxa(None),
+            disjuntor=DisjuntorCircuito(limite_falhas=10 ** 6), em_andamento=ConsultasEmAndamento(),
+            ao_concluir=ao_concluir, analise=analise
+        )
+        duracao = time.perf_counter() - inicio
+    finally:
+        pico = tracemalloc.get_traced_memory()[1] if memoria else None
+        if memoria:
+            tracemalloc.stop()
+        cliente.fechar()
+    depois = contagens_servidor(url_base)
+    requisicoes = depois["requisicoes"] - antes["requisicoes"]
+    conexao = cliente.estatisticas()
+
+    return {
+        "workers": workers,
+        "cpfs": len(cpfs),
+        "duracao_s": round(duracao, 3),
+        "cpfs_por_s": round(len(cpfs) / duracao, 2),
+        "requisicoes": requisicoes,
+        "requisicoes_por_s": round(requisicoes / duracao, 2),
+        "latencia_p50_ms": round(percentil(latencias, 0.50) * 1000, 1),
+        "latencia_p99_ms": round(percentil(latencias, 0.99) * 1000, 1),
+        "encontrados": len(encontrados),
+        "nao_encontrados": len(nao_encontrados),
+        "erros": len(erros),
+        "retentativas": estatisticas["retentativas"],
+        "kb_lidos": round(conexao["bytes_lidos"] / 1024, 1),
+        "kb_evitados": round(conexao["bytes_evitados"] / 1024, 1),
+        "leituras_interrompidas": conexao["leituras_interrompidas"],
+        "tempo_economizado_s": round(conexao["tempo_economizado"], 3),
+        "pico_python_mb": round(pico / 2 ** 20, 1) if pico is not None else None,
+        # ru_maxrss é em KiB no Linux; é o máximo do processo até aqui, não por execução
+        "rss_max_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cpfs", type=int, default=300)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--cenarios", nargs="+", choices=sorted(CENARIOS), default=["normal", "sobrecarga"])
+    parser.add_argument("--espera-base", type=float, default=0.05,
+                        help="Espera base do backoff entre tentativas (padrão: %(default)ss)")
+    parser.add_argument("--memoria", action="store_true",
+                        help="Medir o pico de memória Python com tracemalloc (deixa as consultas mais lentas)")
+    parser.add_argument("--sem-leitura-parcial", action="store_true",
+                        help="Ler as páginas inteiras, mesmo as sem processos (linha de base)")
+    parser.add_argument("--processos-analise", type=int, default=0, metavar="N",
+                        help="Analisar o HTML em N processos (padrão: nas threads das consultas)")
+    parser.add_argument("--json", help="Gravar os resultados neste arquivo")
+    args = parser.parse_args()
+    # 429/500 sorteados pelo servidor gerariam uma linha de erro por requisição
+    logging.disable(logging.CRITICAL)
+
+    cpfs = gerar_cpfs(args.cpfs)
+    analise = EtapaAnalise(args.processos_analise) if args.processos_analise else None
+    resultados = []
+    print(f"{'Cenário':<13} {'Workers':>7} {'CPFs/s':>9} {'Req/s':>9} {'p50':>9} {'p99':>9} "
+          f"{'Erros':>6} {'Retent.':>7} {'Pico Py':>9} {'RSS máx':>9} {'KB lidos':>10} {'KB evit.':>9}")
+    for nome in args.cenarios:
+        processo, url_base, url_paginacao = iniciar_em_processo(**CENARIOS[nome])
+        try:
+            with mock.patch.dict(ESAJ_CONFIG, {"base_url": url_base, "url_paginacao": url_paginacao,
+                                               "leitura_parcial": not args.sem_leitura_parcial}), \
+                    mock.patch.dict(RETENTATIVA_CONFIG, {"espera_base": args.espera_base}):
+                for workers in args.workers:
+                    metricas = {"cenario": nome, **medir(cpfs, workers, url_base, args.memoria, analise)}
+                    resultados.append(metricas)
+                    pico = f"{metricas['pico_python_mb']:.1f}MB" if args.memoria else "-"
+                    print(f"{nome:<13} {workers:>7} {metricas['cpfs_por_s']:>9.1f} "
+                          f"{metricas['requisicoes_por_s']:>9.1f} {metricas['latencia_p50_ms']:>7.1f}ms "
+                          f"{metricas['latencia_p99_ms']:>7.1f}ms {metricas['erros']:>6} "
+                          f"{metricas['retentativas']:>7} {pico:>9} {metricas['rss_max_mb']:>7.1f}MB "
+                          f"{metricas['kb_lidos']:>10.0f} {metricas['kb_evitados']:>9.0f}")
+        finally:
+            processo.terminate()
+            processo.join()
+    if analise is not None:
+        analise.fechar()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark do formato de saída dos encontrados: CSV x Parquet
+
+Gera um CSV de encontrados sintético, converte para Parquet com
+`converter_para_parquet` e compara tamanho em disco e tempo de carga.
+
+Uso:
+    python benchmarks/bench_exportacao.py [--linhas 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from exportacao import COLUNAS_ENCONTRADOS, PARQUET_DISPONIVEL, converter_para_parquet
+
+def gerar_csv_encontrados(caminho: str, linhas: int, semente: int = 42):
+    """Grava um CSV no formato de `COLUNAS_ENCONTRADOS`"""
+    rng = np.random.default_rng(semente)
+    cpfs = rng.integers(0, 10 ** 11, size=linhas)
+    dias = rng.integers(0, 365 * 20, size=linhas)
+    datas = (pd.Timestamp("2005-01-01") + pd.to_timedelta(dias, unit="D")).strftime("%d/%m/%Y")
+    classes = np.array(["Precatório", "Requisição de Pequeno Valor", "Cumprimento de Sentença"])
+    pd.DataFrame({
+        "CPF": [f"{n:011d}" for n in cpfs],
+        "Nome": "Fulano de Tal",
+        "Nome_Extraido": "FULANO DE TAL",
+        "Sequencia_Processo": rng.integers(1, 20, size=linhas),
+        "Numero_Processo": [f"{n % 10 ** 7:07d}-{n % 100:02d}.2020.8.26.0100" for n in cpfs],
+        "Classe_Processo": classes[rng.integers(0, len(classes), size=linhas)],
+        "Data_Processo": datas,
+        "Data_Consulta": "01/01/2025 10:00:00"
+    }, columns=COLUNAS_ENCONTRADOS).to_csv(caminho, index=False, encoding="utf-8-sig")
+
+def medir(funcao, repeticoes: int = 3) -> float:
+    """Menor tempo de `repeticoes` execuções"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    if not PARQUET_DISPONIVEL:
+        sys.exit("pyarrow não instalado (pip install pyarrow)")
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho_csv = os.path.join(diretorio, "encontrados.csv")
+        gerar_csv_encontrados(caminho_csv, args.linhas)
+
+        inicio = time.perf_counter()
+        caminho_parquet = converter_para_parquet(caminho_csv)
+        conversao = time.perf_counter() - inicio
+
+        # Carga como a análise faria: CPF como texto, datas convertidas
+        carga_csv = medir(lambda: pd.read_csv(
+            caminho_csv, dtype={"CPF": str}, encoding="utf-8-sig"
+        ).assign(Data_Processo=lambda df: pd.to_datetime(df["Data_Processo"], format="%d/%m/%Y")))
+        carga_parquet = medir(lambda: pd.read_parquet(caminho_parquet))
+
+        tamanho_csv = os.path.getsize(caminho_csv) / 1024 ** 2
+        tamanho_parquet = os.path.getsize(caminho_parquet) / 1024 ** 2
+        print(f"Linhas:          {args.linhas}")
+        print(f"Tamanho CSV:     {tamanho_csv:.1f} MB")
+        print(f"Tamanho Parquet: {tamanho_parquet:.1f} MB ({tamanho_parquet / tamanho_csv:.0%} do CSV)")
+        print(f"Conversão:       {conversao:.2f}s")
+        print(f"Carga CSV:       {carga_csv:.2f}s")
+        print(f"Carga Parquet:   {carga_parquet:.2f}s ({carga_csv / carga_parquet:.1f}x mais rápido)")
+
+if __name__ == "__main__":
+    main()
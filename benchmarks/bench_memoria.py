@@ -0,0 +1,109 @@
+"""
+Memória dos resultados mantidos por `processar_consultas`: dicionários x registros
+
+Monta N resultados no formato antigo (um dicionário por CPF com trecho de
+HTML e um dicionário por processo) e no atual (`ConsultaResultado` e
+`Processo` com `__slots__`, sem HTML) e mede com tracemalloc a memória
+retida e o pico da conversão para o DataFrame do download.
+
+Uso:
+    python benchmarks/bench_memoria.py [--resultados 100000] [--encontrados 0.3] [--processos 3]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from registros import ConsultaResultado, Processo, colunas_encontrados
+
+HTML = "<!DOCTYPE html><html lang=\"pt-BR\"><head><meta charset=\"UTF-8\">" * 10
+
+def processos_sinteticos(rng: random.Random, quantidade: int):
+    return [{
+        "numero": f"{rng.randrange(10 ** 7):07d}-{rng.randrange(100):02d}.2020.8.26.0100",
+        "classe": "Precatório",
+        "data": f"{rng.randrange(1, 29):02d}/{rng.randrange(1, 13):02d}/2020"
+    } for _ in range(quantidade)]
+
+def resultados_dicionarios(total: int, fracao_encontrados: float, processos: int):
+    """Formato anterior: dicionários com todos os campos e o trecho de HTML"""
+    rng = random.Random(0)
+    encontrados, nao_encontrados = [], []
+    for i in range(total):
+        base = {"cpf": f"{i:011d}", "nome": f"Pessoa {i}", "data_consulta": "01/01/2025 10:00:00",
+                "html": HTML[:500] + f"{i}"}
+        if rng.random() < fracao_encontrados:
+            lista = processos_sinteticos(rng, processos)
+            encontrados.append({**base, "nome_extraido": f"PESSOA {i}", "processos": lista,
+                                "total_processos": len(lista), "paginas": 1})
+        else:
+            nao_encontrados.append(base)
+    return encontrados, nao_encontrados
+
+def resultados_registros(total: int, fracao_encontrados: float, processos: int):
+    """Formato atual: registros com `__slots__` e processos em tupla"""
+    rng = random.Random(0)
+    encontrados, nao_encontrados = [], []
+    for i in range(total):
+        if rng.random() < fracao_encontrados:
+            lista = tuple(Processo(**p) for p in processos_sinteticos(rng, processos))
+            encontrados.append(ConsultaResultado(f"{i:011d}", f"Pessoa {i}", "01/01/2025 10:00:00",
+                                                 nome_extraido=f"PESSOA {i}", processos=lista))
+        else:
+            nao_encontrados.append(ConsultaResultado(f"{i:011d}", f"Pessoa {i}", "01/01/2025 10:00:00"))
+    return encontrados, nao_encontrados
+
+def dataframe_por_linhas(encontrados) -> pd.DataFrame:
+    """Conversão anterior: um dicionário por linha do CSV"""
+    linhas = []
+    for resultado in encontrados:
+        for i, processo in enumerate(resultado["processos"], 1):
+            linhas.append({
+                "CPF": resultado["cpf"], "Nome": resultado["nome"], "Nome_Extraido": resultado["nome_extraido"],
+                "Sequencia_Processo": i, "Numero_Processo": processo["numero"],
+                "Classe_Processo": processo["classe"], "Data_Processo": processo["data"],
+                "Data_Consulta": resultado["data_consulta"]
+            })
+    return pd.DataFrame(linhas)
+
+def medir(funcao):
+    """Executa `funcao` e devolve (resultado, memória retida em MB, pico em MB, segundos)"""
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcao()
+    duracao = time.perf_counter() - inicio
+    retida, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, retida / 2 ** 20, pico / 2 ** 20, duracao
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resultados", type=int, default=100_000)
+    parser.add_argument("--encontrados", type=float, default=0.3)
+    parser.add_argument("--processos", type=int, default=3, help="Processos por CPF encontrado")
+    args = parser.parse_args()
+
+    print(f"{args.resultados} resultados, {args.encontrados:.0%} encontrados com {args.processos} processos cada\n")
+    print(f"{'Formato':<14} {'Retida':>10} {'Conversão (pico)':>18} {'Conversão (tempo)':>18}")
+    for rotulo, montar, converter in (
+        ("dicionários", resultados_dicionarios, dataframe_por_linhas),
+        ("registros", resultados_registros, lambda encontrados: pd.DataFrame(colunas_encontrados(encontrados)))
+    ):
+        (encontrados, nao_encontrados), retida, _, _ = medir(
+            lambda: montar(args.resultados, args.encontrados, args.processos)
+        )
+        _, _, pico, duracao = medir(lambda: converter(encontrados))
+        print(f"{rotulo:<14} {retida:>8.1f}MB {pico:>16.1f}MB {duracao:>17.2f}s")
+        del encontrados, nao_encontrados
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Micro-benchmark da extração de nome e processos das páginas do e-SAJ
+
+Compara o caminho original (decodificar `response.text` e rodar
+`extrair_nome_html` + `extrair_processos_html`) com o `ParserEsaj` de
+passagem única sobre os bytes.
+
+Uso:
+    python benchmarks/bench_parser.py [--processos 10 100 500] [--repeticoes 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Adicionar os diretórios src e benchmarks ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from extracao_original import extrair_nome_html, extrair_processos_html
+from paginas_esaj import gerar_pagina
+from parser_esaj import ParserEsaj
+
+def caminho_original(conteudo: bytes):
+    html = conteudo.decode("utf-8")
+    if "Processos encontrados" in html or "linkProcesso" in html:
+        return {"nome_extraido": extrair_nome_html(html), "processos": extrair_processos_html(html)}
+    return {"nome_extraido": "", "processos": []}
+
+def caminho_parser(parser: ParserEsaj, conteudo: bytes):
+    if parser.tem_processos(conteudo):
+        return parser.analisar(conteudo, "utf-8")
+    return {"nome_extraido": "", "processos": []}
+
+def medir(funcao, repeticoes: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes
+
+def main():
+    parser_args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser_args.add_argument("--processos", type=int, nargs="+", default=[0, 10, 100, 500])
+    parser_args.add_argument("--repeticoes", type=int, default=50)
+    args = parser_args.parse_args()
+
+    parser = ParserEsaj()
+    print(f"{'Processos':>10} {'Bytes':>10} {'Original':>12} {'Parser':>12} {'Ganho':>8}  Iguais")
+    for total in args.processos:
+        conteudo = gerar_pagina(total, semente=total).encode("utf-8")
+        iguais = caminho_original(conteudo) == caminho_parser(parser, conteudo)
+        tempo_original = medir(lambda: caminho_original(conteudo), args.repeticoes)
+        tempo_parser = medir(lambda: caminho_parser(parser, conteudo), args.repeticoes)
+        print(f"{total:>10} {len(conteudo):>10} {tempo_original * 1000:>10.3f}ms {tempo_parser * 1000:>10.3f}ms "
+              f"{tempo_original / tempo_parser:>7.1f}x  {'sim' if iguais else 'NÃO'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark da validação de CPFs em processar_csv
+
+Compara o caminho linha a linha original (três passadas com apply) com a
+validação vetorizada usada por processar_csv.
+
+Uso:
+    python benchmarks/bench_validacao.py [--linhas 200000]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils import normalizar_cpf, validar_cpf, validar_cpfs_vetorizado
+
+def gerar_cpfs(linhas: int, semente: int = 42) -> pd.Series:
+    """Gera CPFs aleatórios em formatos variados (com máscara, 9-12 dígitos)"""
+    rng = np.random.default_rng(semente)
+    numeros = rng.integers(0, 10 ** 11, size=linhas)
+    cpfs = pd.Series([f"{n:011d}" for n in numeros], dtype=object)
+
+    mascara = rng.random(linhas) < 0.3
+    cpfs[mascara] = cpfs[mascara].str.replace(r'(\d{3})(\d{3})(\d{3})(\d{2})', r'\1.\2.\3-\4', regex=True)
+    curtos = rng.random(linhas) < 0.1
+    cpfs[curtos] = cpfs[curtos].str.slice(2)
+    return cpfs
+
+def validar_linha_a_linha(df: pd.DataFrame) -> pd.DataFrame:
+    """Caminho original de processar_csv"""
+    df["cpf_normalizado"] = df["cpf"].apply(normalizar_cpf)
+    df["cpf_tamanho_ok"] = df["cpf"].apply(lambda x: 9 <= len(re.sub(r'\D', '', str(x))) <= 11)
+    df["cpf_valido"] = df.apply(lambda row: validar_cpf(row["cpf"]) if row["cpf_tamanho_ok"] else False, axis=1)
+    return df
+
+def validar_vetorizado(df: pd.DataFrame) -> pd.DataFrame:
+    """Caminho vetorizado atual de processar_csv"""
+    validacao = validar_cpfs_vetorizado(df["cpf"])
+    df["cpf_normalizado"] = validacao["cpf_normalizado"]
+    df["cpf_tamanho_ok"] = validacao["cpf_tamanho_ok"]
+    df["cpf_valido"] = validacao["cpf_valido"]
+    return df
+
+def medir(funcao, df: pd.DataFrame):
+    inicio = time.perf_counter()
+    resultado = funcao(df.copy())
+    return time.perf_counter() - inicio, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=200000, help="Quantidade de CPFs gerados")
+    args = parser.parse_args()
+
+    df = pd.DataFrame({"cpf": gerar_cpfs(args.linhas), "nome": "Fulano"})
+
+    tempo_antigo, antigo = medir(validar_linha_a_linha, df)
+    tempo_novo, novo = medir(validar_vetorizado, df)
+
+    iguais = (
+        antigo["cpf_normalizado"].tolist() == novo["cpf_normalizado"].tolist()
+        and antigo["cpf_tamanho_ok"].astype(bool).tolist() == novo["cpf_tamanho_ok"].tolist()
+        and antigo["cpf_valido"].astype(bool).tolist() == novo["cpf_valido"].tolist()
+    )
+
+    print(f"Linhas:            {args.linhas:,}")
+    print(f"Linha a linha:     {tempo_antigo:.3f}s ({args.linhas / tempo_antigo:,.0f} CPFs/s)")
+    print(f"Vetorizado:        {tempo_novo:.3f}s ({args.linhas / tempo_novo:,.0f} CPFs/s)")
+    print(f"Ganho:             {tempo_antigo / tempo_novo:.1f}x")
+    print(f"Resultados iguais: {'sim' if iguais else 'NÃO'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Extração original (regex sobre o texto decodificado) usada como referência
+
+Não é usada em produção: serve de linha de base para o `bench_parser.py` e
+para os testes que conferem se o `ParserEsaj` produz a mesma saída.
+"""
+import re
+from typing import Dict, List
+
+def extrair_processos_html(html: str) -> List[Dict]:
+    """
+    Extrai informações dos processos do HTML do e-SAJ
+    
+    Args:
+        html: Conteúdo HTML da resposta
+        
+    Returns:
+        Lista de dicionários com informações dos processos
+    """
+    processos = []
+    
+    # Buscar todas as seções de processo
+    processos_matches = re.findall(
+        r'<li>\s*<div id="divProcesso[^"]*"[^>]*>.*?</div>\s*</li>', 
+        html, 
+        re.DOTALL
+    )
+    
+    for processo_html in processos_matches:
+        # Extrair número do processo
+        numero_match = re.search(r'class="linkProcesso"[^>]*>\s*([^<\s]+)', processo_html)
+        numero_processo = numero_match.group(1).strip() if numero_match else ""
+        
+        # Extrair classe do processo
+        classe_match = re.search(r'<div class="classeProcesso">([^<]+)</div>', processo_html)
+        classe_processo = classe_match.group(1).strip() if classe_match else ""
+        
+        # Extrair data do recebimento
+        data_match = re.search(r'<div class="dataLocalDistribuicaoProcesso">([^<]+?)\s*-', processo_html)
+        data_processo = data_match.group(1).strip() if data_match else ""
+        
+        if numero_processo and classe_processo and data_processo:
+            processos.append({
+                "numero": numero_processo,
+                "classe": classe_processo,
+                "data": data_processo
+            })
+    
+    return processos
+
+def extrair_nome_html(html: str) -> str:
+    """
+    Extrai nome do requerente do HTML do e-SAJ
+    
+    Args:
+        html: Conteúdo HTML da resposta
+        
+    Returns:
+        Nome extraído ou string vazia
+    """
+    nome_match = re.search(r'<div class="unj-base-alt nomeParte">\s*([^<]+)', html)
+    return nome_match.group(1).strip() if nome_match else ""
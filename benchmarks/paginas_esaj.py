@@ -0,0 +1,108 @@
+"""
+Geração de páginas sintéticas no formato do e-SAJ para benchmarks
+"""
+import random
+
+CABECALHO = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="UTF-8">
+<title>e-SAJ - Consulta de Requisitórios</title>
+<link rel="stylesheet" href="/cpopg/css/saj.css">
+</head>
+<body>
+<div id="cabecalho">{enfeite}</div>
+"""
+
+RODAPE = """
+<div id="rodape">{enfeite}</div>
+</body>
+</html>
+"""
+
+NAO_ENCONTRADO = """<div id="mensagemRetorno">
+<li>Não existem informações disponíveis para os parâmetros informados.</li>
+</div>
+"""
+
+PARTE = """<div class="unj-base-alt nomeParte">
+    {nome}
+</div>
+<h2 class="subtitle">{total} Processos encontrados</h2>
+<ul class="unj-list-row">
+"""
+
+PROCESSO = """<li>
+  <div id="divProcesso{id}" class="row unj-ai-c home__lista-de-processos">
+    <div class="col-md-3">
+      <a href="/cpopg/show.do?processo.codigo={id}" class="linkProcesso">
+        {numero}
+      </a>
+    </div>
+    <div class="col-md-3">
+      <div class="classeProcesso">{classe}</div>
+      <div class="assuntoPrincipalProcesso">Precatório - Alimentar</div>
+    </div>
+    <div class="col-md-3">
+      <div class="dataLocalDistribuicaoProcesso">{data} - Foro Central - Fazenda Pública</div>
+    </div>
+  </div>
+</li>
+"""
+
+PAGINACAO = """<div class="unj-pagination">
+{links}
+</div>
+"""
+
+LINK_PAGINA = """  <a href="/cpopg/trocarPagina.do?paginaConsulta={pagina}&amp;conversationId=&amp;cbPesquisa=DOCPARTE&amp;dadosConsulta.valorConsulta={cpf}" class="unj-pagination__item">{pagina}</a>"""
+
+CLASSES = ["Precatório", "Requisição de Pequeno Valor", "Cumprimento de Sentença contra a Fazenda Pública"]
+
+def numero_processo(rng: random.Random) -> str:
+    return f"{rng.randrange(10 ** 7):07d}-{rng.randrange(100):02d}.{rng.randrange(1990, 2025)}.8.26.{rng.randrange(10 ** 4):04d}"
+
+def gerar_pagina(total_processos: int, nome: str = "FULANO DE TAL", semente: int = 0,
+                 tamanho_enfeite: int = 20000, por_pagina: int = 0, pagina: int = 1,
+                 cpf: str = "00000000000") -> str:
+    """
+    Gera uma página de resultado do e-SAJ
+
+    Args:
+        total_processos: Quantidade de processos (0 gera a página de "não encontrado")
+        nome: Nome da parte
+        semente: Semente aleatória
+        tamanho_enfeite: Caracteres de HTML irrelevante no cabeçalho e rodapé
+        por_pagina: Processos por página (0 = todos em uma página, sem paginação)
+        pagina: Página a gerar, a partir de 1
+        cpf: CPF usado nos links de paginação
+
+    Returns:
+        HTML da página
+    """
+    rng = random.Random(semente)
+    enfeite = "<span>menu</span>" * (tamanho_enfeite // 34)
+    partes = [CABECALHO.format(enfeite=enfeite)]
+    if total_processos:
+        por_pagina = por_pagina or total_processos
+        total_paginas = -(-total_processos // por_pagina)
+        inicio = (pagina - 1) * por_pagina
+        partes.append(PARTE.format(nome=nome, total=total_processos))
+        for i in range(total_processos):
+            # Sortear sempre, para que cada processo seja o mesmo em qualquer página
+            processo = PROCESSO.format(
+                id=f"1H000{i:05d}",
+                numero=numero_processo(rng),
+                classe=rng.choice(CLASSES),
+                data=f"{rng.randrange(1, 29):02d}/{rng.randrange(1, 13):02d}/{rng.randrange(1990, 2025)}"
+            )
+            if inicio <= i < inicio + por_pagina:
+                partes.append(processo)
+        partes.append("</ul>\n")
+        if total_paginas > 1:
+            links = [LINK_PAGINA.format(pagina=p, cpf=cpf) for p in range(1, total_paginas + 1) if p != pagina]
+            partes.append(PAGINACAO.format(links="\n".join(links)))
+    else:
+        partes.append(NAO_ENCONTRADO)
+    partes.append(RODAPE.format(enfeite=enfeite))
+    return "".join(partes)
@@ -0,0 +1,275 @@
+"""
+Servidor HTTP local que imita o e-SAJ para benchmarks e testes sem rede
+
+Responde em `/cpopg/search.do` e `/cpopg/trocarPagina.do` com páginas de
+`gerar_pagina`. O desfecho de cada CPF (encontrado, não encontrado, paginado)
+é sorteado a partir do próprio CPF e se repete a cada consulta; lentidão,
+429 e 500 são sorteados a cada requisição, como falhas transitórias.
+
+Uso (servidor avulso, para apontar ESAJ_CONFIG["base_url"] para ele):
+    python benchmarks/servidor_esaj.py --porta 8080 --latencia lognormal:0.05:0.5 --erros-429 0.05
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(os.path.dirname(__file__))
+
+from paginas_esaj import gerar_pagina
+
+POR_PAGINA = 25
+BLOCO_BANDA = 4096
+
+def criar_latencia(especificacao: str) -> Callable[[random.Random], float]:
+    """
+    Cria um sorteador de latência a partir de uma especificação textual
+
+    Args:
+        especificacao: "fixa:S", "uniforme:MIN:MAX", "normal:MEDIA:DESVIO",
+            "lognormal:MEDIANA:SIGMA" ou "exponencial:MEDIA" (segundos)
+
+    Returns:
+        Função que recebe um `random.Random` e devolve segundos (>= 0)
+    """
+    nome, *valores = especificacao.split(":")
+    try:
+        valores = [float(v) for v in valores]
+    except ValueError:
+        raise ValueError(f"Latência inválida: {especificacao}")
+    distribuicoes = {
+        "fixa": (1, lambda rng, s: s),
+        "uniforme": (2, lambda rng, a, b: rng.uniform(a, b)),
+        "normal": (2, lambda rng, media, desvio: rng.gauss(media, desvio)),
+        "lognormal": (2, lambda rng, mediana, sigma: rng.lognormvariate(math.log(mediana), sigma)),
+        "exponencial": (1, lambda rng, media: rng.expovariate(1 / media))
+    }
+    if nome not in distribuicoes or len(valores) != distribuicoes[nome][0]:
+        raise ValueError(f"Latência inválida: {especificacao}")
+    sortear = distribuicoes[nome][1]
+    return lambda rng: max(0.0, sortear(rng, *valores))
+
+
+class _ServidorHttp(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Conexões fechadas pelo cliente no meio da resposta são esperadas
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class ServidorEsajFalso:
+    """
+    Imitação local do e-SAJ com desfechos e latência configuráveis
+
+    Args:
+        porta: Porta TCP (0 = escolhida pelo sistema)
+        encontrados: Fração dos CPFs com processos
+        paginados: Fração dos encontrados com mais de uma página de processos
+        lentos: Fração das requisições que levam `atraso_lento` segundos a mais
+        erros_429: Fração das requisições respondidas com 429
+        erros_500: Fração das requisições respondidas com 500
+        latencia: Distribuição da latência de cada resposta (ver `criar_latencia`)
+        atraso_lento: Atraso extra das requisições lentas
+        tamanho_enfeite: HTML irrelevante por página (tamanho típico da resposta)
+        semente: Semente dos sorteios por requisição
+        banda: Bytes/s de cada resposta (None = sem limite); o corpo é enviado em
+            blocos, como em um link lento, e o cliente pode fechar a conexão no meio
+    """
+
+    def __init__(self, porta: int = 0, encontrados: float = 0.3, paginados: float = 0.05,
+                 lentos: float = 0.0, erros_429: float = 0.0, erros_500: float = 0.0,
+                 latencia: str = "fixa:0", atraso_lento: float = 2.0, tamanho_enfeite: int = 20000,
+                 semente: int = 0, banda: Optional[float] = None):
+        self.encontrados = encontrados
+        self.paginados = paginados
+        self.lentos = lentos
+        self.erros_429 = erros_429
+        self.erros_500 = erros_500
+        self.atraso_lento = atraso_lento
+        self.tamanho_enfeite = tamanho_enfeite
+        self.banda = banda
+        self._latencia = criar_latencia(latencia)
+        self._rng = random.Random(semente)
+        self._lock = threading.Lock()
+        self._contagens: Dict[str, int] = {"requisicoes": 0, "paginas": 0}
+        self._pagina = lru_cache(maxsize=4096)(self._gerar)
+
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Blocos pequenos com Nagle ligado esperariam o ACK atrasado do cliente
+            disable_nagle_algorithm = banda is not None
+
+            def do_GET(self):
+                servidor._responder(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._http = _ServidorHttp(("127.0.0.1", porta), Handler)
+        self._http.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url_base(self) -> str:
+        return f"http://127.0.0.1:{self._http.server_address[1]}/cpopg/search.do"
+
+    @property
+    def url_paginacao(self) -> str:
+        return f"http://127.0.0.1:{self._http.server_address[1]}/cpopg/trocarPagina.do"
+
+    def desfecho(self, cpf: str) -> Tuple[int, int]:
+        """
+        Desfecho fixo de um CPF
+
+        Returns:
+            Tupla (total de processos, processos por página); 0 processos = não encontrado
+        """
+        rng = random.Random(cpf)
+        if rng.random() >= self.encontrados:
+            return 0, 0
+        if rng.random() < self.paginados:
+            return rng.randint(POR_PAGINA + 1, POR_PAGINA * 5), POR_PAGINA
+        return rng.randint(1, 10), 0
+
+    def _gerar(self, cpf: str, pagina: int) -> bytes:
+        total, por_pagina = self.desfecho(cpf)
+        return gerar_pagina(total, semente=zlib.crc32(cpf.encode()), tamanho_enfeite=self.tamanho_enfeite,
+                            por_pagina=por_pagina, pagina=pagina, cpf=cpf).encode("utf-8")
+
+    def _contar(self, chave: str):
+        with self._lock:
+            self._contagens[chave] = self._contagens.get(chave, 0) + 1
+
+    def _responder(self, handler: BaseHTTPRequestHandler):
+        url = urlparse(handler.path)
+        if url.path == "/__estatisticas":
+            self._enviar(handler, 200, json.dumps(self.estatisticas()).encode("utf-8"), "application/json")
+            return
+
+        params = parse_qs(url.query)
+        cpf = params.get("dadosConsulta.valorConsulta", [""])[0]
+        pagina = int(params.get("paginaConsulta", ["1"])[0])
+        with self._lock:
+            self._contagens["requisicoes"] += 1
+            if pagina > 1:
+                self._contagens["paginas"] += 1
+            espera = self._latencia(self._rng)
+            if self._rng.random() < self.lentos:
+                espera += self.atraso_lento
+            sorteio = self._rng.random()
+
+        time.sleep(espera)
+        if sorteio < self.erros_429:
+            self._contar("status_429")
+            self._enviar(handler, 429, b"<html>Too Many Requests</html>")
+        elif sorteio < self.erros_429 + self.erros_500:
+            self._contar("status_500")
+            self._enviar(handler, 500, b"<html>Erro interno</html>")
+        else:
+            self._contar("status_200")
+            self._enviar(handler, 200, self._pagina(cpf, pagina))
+
+    def _enviar(self, handler: BaseHTTPRequestHandler, status: int, corpo: bytes,
+                tipo: str = "text/html; charset=utf-8"):
+        handler.send_response(status)
+        handler.send_header("Content-Type", tipo)
+        handler.send_header("Content-Length", str(len(corpo)))
+        handler.end_headers()
+        if not self.banda:
+            handler.wfile.write(corpo)
+            return
+        try:
+            for inicio in range(0, len(corpo), BLOCO_BANDA):
+                bloco = corpo[inicio:inicio + BLOCO_BANDA]
+                handler.wfile.write(bloco)
+                handler.wfile.flush()
+                time.sleep(len(bloco) / self.banda)
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente desistiu do restante da página (leitura parcial)
+            handler.close_connection = True
+
+    def estatisticas(self) -> Dict[str, int]:
+        """Contagem de requisições (total, páginas adicionais e por status)"""
+        with self._lock:
+            return dict(self._contagens)
+
+    def servir(self):
+        """Atende na thread atual até `parar`"""
+        self._http.serve_forever()
+
+    def iniciar(self) -> "ServidorEsajFalso":
+        """Atende em uma thread em segundo plano"""
+        self._thread = threading.Thread(target=self.servir, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._http.shutdown()
+        self._http.server_close()
+
+    def __enter__(self) -> "ServidorEsajFalso":
+        return self.iniciar()
+
+    def __exit__(self, *args):
+        self.parar()
+
+
+def _servir(opcoes: Dict, fila):
+    servidor = ServidorEsajFalso(**opcoes)
+    fila.put((servidor.url_base, servidor.url_paginacao))
+    servidor.servir()
+
+
+def iniciar_em_processo(**opcoes) -> Tuple[multiprocessing.Process, str, str]:
+    """
+    Inicia o servidor em outro processo, sem disputar o GIL com o código medido
+
+    Args:
+        **opcoes: Argumentos de `ServidorEsajFalso`
+
+    Returns:
+        Tupla (processo, url_base, url_paginacao); encerre com `processo.terminate()`.
+        As contagens ficam em `/__estatisticas` no mesmo endereço.
+    """
+    fila = multiprocessing.Queue()
+    processo = multiprocessing.Process(target=_servir, args=(opcoes, fila), daemon=True)
+    processo.start()
+    url_base, url_paginacao = fila.get(timeout=10)
+    return processo, url_base, url_paginacao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--encontrados", type=float, default=0.3)
+    parser.add_argument("--paginados", type=float, default=0.05)
+    parser.add_argument("--lentos", type=float, default=0.0)
+    parser.add_argument("--erros-429", type=float, default=0.0)
+    parser.add_argument("--erros-500", type=float, default=0.0)
+    parser.add_argument("--latencia", default="lognormal:0.05:0.5")
+    parser.add_argument("--atraso-lento", type=float, default=2.0)
+    parser.add_argument("--banda", type=float, help="Bytes/s por resposta (padrão: sem limite)")
+    args = parser.parse_args()
+
+    servidor = ServidorEsajFalso(args.porta, args.encontrados, args.paginados, args.lentos, args.erros_429,
+                                 args.erros_500, args.latencia, args.atraso_lento, banda=args.banda)
+    print(f"e-SAJ falso em {servidor.url_base} (paginação em {servidor.url_paginacao})")
+    try:
+        servidor.servir()
+    except KeyboardInterrupt:
+        servidor.parar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Análise das páginas do e-SAJ em processos separados das threads de consulta
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional
+
+from config import ANALISE_CONFIG
+from metricas import METRICAS
+from parser_esaj import ParserEsaj
+
+# Um parser por processo (o padrão usado nas threads também serve aqui)
+_PARSER = ParserEsaj()
+
+
+def analisar_pagina(conteudo: bytes, encoding: str, paginacao: bool = False) -> Dict:
+    """
+    Extrai nome, processos e, opcionalmente, a paginação de uma página
+
+    É a unidade de trabalho da etapa de análise: roda na thread da consulta
+    ou em um processo de `EtapaAnalise`, com a mesma saída.
+
+    Args:
+        conteudo: Corpo da resposta em bytes
+        encoding: Encoding da página
+        paginacao: Incluir `paginacao` (ver `ParserEsaj.paginacao`), usada na primeira página
+
+    Returns:
+        Dicionário com nome_extraido, processos e, se pedida, paginacao
+    """
+    extraido = _PARSER.analisar(conteudo, encoding)
+    if paginacao:
+        extraido["paginacao"] = ParserEsaj.paginacao(conteudo)
+    return extraido
+
+
+class EtapaAnalise:
+    """
+    Pool de processos que analisa as páginas baixadas pelas threads de consulta
+
+    As expressões regulares do parser seguram o GIL; com muitas consultas
+    simultâneas, analisar na própria thread de I/O disputa o interpretador com
+    as demais. Aqui as threads colocam os bytes da resposta na fila com
+    `enviar` e seguem para a próxima consulta; o Future devolvido conclui o
+    CPF quando um processo termina a análise (ver `processar_consultas`).
+
+    No máximo `profundidade` páginas ficam entre as threads e os processos
+    (aguardando ou em análise); além disso `enviar` bloqueia a thread até uma
+    vaga abrir. Essa contrapressão limita a memória a `profundidade` páginas,
+    qualquer que seja a velocidade das consultas em relação à análise.
+
+    Os processos são iniciados com "spawn": o script principal precisa do
+    `if __name__ == "__main__"`, como em `batch.py`.
+    """
+
+    def __init__(self, processos: Optional[int] = None, profundidade: Optional[int] = None):
+        self.processos = processos or ANALISE_CONFIG["processos"] or os.cpu_count() or 1
+        self.profundidade = max(1, profundidade or ANALISE_CONFIG["profundidade_fila"])
+        self._vagas = threading.BoundedSemaphore(self.profundidade)
+        self._lock = threading.Lock()
+        self._enviadas = 0
+        self._esperas = 0
+        self._tempo_espera = 0.0
+        # "spawn": os processos não herdam as threads (e locks) do processo das consultas
+        self._executor = ProcessPoolExecutor(self.processos, mp_context=multiprocessing.get_context("spawn"))
+
+    def enviar(self, conteudo: bytes, encoding: str, paginacao: bool = False) -> Future:
+        """
+        Coloca uma página na fila de análise
+
+        Bloqueia enquanto a fila estiver cheia.
+
+        Args:
+            conteudo: Corpo da resposta em bytes
+            encoding: Encoding da página
+            paginacao: Incluir a paginação no resultado
+
+        Returns:
+            Future com o dicionário de `analisar_pagina`
+        """
+        if not self._vagas.acquire(blocking=False):
+            inicio = time.perf_counter()
+            self._vagas.acquire()
+            espera = time.perf_counter() - inicio
+            METRICAS.observar("analise_espera_fila", espera)
+            with self._lock:
+                self._esperas += 1
+                self._tempo_espera += espera
+        try:
+            futuro = self._executor.submit(analisar_pagina, conteudo, encoding, paginacao)
+        except BaseException:
+            self._vagas.release()
+            raise
+        enviada_em = time.perf_counter()
+
+        def liberar(_):
+            self._vagas.release()
+            METRICAS.observar("analise_processos", time.perf_counter() - enviada_em)
+
+        futuro.add_done_callback(liberar)
+        with self._lock:
+            self._enviadas += 1
+        return futuro
+
+    def analisar(self, conteudo: bytes, encoding: str, paginacao: bool = False) -> Dict:
+        """Envia a página e aguarda o resultado (usado quando a consulta depende dele, como na paginação)"""
+        return self.enviar(conteudo, encoding, paginacao).result()
+
+    def estatisticas(self) -> Dict:
+        """
+        Uso da etapa
+
+        Returns:
+            Dicionário com processos, profundidade, paginas analisadas, esperas
+            por fila cheia e tempo total de espera
+        """
+        with self._lock:
+            return {
+                "processos": self.processos,
+                "profundidade": self.profundidade,
+                "paginas": self._enviadas,
+                "esperas_fila_cheia": self._esperas,
+                "tempo_espera": self._tempo_espera
+            }
+
+    def fechar(self):
+        """Aguarda as análises pendentes e encerra os processos"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "EtapaAnalise":
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
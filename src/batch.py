@@ -0,0 +1,310 @@
+"""
+Execução em lote pela linha de comando, sem Streamlit
+
+Uso:
+    python -m src.batch entrada.csv --workers 8 --rate 4/s --out resultados/
+    python -m src.batch carteira.csv --monitorar   # apenas processos novos/removidos
+
+Vários processos ou nós (com o mesmo arquivo de fila em um volume compartilhado):
+    python -m src.batch entrada.csv --fila data/fila.db --out resultados/   # enfileira, consulta e exporta
+    python -m src.batch --fila data/fila.db --trabalhador                   # em cada réplica adicional
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+# Permitir `python -m src.batch` além de `python src/batch.py`
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analise import EtapaAnalise
+from cache import CacheResultados
+from checkpoint import DiarioLote, gerar_id_lote
+from cliente import EsajClient
+from concorrencia import LimitadorAdaptativo, LimitadorTaxa
+from config import ANALISE_CONFIG, CACHE_CONFIG, ESAJ_CONFIG, FILA_CONFIG, FILE_CONFIG, MONITOR_CONFIG
+from exportacao import PARQUET_DISPONIVEL, ExportadorResultados
+from fila import FilaTrabalho, MonitoramentoIncompativel, executar_trabalhador, identificar_trabalhador
+from lote import estimar_total_cpfs, processar_consultas
+from metricas import METRICAS, iniciar_servidor_metricas
+from monitoramento import SnapshotProcessos
+from utils import LeitorCsvEmBlocos, configurar_logging, formatar_duracao, gerar_nome_arquivo
+
+
+def interpretar_taxa(valor: str) -> float:
+    """
+    Converte a taxa informada em requisições por segundo
+
+    Args:
+        valor: "4/s", "240/min", "3600/h" ou apenas o número (por segundo); 0 = sem limite
+
+    Returns:
+        Requisições por segundo
+    """
+    unidades = {"s": 1, "seg": 1, "min": 60, "m": 60, "h": 3600}
+    numero, _, unidade = valor.strip().partition("/")
+    try:
+        taxa = float(numero)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Taxa inválida: {valor}")
+    unidade = unidade.strip().lower() or "s"
+    if unidade not in unidades or taxa < 0:
+        raise argparse.ArgumentTypeError(f"Taxa inválida: {valor}")
+    return taxa / unidades[unidade]
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.batch",
+        description="Consulta em lote de CPFs no e-SAJ TJSP sem a interface Streamlit"
+    )
+    parser.add_argument("entrada", nargs="?", help="CSV com colunas Nome e CPF")
+    parser.add_argument("--workers", type=int, default=ESAJ_CONFIG["workers_default"],
+                        help="Consultas simultâneas (padrão: %(default)s)")
+    parser.add_argument("--rate", type=interpretar_taxa, default=1 / ESAJ_CONFIG["delay_default"],
+                        help="Taxa global de requisições, ex.: 4/s, 240/min (0 = sem limite)")
+    parser.add_argument("--adaptativo", action="store_true",
+                        help="Ajustar a taxa conforme o e-SAJ responde, partindo de --rate (AIMD)")
+    parser.add_argument("--processos-analise", type=int, default=ANALISE_CONFIG["processos"], metavar="N",
+                        help="Analisar o HTML em N processos separados das consultas (0 = nas próprias threads)")
+    parser.add_argument("--out", default="data/saida", help="Diretório dos arquivos de saída (padrão: %(default)s)")
+    parser.add_argument("--parquet", action="store_true",
+                        help="Gerar também os encontrados em Parquet com colunas tipadas (requer pyarrow)")
+    parser.add_argument("--bloco", type=int, default=FILE_CONFIG["bloco_linhas"],
+                        help="Linhas lidas por bloco do CSV (padrão: %(default)s)")
+    parser.add_argument("--sem-cache", action="store_true", help="Não usar o cache de resultados")
+    parser.add_argument("--sem-checkpoint", action="store_true",
+                        help="Não registrar checkpoint (um lote interrompido recomeça do início)")
+    parser.add_argument("--monitorar", action="store_true",
+                        help="Gravar apenas os processos novos ou removidos desde a execução anterior")
+    parser.add_argument("--snapshot", default=MONITOR_CONFIG["caminho"], metavar="ARQUIVO",
+                        help="Snapshot dos processos usado por --monitorar (padrão: %(default)s)")
+    parser.add_argument("--fila", metavar="ARQUIVO",
+                        help="Dividir o lote em reservas nesta fila SQLite compartilhada com outros trabalhadores")
+    parser.add_argument("--trabalhador", action="store_true",
+                        help="Apenas consultar CPFs da --fila até ela esvaziar (sem arquivo de entrada)")
+    parser.add_argument("--aguardar", action="store_true",
+                        help="Com --trabalhador, continuar aguardando novos lotes quando a fila esvaziar")
+    parser.add_argument("--metricas", metavar="ARQUIVO",
+                        help="Gravar tempo por etapa e contadores em JSON ao final")
+    parser.add_argument("--metricas-porta", type=int, metavar="PORTA",
+                        help="Servir /metrics (Prometheus) nesta porta durante o lote")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = criar_parser().parse_args(argv)
+    configurar_logging()
+
+    if args.trabalhador:
+        if not args.fila:
+            print("❌ --trabalhador requer --fila", file=sys.stderr)
+            return 1
+        return executar_como_trabalhador(args)
+    if args.entrada is None:
+        print("❌ Informe o arquivo de entrada (ou --trabalhador)", file=sys.stderr)
+        return 1
+    if not os.path.exists(args.entrada):
+        print(f"❌ Arquivo não encontrado: {args.entrada}", file=sys.stderr)
+        return 1
+    if args.parquet and not PARQUET_DISPONIVEL:
+        print("❌ --parquet requer o pacote pyarrow (pip install pyarrow)", file=sys.stderr)
+        return 1
+    if args.parquet and args.monitorar:
+        print("❌ --parquet não se aplica a --monitorar", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.out, exist_ok=True)
+    leitor = LeitorCsvEmBlocos(args.entrada, args.bloco, os.path.join(args.out, gerar_nome_arquivo("invalidos")))
+    total_estimado = estimar_total_cpfs(leitor)
+    if args.adaptativo:
+        limitador = LimitadorAdaptativo(args.rate or None)
+    else:
+        limitador = LimitadorTaxa(args.rate)
+    cliente = EsajClient(pool_size=max(args.workers, ESAJ_CONFIG["pool_size"]))
+    analise = EtapaAnalise(args.processos_analise) if args.processos_analise > 0 else None
+    cache = None if args.sem_cache or not CACHE_CONFIG["habilitado"] else CacheResultados()
+    id_lote = None if args.sem_checkpoint else gerar_id_lote(args.entrada)
+    # A fila é persistente e já faz o papel do checkpoint
+    fila = FilaTrabalho(args.fila) if args.fila else None
+    id_fila = gerar_id_lote(args.entrada) if fila is not None else None
+
+    if args.metricas_porta is not None:
+        iniciar_servidor_metricas(args.metricas_porta)
+    monitor = SnapshotProcessos(args.snapshot) if args.monitorar else None
+    saida = ExportadorResultados(args.out, monitoramento=args.monitorar)
+    concluidos = 0
+    inicio = time.monotonic()
+    ultimo_aviso = inicio
+
+    def ao_concluir(cpf, nome, resultado):
+        nonlocal concluidos, ultimo_aviso
+        concluidos += 1
+        agora = time.monotonic()
+        if agora - ultimo_aviso >= 5:
+            ultimo_aviso = agora
+            vazao = concluidos / (agora - inicio)
+            restante = formatar_duracao(max(0, total_estimado - concluidos) / vazao)
+            taxa_atual = f", taxa {limitador.taxa:.2f} req/s" if args.adaptativo else ""
+            if fila is not None:
+                # Com outros trabalhadores, o total concluído vem da fila
+                progresso = fila.progresso(id_fila)
+                print(f"⏳ {progresso['concluida']}/{total_estimado} CPFs em todos os trabalhadores, "
+                      f"{concluidos} aqui ({vazao:.2f} CPFs/s{taxa_atual})", file=sys.stderr, flush=True)
+                return
+            print(f"⏳ {concluidos}/{total_estimado} CPFs ({vazao:.2f} CPFs/s, restante ~{restante}{taxa_atual})",
+                  file=sys.stderr, flush=True)
+
+    taxa = f"{limitador.taxa:.2f} req/s" if limitador.taxa else "sem limite de taxa"
+    print(f"🚀 {args.entrada}: ~{total_estimado} linhas, {args.workers} workers, "
+          f"{taxa}{' (adaptativa)' if args.adaptativo else ''}", file=sys.stderr)
+
+    try:
+        if fila is None:
+            _, _, _, estatisticas = processar_consultas(
+                leitor, workers=args.workers, cliente=cliente, cache=cache, id_lote=id_lote,
+                ao_concluir=ao_concluir, limitador=limitador, exportador=saida, monitor=monitor, analise=analise
+            )
+        else:
+            total_estimado = fila.enfileirar(id_fila, leitor, monitoramento=args.monitorar)
+            estatisticas = executar_trabalhador(
+                fila, id_fila, ao_concluir=ao_concluir, workers=args.workers, cliente=cliente, cache=cache,
+                limitador=limitador, monitor=monitor, analise=analise
+            )
+            # Todas as reservas concluídas (aqui ou em outros trabalhadores): exportar na ordem do arquivo
+            for cpf, nome, resultado in fila.resultados(id_fila):
+                saida.registrar(cpf, nome, resultado)
+            fila.remover(id_fila)
+    except ValueError as e:
+        print(f"❌ Erro ao processar CSV: {e}", file=sys.stderr)
+        return 1
+    except MonitoramentoIncompativel as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        # Só há de onde continuar se a fila ou o diário do lote guardaram algo
+        retomavel = fila is not None or (id_lote is not None and os.path.exists(DiarioLote(id_lote).caminho))
+        if retomavel:
+            print(f"\n⏹️ Interrompido após {concluidos} CPFs; execute novamente para continuar de onde parou",
+                  file=sys.stderr)
+        else:
+            print(f"\n⏹️ Interrompido após {concluidos} CPFs; nenhum checkpoint gravado, "
+                  f"uma nova execução começa do início", file=sys.stderr)
+        return 130
+    finally:
+        saida.fechar()
+        cliente.fechar()
+        if analise is not None:
+            analise.fechar()
+        if fila is not None:
+            fila.fechar()
+        if args.metricas:
+            METRICAS.gravar_json(args.metricas)
+
+    if args.parquet:
+        saida.gerar_parquet()
+    duracao = time.monotonic() - inicio
+    conexao = cliente.estatisticas()
+    requisicoes = conexao['total_requisicoes']
+    contagens = saida.contagens
+
+    print("\n📊 Resumo")
+    if fila is not None:
+        print(f"  Fila:               {estatisticas['aceitos']} CPFs consultados aqui em "
+              f"{estatisticas['reservas']} reservas; o restante por outros trabalhadores")
+    print(f"  CPFs consultados:   {estatisticas['consultas']}")
+    print(f"  Encontrados:        {contagens['encontrados']} ({contagens['processos']} processos)")
+    print(f"  Não encontrados:    {contagens['nao_encontrados']}")
+    print(f"  Erros de consulta:  {contagens['erros']} ({estatisticas['retentativas']} novas tentativas, "
+          f"{estatisticas['pausas_circuito']} pausas por indisponibilidade)")
+    print(f"  CPFs inválidos:     {leitor.total_invalidos}")
+    print(f"  Cache / checkpoint: {estatisticas['acertos']} / {estatisticas['retomados']}")
+    print(f"  CPFs repetidos:     {estatisticas['duplicados']} (consultados uma vez)")
+    if args.monitorar:
+        print(f"  Alterações:         {contagens['novos']} processos novos, {contagens['removidos']} removidos "
+              f"em {estatisticas['cpfs_alterados']} CPFs")
+    falhas = conexao['requisicoes_falhas']
+    print(f"  Requisições HTTP:   {requisicoes} ({falhas} sem resposta, "
+          f"{falhas / requisicoes if requisicoes else 0:.1%} de falhas)")
+    print(f"  Dados recebidos:    {conexao['bytes_lidos'] / 2 ** 20:.1f} MB ({conexao['bytes_evitados'] / 2 ** 20:.1f} MB "
+          f"evitados em {conexao['leituras_interrompidas']} páginas sem processos, "
+          f"~{conexao['tempo_economizado']:.1f}s de download)")
+    if analise is not None:
+        uso = analise.estatisticas()
+        print(f"  Análise do HTML:    {uso['paginas']} páginas em {uso['processos']} processos "
+              f"({uso['esperas_fila_cheia']} esperas por fila cheia, {uso['tempo_espera']:.1f}s)")
+    if args.adaptativo:
+        print(f"  Taxa final:         {limitador.taxa:.2f} req/s ({limitador.reducoes} reduções)")
+    print(f"  Duração:            {duracao:.1f}s")
+    print(f"  Vazão:              {estatisticas['consultas'] / duracao if duracao else 0:.2f} CPFs/s, "
+          f"{requisicoes / duracao if duracao else 0:.2f} req/s")
+    if args.monitorar:
+        print(f"  Saída:              {saida.caminhos['alteracoes']}")
+    else:
+        print(f"  Saída:              {saida.caminhos['encontrados']}")
+        if args.parquet:
+            print(f"                      {saida.caminhos['encontrados_parquet']}")
+        print(f"                      {saida.caminhos['nao_encontrados']}")
+    if contagens['erros']:
+        print(f"                      {saida.caminhos['erros']} (use como entrada para repetir)")
+    if leitor.total_invalidos:
+        print(f"                      {leitor.caminho_invalidos}")
+    if args.metricas:
+        print(f"  Métricas:           {args.metricas}")
+
+    print("\n⏱️ Tempo por etapa (p50 / p95 / total)")
+    for etapa, resumo in METRICAS.etapas().items():
+        print(f"  {etapa:<20} {resumo['p50_s'] * 1000:>9.1f}ms {resumo['p95_s'] * 1000:>9.1f}ms "
+              f"{resumo['total_s']:>9.1f}s  ({resumo['contagem']})")
+    return 0
+
+
+def executar_como_trabalhador(args) -> int:
+    """Consulta CPFs de qualquer lote da fila até ela esvaziar (réplica sem arquivo de entrada)"""
+    if args.adaptativo:
+        limitador = LimitadorAdaptativo(args.rate or None)
+    else:
+        limitador = LimitadorTaxa(args.rate)
+    cliente = EsajClient(pool_size=max(args.workers, ESAJ_CONFIG["pool_size"]))
+    analise = EtapaAnalise(args.processos_analise) if args.processos_analise > 0 else None
+    cache = None if args.sem_cache or not CACHE_CONFIG["habilitado"] else CacheResultados()
+    monitor = SnapshotProcessos(args.snapshot) if args.monitorar else None
+    fila = FilaTrabalho(args.fila)
+    if args.metricas_porta is not None:
+        iniciar_servidor_metricas(args.metricas_porta)
+
+    print(f"👷 Trabalhador {identificar_trabalhador()} na fila {args.fila}", file=sys.stderr)
+    inicio = time.monotonic()
+    try:
+        while True:
+            estatisticas = executar_trabalhador(fila, workers=args.workers, cliente=cliente, cache=cache,
+                                                limitador=limitador, monitor=monitor, analise=analise)
+            if not args.aguardar:
+                break
+            if estatisticas['reservas']:
+                print(f"✅ {estatisticas['aceitos']} CPFs em {estatisticas['reservas']} reservas; "
+                      f"aguardando novos lotes", file=sys.stderr, flush=True)
+            time.sleep(FILA_CONFIG["intervalo_espera"])
+    except MonitoramentoIncompativel as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrompido; os CPFs não concluídos voltaram para a fila", file=sys.stderr)
+        return 130
+    finally:
+        fila.fechar()
+        cliente.fechar()
+        if analise is not None:
+            analise.fechar()
+        if args.metricas:
+            METRICAS.gravar_json(args.metricas)
+
+    print(f"✅ Fila vazia: {estatisticas['aceitos']} CPFs em {estatisticas['reservas']} reservas "
+          f"({time.monotonic() - inicio:.1f}s, {estatisticas['erros']} erros)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
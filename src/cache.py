@@ -0,0 +1,205 @@
+"""
+Cache persistente (SQLite) dos resultados de consulta ao e-SAJ
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from config import CACHE_CONFIG
+from utils import normalizar_cpf
+
+
+class CacheResultados:
+    """
+    Cache local de resultados por CPF normalizado com TTL e limite de tamanho
+
+    Guarda apenas o resultado já interpretado (nome extraído e processos),
+    nunca o HTML. Pode ser usado por várias threads ao mesmo tempo.
+    """
+
+    def __init__(self, caminho: Optional[str] = None, ttl_horas: Optional[float] = None,
+                 max_entradas: Optional[int] = None):
+        self.caminho = caminho or CACHE_CONFIG["caminho"]
+        self.ttl_segundos = (ttl_horas if ttl_horas is not None else CACHE_CONFIG["ttl_horas"]) * 3600
+        self.max_entradas = max_entradas if max_entradas is not None else CACHE_CONFIG["max_entradas"]
+
+        diretorio = os.path.dirname(self.caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS resultados (
+                cpf TEXT PRIMARY KEY,
+                nome_extraido TEXT NOT NULL,
+                processos TEXT NOT NULL,
+                consultado_em REAL NOT NULL,
+                encontrado INTEGER,
+                paginas INTEGER
+            )
+        """)
+        # Caches criados antes de encontrado/paginas: as linhas antigas ficam com NULL
+        colunas = {linha[1] for linha in self._conexao.execute("PRAGMA table_info(resultados)")}
+        for coluna in ("encontrado", "paginas"):
+            if coluna not in colunas:
+                self._conexao.execute(f"ALTER TABLE resultados ADD COLUMN {coluna} INTEGER")
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_consultado_em ON resultados (consultado_em)")
+        self._conexao.commit()
+        # Contagem mantida a cada inserção: `salvar` não conta a tabela inteira
+        self._total = self._conexao.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+
+        self.acertos = 0
+        self.falhas = 0
+
+    def _montar_resultado(self, nome_extraido: str, processos_json: str, consultado_em: float,
+                          encontrado: Optional[int], paginas: Optional[int]) -> Dict:
+        processos = json.loads(processos_json)
+        return {
+            "sucesso": True,
+            # NULL em entradas gravadas antes de a coluna existir
+            "encontrado": bool(processos) if encontrado is None else bool(encontrado),
+            "nome_extraido": nome_extraido,
+            "processos": processos,
+            "total_processos": len(processos),
+            "paginas": paginas or 1,
+            "data_consulta": datetime.fromtimestamp(consultado_em).strftime('%d/%m/%Y %H:%M:%S'),
+            "cache": True
+        }
+
+    def obter(self, cpf: str) -> Optional[Dict]:
+        """
+        Busca resultado ainda válido para o CPF
+
+        Args:
+            cpf: CPF em qualquer formato
+
+        Returns:
+            Resultado no formato de `consultar_esaj` ou None se ausente/expirado
+        """
+        return self.obter_varios([cpf]).get(normalizar_cpf(cpf))
+
+    def obter_varios(self, cpfs: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Busca vários CPFs de uma vez
+
+        Args:
+            cpfs: CPFs em qualquer formato
+
+        Returns:
+            Dicionário {cpf_normalizado: resultado} apenas com os acertos válidos
+        """
+        chaves = list(dict.fromkeys(normalizar_cpf(cpf) for cpf in cpfs))
+        limite = time.time() - self.ttl_segundos
+        encontrados = {}
+
+        with self._lock:
+            # SQLite limita o número de parâmetros por consulta
+            for inicio in range(0, len(chaves), 500):
+                bloco = chaves[inicio:inicio + 500]
+                marcadores = ",".join("?" * len(bloco))
+                linhas = self._conexao.execute(
+                    f"SELECT cpf, nome_extraido, processos, consultado_em, encontrado, paginas FROM resultados "
+                    f"WHERE cpf IN ({marcadores}) AND consultado_em >= ?",
+                    (*bloco, limite)
+                ).fetchall()
+                for cpf, *colunas in linhas:
+                    encontrados[cpf] = self._montar_resultado(*colunas)
+
+            self.acertos += len(encontrados)
+            self.falhas += len(chaves) - len(encontrados)
+
+        return encontrados
+
+    def salvar(self, cpf: str, resultado: Dict):
+        """
+        Armazena resultado de consulta bem-sucedida
+
+        Args:
+            cpf: CPF em qualquer formato
+            resultado: Dicionário retornado por `consultar_esaj`
+        """
+        if not resultado.get("sucesso"):
+            return
+
+        chave = normalizar_cpf(cpf)
+        with self._lock:
+            existente = self._conexao.execute("SELECT 1 FROM resultados WHERE cpf = ?", (chave,)).fetchone()
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO resultados (cpf, nome_extraido, processos, consultado_em, encontrado, paginas) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    chave,
+                    resultado.get("nome_extraido", ""),
+                    json.dumps(resultado.get("processos", []), ensure_ascii=False),
+                    time.time(),
+                    int(bool(resultado.get("encontrado", resultado.get("processos")))),
+                    resultado.get("paginas", 1)
+                )
+            )
+            if existente is None:
+                self._total += 1
+            if self.max_entradas and self._total > self.max_entradas:
+                self._remover_excedentes()
+            self._conexao.commit()
+
+    def _remover_excedentes(self):
+        """
+        Remove as entradas mais antigas quando o cache passa do limite
+
+        Só roda quando a contagem mantida passa do limite. A tabela é contada
+        de novo (outros processos podem gravar no mesmo arquivo) e 1% do
+        limite é liberado a mais, para que as próximas inserções não voltem
+        a limpar a cada chamada.
+        """
+        self._total = self._conexao.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+        excedente = self._total - self.max_entradas
+        if excedente > 0:
+            excedente += self.max_entradas // 100
+            cursor = self._conexao.execute(
+                "DELETE FROM resultados WHERE cpf IN "
+                "(SELECT cpf FROM resultados ORDER BY consultado_em ASC LIMIT ?)",
+                (excedente,)
+            )
+            self._total -= cursor.rowcount
+
+    def limpar_expirados(self) -> int:
+        """
+        Remove entradas com TTL vencido
+
+        Returns:
+            Número de entradas removidas
+        """
+        with self._lock:
+            cursor = self._conexao.execute(
+                "DELETE FROM resultados WHERE consultado_em < ?",
+                (time.time() - self.ttl_segundos,)
+            )
+            self._conexao.commit()
+            self._total -= cursor.rowcount
+            return cursor.rowcount
+
+    def estatisticas(self) -> Dict:
+        """
+        Acertos e falhas desde a criação do cache
+
+        Returns:
+            Dicionário com acertos, falhas e taxa de acerto (0 a 1)
+        """
+        total = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": self.acertos / total if total else 0.0
+        }
+
+    def fechar(self):
+        """Fecha a conexão com o banco"""
+        with self._lock:
+            self._conexao.close()
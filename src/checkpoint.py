@@ -0,0 +1,125 @@
+"""
+Diário de checkpoint para retomar lotes interrompidos
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+from config import CHECKPOINT_CONFIG
+from utils import normalizar_cpf
+
+
+def gerar_id_lote(arquivo) -> str:
+    """
+    Gera o identificador do lote a partir do conteúdo do arquivo de entrada
+
+    Args:
+        arquivo: Caminho ou arquivo (file-like) de entrada
+
+    Returns:
+        Hash SHA-256 (hex) do conteúdo, truncado em 16 caracteres
+    """
+    hash_arquivo = hashlib.sha256()
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, 'rb') as f:
+            for bloco in iter(lambda: f.read(1 << 20), b''):
+                hash_arquivo.update(bloco)
+    else:
+        posicao = arquivo.tell()
+        arquivo.seek(0)
+        for bloco in iter(lambda: arquivo.read(1 << 20), arquivo.read(0)):
+            hash_arquivo.update(bloco if isinstance(bloco, bytes) else bloco.encode('utf-8'))
+        arquivo.seek(posicao)
+    return hash_arquivo.hexdigest()[:16]
+
+
+class DiarioLote:
+    """
+    Registro em disco (JSON Lines) das consultas concluídas de um lote
+
+    Cada consulta bem-sucedida é anexada e sincronizada com o disco assim que
+    termina. Reenviar o mesmo arquivo recarrega o diário e pula os CPFs já
+    consultados.
+    """
+
+    def __init__(self, id_lote: str, diretorio: Optional[str] = None, fsync: Optional[bool] = None):
+        self.id_lote = id_lote
+        diretorio = diretorio or CHECKPOINT_CONFIG["diretorio"]
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho = os.path.join(diretorio, f"{id_lote}.jsonl")
+        self.fsync = CHECKPOINT_CONFIG["fsync"] if fsync is None else fsync
+        self._lock = threading.Lock()
+        self._arquivo = None
+
+    def carregar(self) -> Dict[str, Dict]:
+        """
+        Lê as consultas já concluídas
+
+        Returns:
+            Dicionário {cpf_normalizado: resultado}; uma última linha
+            incompleta (gravação interrompida) é ignorada
+        """
+        concluidos = {}
+        if not os.path.exists(self.caminho):
+            return concluidos
+
+        with open(self.caminho, encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    continue
+                concluidos[registro["cpf"]] = registro["resultado"]
+        return concluidos
+
+    def registrar(self, cpf: str, resultado: Dict):
+        """
+        Anexa uma consulta concluída ao diário
+
+        Args:
+            cpf: CPF consultado (qualquer formato)
+            resultado: Resultado da consulta; falhas não são registradas para
+                que sejam repetidas na retomada
+        """
+        if not resultado.get("sucesso"):
+            return
+
+        # O trecho de HTML não é necessário para retomar o lote
+        dados = {chave: valor for chave, valor in resultado.items() if chave != "html"}
+        linha = json.dumps({"cpf": normalizar_cpf(cpf), "resultado": dados}, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            if self._arquivo is None:
+                self._arquivo = self._abrir()
+            self._arquivo.write(linha)
+            self._arquivo.flush()
+            if self.fsync:
+                os.fsync(self._arquivo.fileno())
+
+    def _abrir(self):
+        """Abre o diário para anexar, isolando uma última linha incompleta"""
+        incompleto = False
+        if os.path.exists(self.caminho) and os.path.getsize(self.caminho) > 0:
+            with open(self.caminho, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                incompleto = f.read(1) != b"\n"
+        arquivo = open(self.caminho, 'a', encoding='utf-8')
+        if incompleto:
+            arquivo.write("\n")
+        return arquivo
+
+    def fechar(self):
+        """Fecha o arquivo do diário"""
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+
+    def remover(self):
+        """Apaga o diário (lote concluído)"""
+        self.fechar()
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
@@ -0,0 +1,315 @@
+"""
+Cliente HTTP reutilizável para o e-SAJ com pool de conexões
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from config import ESAJ_CONFIG, HEADERS
+from metricas import METRICAS
+
+
+class _ConexaoMedida(HTTPConnection):
+    def connect(self):
+        with METRICAS.medir("http_conexao"):
+            super().connect()
+
+
+class _ConexaoSeguraMedida(HTTPSConnection):
+    # Em HTTPS o tempo inclui o handshake TLS
+    def connect(self):
+        with METRICAS.medir("http_conexao"):
+            super().connect()
+
+
+class _PoolMedido(HTTPConnectionPool):
+    ConnectionCls = _ConexaoMedida
+
+
+class _PoolSeguroMedido(HTTPSConnectionPool):
+    ConnectionCls = _ConexaoSeguraMedida
+
+
+class _AdapterMedido(HTTPAdapter):
+    """HTTPAdapter cujas conexões registram o tempo de abertura em `METRICAS`"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _PoolMedido, "https": _PoolSeguroMedido}
+
+
+class EsajClient:
+    """
+    Cliente HTTP do e-SAJ baseado em `requests.Session`
+
+    Mantém um pool de conexões keep-alive dimensionado para o número de
+    workers, evitando um novo handshake TCP+TLS a cada CPF. Registra o tempo
+    de cada requisição separando as que abriram conexão nova das que
+    reaproveitaram uma conexão do pool.
+
+    Com `decidir`, `buscar` lê o corpo em blocos e para assim que a decisão
+    é "não encontrado", sem baixar o restante da página.
+    """
+
+    def __init__(self, pool_size: Optional[int] = None, timeout: Optional[float] = None,
+                 max_amostras: int = 1000):
+        self.pool_size = pool_size or ESAJ_CONFIG["pool_size"]
+        self.timeout = timeout or ESAJ_CONFIG["timeout"]
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = _AdapterMedido(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._adapter = adapter
+
+        self._lock = threading.Lock()
+        self._conexoes_conhecidas = 0
+        self._total_requisicoes = 0
+        self._requisicoes_falhas = 0
+        self._tempos_conexao_nova = deque(maxlen=max_amostras)
+        self._tempos_conexao_reutilizada = deque(maxlen=max_amostras)
+        self._bytes_lidos = 0
+        self._bytes_evitados = 0
+        self._leituras_interrompidas = 0
+        self._conexoes_descartadas = 0
+        self._tempo_economizado = 0.0
+
+    def _contar_conexoes(self) -> int:
+        """
+        Total de conexões já abertas pelos pools do adapter
+
+        Uma conexão fechada após leitura interrompida volta ao pool sem socket
+        e reconecta no próximo uso sem passar por `num_connections`; por isso
+        as descartadas entram na conta.
+        """
+        pools = self._adapter.poolmanager.pools
+        total = self._conexoes_descartadas
+        for chave in pools.keys():
+            pool = pools.get(chave)
+            if pool is not None:
+                total += pool.num_connections
+        return total
+
+    def _ler_ate_decidir(self, response: requests.Response,
+                         decidir: Callable[[bytes], Optional[bool]]) -> Dict:
+        """
+        Lê o corpo em blocos até `decidir` responder False ou o corpo terminar
+
+        Depois de uma decisão False, um restante de até
+        `ESAJ_CONFIG["dreno_max_bytes"]` é descartado para a conexão voltar ao
+        pool; acima disso a conexão é fechada (a próxima requisição abre outra).
+        Sem Content-Length (chunked), até `dreno_max_bytes` são lidos e a
+        conexão só é fechada se o corpo ainda não tiver terminado.
+        """
+        conteudo = bytearray()
+        recebidos = 0
+
+        def lidos() -> int:
+            # `tell` conta os bytes na rede, mas não avança em respostas chunked
+            return response.raw.tell() or recebidos
+
+        # Só páginas de resultado são avaliadas; erros HTTP são lidos inteiros
+        decidido = response.status_code != 200
+        interrompida = False
+        blocos = response.iter_content(ESAJ_CONFIG["bloco_leitura"])
+        for bloco in blocos:
+            conteudo += bloco
+            recebidos += len(bloco)
+            if not decidido:
+                decisao = decidir(conteudo)
+                if decisao is not None:
+                    decidido = True
+                    if decisao is False:
+                        interrompida = True
+                        break
+
+        tamanho = response.headers.get("Content-Length")
+        restante = int(tamanho) - lidos() if tamanho and tamanho.isdigit() else None
+        descartada = False
+        if interrompida:
+            limite = ESAJ_CONFIG["dreno_max_bytes"]
+            if restante is not None and restante <= limite:
+                for _ in blocos:
+                    pass
+                restante = 0
+            elif restante is None:
+                inicio_dreno = lidos()
+                terminou = True
+                for bloco in blocos:
+                    recebidos += len(bloco)
+                    if lidos() - inicio_dreno > limite:
+                        terminou = False
+                        break
+                descartada = not terminou
+                restante = None if descartada else 0
+            else:
+                descartada = True
+            if descartada:
+                # Sem `_content_consumed`, `close` fecha o socket em vez de devolvê-lo ao pool
+                response.close()
+        bytes_lidos = lidos()
+
+        # Resposta "materializada" com o que foi lido, como após um GET sem stream
+        response._content = bytes(conteudo)
+        response._content_consumed = True
+        if not descartada:
+            response.close()
+        return {
+            "leitura_interrompida": interrompida,
+            "conexao_descartada": descartada,
+            "bytes_lidos": bytes_lidos,
+            # None: conexão fechada sem saber quanto faltava (resposta chunked)
+            "bytes_evitados": restante if descartada else 0
+        }
+
+    def buscar(self, url: str, params: Optional[Dict] = None,
+               decidir: Optional[Callable[[bytes], Optional[bool]]] = None,
+               **kwargs) -> Tuple[requests.Response, Dict]:
+        """
+        Faz uma requisição GET usando o pool de conexões
+
+        Args:
+            url: URL da requisição
+            params: Parâmetros de query string
+            decidir: Função chamada com os bytes recebidos a cada bloco; False
+                interrompe a leitura (ex.: `ParserEsaj.decidir_parcial`).
+                `response.content` traz então apenas o início da página
+            **kwargs: Argumentos adicionais para `Session.get`
+
+        Returns:
+            Tupla com (resposta, medicao), onde medicao contém `duracao`
+            (segundos até o corpo completo ou a interrupção), `tempo_resposta`
+            (segundos até os cabeçalhos), `conexao_nova`, `bytes_lidos` (na
+            rede), `bytes_evitados`, `tempo_economizado` (estimado pela taxa
+            de download da própria resposta) e `leitura_interrompida`
+        """
+        kwargs.setdefault("timeout", self.timeout)
+
+        inicio = time.perf_counter()
+        try:
+            if decidir is None:
+                response = self.session.get(url, params=params, **kwargs)
+                leitura = {"leitura_interrompida": False, "conexao_descartada": False,
+                           "bytes_lidos": response.raw.tell() or len(response.content), "bytes_evitados": 0}
+            else:
+                response = self.session.get(url, params=params, stream=True, **kwargs)
+                leitura = self._ler_ate_decidir(response, decidir)
+        except requests.exceptions.RequestException as e:
+            # Tentativas sem resposta (DNS, conexão recusada, timeout) também são requisições
+            METRICAS.incrementar("falhas_http", tipo="timeout" if isinstance(e, requests.exceptions.Timeout)
+                                 else "conexao")
+            with self._lock:
+                self._total_requisicoes += 1
+                self._requisicoes_falhas += 1
+            raise
+        duracao = time.perf_counter() - inicio
+
+        # `elapsed` vai até os cabeçalhos; o restante é a leitura do corpo
+        primeiro_byte = response.elapsed.total_seconds()
+        METRICAS.observar("http_primeiro_byte", primeiro_byte)
+        METRICAS.observar("http_download", max(0.0, duracao - primeiro_byte))
+        METRICAS.incrementar("respostas_http", status=response.status_code)
+
+        tempo_economizado = None
+        if leitura["bytes_evitados"]:
+            download = duracao - primeiro_byte
+            if download > 0 and leitura["bytes_lidos"]:
+                tempo_economizado = leitura["bytes_evitados"] * download / leitura["bytes_lidos"]
+        METRICAS.incrementar("bytes_lidos", leitura["bytes_lidos"])
+        if leitura["leitura_interrompida"]:
+            METRICAS.incrementar("leituras_interrompidas",
+                                 conexao="descartada" if leitura["conexao_descartada"] else "reaproveitada")
+            METRICAS.incrementar("bytes_evitados", leitura["bytes_evitados"] or 0)
+
+        with self._lock:
+            conexoes = self._contar_conexoes()
+            conexao_nova = conexoes > self._conexoes_conhecidas
+            self._conexoes_conhecidas = max(conexoes, self._conexoes_conhecidas)
+            self._total_requisicoes += 1
+            if conexao_nova:
+                self._tempos_conexao_nova.append(duracao)
+            else:
+                self._tempos_conexao_reutilizada.append(duracao)
+            self._bytes_lidos += leitura["bytes_lidos"]
+            if leitura["leitura_interrompida"]:
+                self._leituras_interrompidas += 1
+                self._conexoes_descartadas += leitura["conexao_descartada"]
+                self._bytes_evitados += leitura["bytes_evitados"] or 0
+                self._tempo_economizado += tempo_economizado or 0.0
+
+        medicao = {
+            "duracao": duracao,
+            "tempo_resposta": primeiro_byte,
+            "conexao_nova": conexao_nova,
+            "bytes_lidos": leitura["bytes_lidos"],
+            "bytes_evitados": leitura["bytes_evitados"],
+            "tempo_economizado": tempo_economizado,
+            "leitura_interrompida": leitura["leitura_interrompida"]
+        }
+        return response, medicao
+
+    def estatisticas(self) -> Dict:
+        """
+        Resumo das requisições feitas pelo cliente
+
+        Returns:
+            Dicionário com totais e tempos médios (segundos) por tipo de conexão;
+            `total_requisicoes` inclui as `requisicoes_falhas` (sem resposta)
+        """
+        with self._lock:
+            novas = list(self._tempos_conexao_nova)
+            reutilizadas = list(self._tempos_conexao_reutilizada)
+            total = self._total_requisicoes
+            falhas = self._requisicoes_falhas
+            conexoes = self._conexoes_conhecidas
+            leitura = {
+                "bytes_lidos": self._bytes_lidos,
+                "bytes_evitados": self._bytes_evitados,
+                "leituras_interrompidas": self._leituras_interrompidas,
+                "conexoes_descartadas": self._conexoes_descartadas,
+                "tempo_economizado": self._tempo_economizado
+            }
+
+        media_novas = sum(novas) / len(novas) if novas else 0.0
+        media_reutilizadas = sum(reutilizadas) / len(reutilizadas) if reutilizadas else 0.0
+
+        return {
+            "total_requisicoes": total,
+            "requisicoes_falhas": falhas,
+            "conexoes_abertas": conexoes,
+            "tempo_medio_conexao_nova": media_novas,
+            "tempo_medio_conexao_reutilizada": media_reutilizadas,
+            # Estimativa do custo de handshake evitado em cada requisição reaproveitada
+            "economia_estimada_por_requisicao": max(0.0, media_novas - media_reutilizadas) if novas and reutilizadas else 0.0,
+            **leitura
+        }
+
+    def fechar(self):
+        """Fecha a sessão e todas as conexões do pool"""
+        self.session.close()
+
+
+_cliente_padrao = None
+_cliente_padrao_lock = threading.Lock()
+
+
+def obter_cliente_padrao() -> EsajClient:
+    """
+    Retorna o cliente compartilhado do processo, criando-o na primeira chamada
+
+    Returns:
+        Instância única de EsajClient
+    """
+    global _cliente_padrao
+    with _cliente_padrao_lock:
+        if _cliente_padrao is None:
+            _cliente_padrao = EsajClient()
+        return _cliente_padrao
@@ -0,0 +1,404 @@
+"""
+Execução concorrente de consultas com orçamento global de requisições
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from config import RETENTATIVA_CONFIG, TAXA_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class LimitadorTaxa:
+    """
+    Limitador de taxa global compartilhado por todos os workers
+
+    Cada chamada a `aguardar` reserva o próximo horário livre, de forma que o
+    início das requisições respeite o intervalo mínimo independentemente de
+    quantas threads estejam consultando ao mesmo tempo.
+    """
+
+    def __init__(self, requisicoes_por_segundo: Optional[float] = None):
+        self._lock = threading.Lock()
+        self._proximo_inicio = 0.0
+        self._intervalo = 0.0
+        self.definir_taxa(requisicoes_por_segundo)
+
+    @classmethod
+    def por_intervalo(cls, intervalo_segundos: float) -> "LimitadorTaxa":
+        """
+        Cria limitador a partir do intervalo mínimo entre requisições
+
+        Args:
+            intervalo_segundos: Intervalo entre inícios de requisições (0 = sem limite)
+
+        Returns:
+            Limitador configurado
+        """
+        taxa = 1.0 / intervalo_segundos if intervalo_segundos > 0 else None
+        return cls(taxa)
+
+    @property
+    def taxa(self) -> Optional[float]:
+        """Taxa atual em requisições por segundo (None = sem limite)"""
+        return 1.0 / self._intervalo if self._intervalo > 0 else None
+
+    def definir_taxa(self, requisicoes_por_segundo: Optional[float]):
+        """
+        Altera a taxa global
+
+        Args:
+            requisicoes_por_segundo: Nova taxa (None ou <= 0 = sem limite)
+        """
+        with self._lock:
+            if requisicoes_por_segundo and requisicoes_por_segundo > 0:
+                self._intervalo = 1.0 / requisicoes_por_segundo
+            else:
+                self._intervalo = 0.0
+
+    def aguardar(self):
+        """
+        Bloqueia até o horário reservado para a próxima requisição
+        """
+        with self._lock:
+            agora = time.monotonic()
+            inicio = max(agora, self._proximo_inicio)
+            self._proximo_inicio = inicio + self._intervalo
+
+        espera = inicio - agora
+        if espera > 0:
+            time.sleep(espera)
+
+    def registrar(self, duracao: Optional[float] = None, sobrecarga: bool = False):
+        """
+        Informa o desfecho de uma requisição (ignorado pelo limitador de taxa fixa)
+
+        Args:
+            duracao: Latência da resposta em segundos (None se não houve resposta)
+            sobrecarga: True para 429, 5xx, timeout ou erro de rede
+        """
+
+
+class LimitadorAdaptativo(LimitadorTaxa):
+    """
+    Limitador com controle AIMD (aumento aditivo, redução multiplicativa)
+
+    Enquanto as respostas chegam sem erro e com latência estável, a taxa sobe
+    cerca de `incremento` req/s por segundo. Um sinal de sobrecarga (429, 5xx,
+    timeout, erro de rede) ou um p95 de latência acima de `limiar_latencia`
+    vezes a linha de base multiplica a taxa por `fator_reducao`. Depois de uma
+    redução, novos sinais são ignorados por `intervalo_reducao` segundos para
+    que as requisições que já estavam em andamento não reduzam a taxa de novo.
+    """
+
+    def __init__(self, taxa_inicial: Optional[float] = None, taxa_min: Optional[float] = None,
+                 taxa_max: Optional[float] = None, incremento: Optional[float] = None,
+                 fator_reducao: Optional[float] = None, limiar_latencia: Optional[float] = None,
+                 janela_latencia: Optional[int] = None, intervalo_reducao: Optional[float] = None):
+        self.taxa_min = taxa_min or TAXA_CONFIG["taxa_min"]
+        self.taxa_max = taxa_max or TAXA_CONFIG["taxa_max"]
+        self.incremento = incremento or TAXA_CONFIG["incremento"]
+        self.fator_reducao = fator_reducao or TAXA_CONFIG["fator_reducao"]
+        self.limiar_latencia = limiar_latencia or TAXA_CONFIG["limiar_latencia"]
+        self.intervalo_reducao = (TAXA_CONFIG["intervalo_reducao"] if intervalo_reducao is None
+                                  else intervalo_reducao)
+        self.reducoes = 0
+        self._controle = threading.Lock()
+        self._latencias = deque(maxlen=janela_latencia or TAXA_CONFIG["janela_latencia"])
+        self._latencia_base: Optional[float] = None
+        self._ultima_reducao = float("-inf")
+        super().__init__(min(max(taxa_inicial or self.taxa_max, self.taxa_min), self.taxa_max))
+
+    @property
+    def latencia_p95(self) -> Optional[float]:
+        """p95 da latência na janela atual (None sem amostras)"""
+        with self._controle:
+            return self._p95()
+
+    def _p95(self) -> Optional[float]:
+        if not self._latencias:
+            return None
+        ordenadas = sorted(self._latencias)
+        return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))]
+
+    def _reduzir(self, agora: float):
+        if agora - self._ultima_reducao < self.intervalo_reducao:
+            return
+        self._ultima_reducao = agora
+        self.reducoes += 1
+        self._latencias.clear()
+        self.definir_taxa(max(self.taxa_min, self.taxa * self.fator_reducao))
+
+    def registrar(self, duracao: Optional[float] = None, sobrecarga: bool = False):
+        """
+        Ajusta a taxa conforme o desfecho de uma requisição
+
+        Args:
+            duracao: Latência da resposta em segundos (None se não houve resposta)
+            sobrecarga: True para 429, 5xx, timeout ou erro de rede
+        """
+        with self._controle:
+            agora = time.monotonic()
+            if sobrecarga:
+                self._reduzir(agora)
+                return
+
+            if duracao is not None:
+                self._latencias.append(duracao)
+                if len(self._latencias) == self._latencias.maxlen:
+                    p95 = self._p95()
+                    if self._latencia_base is None or p95 < self._latencia_base:
+                        self._latencia_base = p95
+                    elif p95 > self._latencia_base * self.limiar_latencia:
+                        self._reduzir(agora)
+                        return
+                    else:
+                        # A linha de base sobe devagar e acompanha mudanças permanentes do servidor
+                        self._latencia_base *= 1.001
+
+            taxa = self.taxa
+            self.definir_taxa(min(self.taxa_max, taxa + self.incremento / taxa))
+
+
+def calcular_espera(tentativa: int, base: Optional[float] = None, maximo: Optional[float] = None) -> float:
+    """
+    Espera antes de uma nova tentativa (backoff exponencial com jitter completo)
+
+    Args:
+        tentativa: Número da tentativa que falhou (1 = primeira)
+        base: Espera base em segundos
+        maximo: Teto da espera em segundos
+
+    Returns:
+        Segundos sorteados entre 0 e min(maximo, base * 2^(tentativa - 1))
+    """
+    base = RETENTATIVA_CONFIG["espera_base"] if base is None else base
+    maximo = RETENTATIVA_CONFIG["espera_max"] if maximo is None else maximo
+    return random.uniform(0, min(maximo, base * 2 ** (tentativa - 1)))
+
+
+class DisjuntorCircuito:
+    """
+    Circuit breaker compartilhado pelos workers de um lote
+
+    Após `limite_falhas` falhas seguidas o circuito abre e `aguardar` bloqueia
+    todos os workers por `pausa` segundos. Em seguida uma única requisição de
+    teste é liberada (meio aberto): sucesso fecha o circuito; falha reabre com
+    a pausa dobrada, até `pausa_max`.
+    """
+
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio_aberto"
+
+    def __init__(self, limite_falhas: Optional[int] = None, pausa: Optional[float] = None,
+                 pausa_max: Optional[float] = None):
+        self.limite_falhas = limite_falhas or RETENTATIVA_CONFIG["falhas_para_abrir"]
+        self.pausa = RETENTATIVA_CONFIG["pausa_circuito"] if pausa is None else pausa
+        self.pausa_max = RETENTATIVA_CONFIG["pausa_circuito_max"] if pausa_max is None else pausa_max
+        self.estado = DisjuntorCircuito.FECHADO
+        self.aberturas = 0
+        self._condicao = threading.Condition()
+        self._falhas = 0
+        self._pausa_atual = self.pausa
+        self._reabrir_em = 0.0
+        self._teste_liberado = False
+
+    @property
+    def segundos_para_reabrir(self) -> float:
+        """Tempo restante da pausa (0 se o circuito não está aberto)"""
+        if self.estado != DisjuntorCircuito.ABERTO:
+            return 0.0
+        return max(0.0, self._reabrir_em - time.monotonic())
+
+    def aguardar(self):
+        """
+        Bloqueia enquanto o circuito estiver aberto
+        """
+        with self._condicao:
+            while True:
+                if self.estado == DisjuntorCircuito.FECHADO:
+                    return
+                if self.estado == DisjuntorCircuito.ABERTO:
+                    restante = self._reabrir_em - time.monotonic()
+                    if restante > 0:
+                        self._condicao.wait(restante)
+                        continue
+                    self.estado = DisjuntorCircuito.MEIO_ABERTO
+                    self._teste_liberado = False
+                # Meio aberto: apenas a requisição de teste segue
+                if not self._teste_liberado:
+                    self._teste_liberado = True
+                    return
+                self._condicao.wait()
+
+    def registrar_sucesso(self):
+        """Registra uma resposta do servidor; fecha o circuito se estava em teste"""
+        with self._condicao:
+            self._falhas = 0
+            if self.estado != DisjuntorCircuito.FECHADO:
+                logger.info("🟢 e-SAJ respondeu, retomando o lote")
+                self.estado = DisjuntorCircuito.FECHADO
+                self._pausa_atual = self.pausa
+                self._condicao.notify_all()
+
+    def registrar_falha(self):
+        """Registra uma falha (sobrecarga, timeout ou erro de rede)"""
+        with self._condicao:
+            if self.estado == DisjuntorCircuito.MEIO_ABERTO:
+                self._pausa_atual = min(self.pausa_max, self._pausa_atual * 2)
+                self._abrir()
+            elif self.estado == DisjuntorCircuito.FECHADO:
+                self._falhas += 1
+                if self._falhas >= self.limite_falhas:
+                    self._abrir()
+
+    def _abrir(self):
+        logger.warning(f"🔴 e-SAJ indisponível, pausando o lote por {self._pausa_atual:.0f}s")
+        self.estado = DisjuntorCircuito.ABERTO
+        self.aberturas += 1
+        self._falhas = 0
+        self._reabrir_em = time.monotonic() + self._pausa_atual
+        self._condicao.notify_all()
+
+
+class ConsultasEmAndamento:
+    """
+    Agrupa chamadas simultâneas com a mesma chave em uma única execução
+
+    Enquanto a primeira chamada para uma chave está em andamento, as demais
+    (de qualquer thread, inclusive de outros lotes) aguardam e recebem o
+    mesmo resultado em vez de repetir a requisição. A chave sai do registro
+    assim que a execução termina, então nada fica retido em memória.
+
+    Entre lotes, o agrupamento só ocorre quando eles rodam ao mesmo tempo no
+    mesmo processo. Na interface isso depende de
+    `JOBS_CONFIG["max_simultaneos"]` > 1: com o padrão 1, os lotes de outras
+    sessões aguardam na fila do `GerenciadorJobs` e nunca se sobrepõem.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+        self.compartilhadas = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._em_andamento)
+
+    def executar(self, chave: Any, funcao: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Executa `funcao` ou aguarda a execução já em andamento para a chave
+
+        Args:
+            chave: Identificador da consulta (ex.: CPF normalizado)
+            funcao: Função sem argumentos que realiza a consulta
+
+        Returns:
+            Tupla (resultado, compartilhado); compartilhado é True quando o
+            resultado veio da execução de outra chamada. Exceções da execução
+            original são repassadas a todas as chamadas que a aguardavam.
+        """
+        with self._lock:
+            futuro = self._em_andamento.get(chave)
+            responsavel = futuro is None
+            if responsavel:
+                futuro = self._em_andamento[chave] = Future()
+            else:
+                self.compartilhadas += 1
+
+        if not responsavel:
+            return futuro.result(), True
+
+        try:
+            resultado = funcao()
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        else:
+            futuro.set_result(resultado)
+            return resultado, False
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+
+
+def executar_em_paralelo(
+    itens: Iterable[Any],
+    funcao: Callable[[Any], Any],
+    workers: int = 1,
+    limitador: Optional[LimitadorTaxa] = None,
+    ao_concluir: Optional[Callable[[int, Any, Any], None]] = None,
+) -> List[Any]:
+    """
+    Executa `funcao` sobre cada item usando um pool de threads
+
+    O número de tarefas em andamento é limitado a `2 * workers`, então `itens`
+    pode ser um iterador consumido sob demanda.
+
+    Se `funcao` devolver um `Future` (uma etapa seguinte, como a análise do
+    HTML em outros processos), a thread é liberada para o próximo item e o
+    resultado do Future é tratado como o resultado do item quando terminar.
+    Esses Futures não contam no limite de tarefas: quem os cria é quem limita
+    quantos ficam pendentes.
+
+    Args:
+        itens: Itens a processar (lista ou iterador)
+        funcao: Função chamada com cada item
+        workers: Número de threads
+        limitador: Limitador de taxa global aplicado antes de cada chamada
+        ao_concluir: Callback (indice, item, resultado) chamado na thread
+            chamadora à medida que as tarefas terminam
+
+    Returns:
+        Lista de resultados na mesma ordem dos itens de entrada
+    """
+    workers = max(1, int(workers))
+    max_em_andamento = workers * 2
+    resultados = {}
+
+    def executar(item):
+        if limitador is not None:
+            limitador.aguardar()
+        return funcao(item)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pendentes = {}
+        em_execucao = 0
+        iterador = enumerate(itens)
+        esgotado = False
+
+        while pendentes or not esgotado:
+            # Manter a fila de tarefas cheia sem materializar toda a entrada
+            while not esgotado and em_execucao < max_em_andamento:
+                try:
+                    indice, item = next(iterador)
+                except StopIteration:
+                    esgotado = True
+                    break
+                pendentes[executor.submit(executar, item)] = (indice, item, True)
+                em_execucao += 1
+
+            if not pendentes:
+                break
+
+            concluidos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                indice, item, na_thread = pendentes.pop(futuro)
+                resultado = futuro.result()
+                if na_thread:
+                    em_execucao -= 1
+                    if isinstance(resultado, Future):
+                        pendentes[resultado] = (indice, item, False)
+                        continue
+                resultados[indice] = resultado
+                if ao_concluir is not None:
+                    ao_concluir(indice, item, resultado)
+
+    return [resultados[i] for i in range(len(resultados))]
@@ -4,11 +4,21 @@
 # Configurações do e-SAJ TJSP
 ESAJ_CONFIG = {
     "base_url": "https://esaj.tjsp.jus.br/cpopg/search.do",
+    "url_paginacao": "https://esaj.tjsp.jus.br/cpopg/trocarPagina.do",  # Demais páginas da lista de processos
     "referer": "https://esaj.tjsp.jus.br/cpopg/abrirConsultaDeRequisitorios.do",
     "timeout": 30,  # Timeout em segundos
     "delay_min": 1,  # Delay mínimo entre consultas
     "delay_max": 5,  # Delay máximo entre consultas
-    "delay_default": 2  # Delay padrão
+    "delay_default": 2,  # Delay padrão
+    "workers_default": 4,  # Consultas simultâneas padrão
+    "workers_max": 16,  # Máximo de consultas simultâneas
+    "pool_size": 16,  # Conexões keep-alive mantidas no pool HTTP
+    "workers_paginas": 4,  # Páginas adicionais buscadas ao mesmo tempo por CPF
+    "max_paginas": 100,  # Limite de páginas de processos por CPF
+    "html_diagnostico": False,  # Incluir o início do HTML em cada resultado (apenas para depuração)
+    "leitura_parcial": True,  # Parar de ler a página assim que ela indicar "nenhum processo"
+    "bloco_leitura": 8192,  # Bytes lidos por vez na leitura parcial
+    "dreno_max_bytes": 16384  # Restante máximo descartado para reaproveitar a conexão (acima disso ela é fechada)
 }
 
 # Headers para simular navegador real (baseado no n8n que funciona)
@@ -46,15 +56,98 @@ VALIDATION_CONFIG = {
 # Configurações de arquivo
 FILE_CONFIG = {
     "allowed_types": ["csv"],  # Tipos de arquivo permitidos
-    "max_size_mb": 10,  # Tamanho máximo em MB
-    "encoding": "utf-8"  # Encoding do arquivo
+    "max_size_mb": 10,  # Acima deste tamanho o CSV é lido em blocos
+    "bloco_linhas": 50000,  # Linhas por bloco na leitura em blocos
+    "diretorio_resultados": "data/resultados",  # Arquivos gravados durante cada lote da interface
+    "linhas_previa": 1000,  # Linhas exibidas na prévia dos resultados
+    "parquet_compressao": "zstd",  # Codec do Parquet de encontrados (requer pyarrow)
+    "parquet_linhas_por_grupo": 1000000,  # Linhas por row group do Parquet
+    "encoding": "utf-8",  # Encoding do arquivo
+    "uploads_em_cache": 8,  # Arquivos validados mantidos em memória para os reruns da interface
+    "ttl_uploads_min": 30  # Minutos até um arquivo validado sair do cache
 }
 
 # Configurações de log
 LOG_CONFIG = {
     "log_file": "consulta_esaj.log",  # Arquivo de log
     "log_format": "%(asctime)s - %(levelname)s - %(message)s",  # Formato do log
-    "log_level": "INFO"  # Nível de log (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+    "log_level": "INFO",  # Nível de log (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+    "max_bytes": 10 * 1024 * 1024,  # Tamanho máximo do arquivo antes da rotação
+    "backup_count": 5  # Arquivos de log antigos mantidos
+}
+
+# Configurações do cache de resultados
+CACHE_CONFIG = {
+    "habilitado": True,  # Reaproveitar consultas recentes sem acessar o e-SAJ
+    "caminho": "data/cache/resultados.sqlite3",  # Banco SQLite do cache
+    "ttl_horas": 24,  # Validade de cada resultado em horas
+    "max_entradas": 500000  # Máximo de CPFs guardados (remove os mais antigos)
+}
+
+# Configurações do checkpoint de lotes
+CHECKPOINT_CONFIG = {
+    "diretorio": "data/checkpoints",  # Diários das consultas concluídas por lote
+    "fsync": True  # Forçar gravação em disco a cada consulta
+}
+
+# Configurações dos lotes em segundo plano
+JOBS_CONFIG = {
+    "max_simultaneos": 1,  # Lotes executados ao mesmo tempo (os demais aguardam na fila); acima de 1, lotes simultâneos compartilham consultas do mesmo CPF, mas cada um aplica a própria taxa
+    "max_historico": 20,  # Lotes finalizados mantidos para download
+    "max_eventos": 50,  # Consultas recentes exibidas no acompanhamento
+    "intervalo_atualizacao": 2,  # Segundos entre atualizações do progresso na interface
+    "janela_vazao": 30,  # Segundos considerados na vazão e no tempo restante do lote
+    "altura_eventos": 250  # Altura em pixels do log rolável de consultas recentes
+}
+
+# Configurações da taxa adaptativa (AIMD)
+TAXA_CONFIG = {
+    "adaptativo": True,  # Ajustar a taxa conforme status e latência das respostas
+    "taxa_min": 0.2,  # Taxa mínima em requisições por segundo
+    "taxa_max": 8,  # Taxa máxima em requisições por segundo
+    "incremento": 0.25,  # Req/s adicionadas a cada segundo sem sinais de sobrecarga
+    "fator_reducao": 0.5,  # Multiplicador da taxa em 429/5xx, timeout ou p95 alto
+    "limiar_latencia": 2.0,  # p95 acima de N vezes a linha de base reduz a taxa
+    "janela_latencia": 50,  # Respostas consideradas no cálculo do p95
+    "intervalo_reducao": 2  # Segundos mínimos entre duas reduções seguidas
+}
+
+# Configurações de retentativa e circuit breaker
+RETENTATIVA_CONFIG = {
+    "max_tentativas": 3,  # Tentativas por CPF em 429/5xx, timeout ou erro de rede
+    "espera_base": 2,  # Espera base do backoff exponencial em segundos
+    "espera_max": 30,  # Teto da espera entre tentativas em segundos
+    "falhas_para_abrir": 5,  # Falhas seguidas que pausam o lote inteiro
+    "pausa_circuito": 30,  # Pausa inicial do lote com o e-SAJ indisponível
+    "pausa_circuito_max": 300  # Pausa máxima (dobra a cada teste que falha)
+}
+
+# Configurações de métricas por etapa
+METRICAS_CONFIG = {
+    "porta_prometheus": 0,  # Porta do endpoint /metrics da interface (0 = desativado)
+    "endereco": "127.0.0.1",  # Interface de escuta do endpoint de métricas
+    "arquivo_json": "data/metricas.json"  # Métricas gravadas ao fim de cada lote da interface (vazio = não gravar)
+}
+
+# Configurações do modo de monitoramento
+MONITOR_CONFIG = {
+    "caminho": "data/monitoramento.db",  # Snapshot dos processos conhecidos de cada CPF
+    "confirmar_a_cada": 1000  # CPFs comparados (e já exportados) entre gravações do snapshot em disco
+}
+
+# Configurações da fila de trabalho compartilhada
+FILA_CONFIG = {
+    "caminho": "data/fila.db",  # Banco da fila (em um volume compartilhado entre os trabalhadores)
+    "tamanho_reserva": 50,  # CPFs entregues a um trabalhador por reserva
+    "duracao_reserva": 120,  # Segundos até a reserva expirar e os CPFs voltarem à fila
+    "max_reservas": 3,  # Reservas expiradas de um CPF antes de encerrá-lo como erro
+    "intervalo_espera": 2  # Segundos entre verificações enquanto outros trabalhadores terminam
+}
+
+# Configurações da análise das páginas em processos separados
+ANALISE_CONFIG = {
+    "processos": 0,  # Processos que analisam o HTML (0 = na própria thread da consulta)
+    "profundidade_fila": 64  # Páginas aguardando análise antes de bloquear as consultas
 }
 
 # Configurações de performance
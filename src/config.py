@@ -3,11 +3,21 @@
 # Configurações do e-SAJ TJSP
 ESAJ_CONFIG = {
     "base_url": "https://esaj.tjsp.jus.br/cpopg/search.do",
+    "url_paginacao": "https://esaj.tjsp.jus.br/cpopg/trocarPagina.do",
     "referer": "https://esaj.tjsp.jus.br/cpopg/abrirConsultaDeRequisitorios.do",
     "timeout": 30,
     "delay_min": 1,
     "delay_max": 5,
-    "delay_default": 2
+    "delay_default": 2,
+    "workers_default": 4,
+    "workers_max": 16,
+    "pool_size": 16,
+    "workers_paginas": 4,
+    "max_paginas": 100,
+    "html_diagnostico": False,
+    "leitura_parcial": True,
+    "bloco_leitura": 8192,
+    "dreno_max_bytes": 16384
 }
 
 # Headers para simular navegador real (baseado no n8n que funciona)
@@ -46,12 +56,95 @@ VALIDATION_CONFIG = {
 FILE_CONFIG = {
     "allowed_types": ["csv"],
     "max_size_mb": 10,
-    "encoding": "utf-8"
+    "bloco_linhas": 50000,
+    "diretorio_resultados": "data/resultados",
+    "linhas_previa": 1000,
+    "parquet_compressao": "zstd",
+    "parquet_linhas_por_grupo": 1000000,
+    "encoding": "utf-8",
+    "uploads_em_cache": 8,
+    "ttl_uploads_min": 30
 }
 
 # Configurações de log
 LOG_CONFIG = {
     "log_file": "consulta_esaj.log",
     "log_format": "%(asctime)s - %(levelname)s - %(message)s",
-    "log_level": "INFO"
+    "log_level": "INFO",
+    "max_bytes": 10 * 1024 * 1024,
+    "backup_count": 5
+}
+
+# Configurações do cache de resultados
+CACHE_CONFIG = {
+    "habilitado": True,
+    "caminho": "data/cache/resultados.sqlite3",
+    "ttl_horas": 24,
+    "max_entradas": 500000
+}
+
+# Configurações do checkpoint de lotes
+CHECKPOINT_CONFIG = {
+    "diretorio": "data/checkpoints",
+    "fsync": True
+}
+
+# Configurações dos lotes em segundo plano
+JOBS_CONFIG = {
+    "max_simultaneos": 1,
+    "max_historico": 20,
+    "max_eventos": 50,
+    "intervalo_atualizacao": 2,
+    "janela_vazao": 30,
+    "altura_eventos": 250
+}
+
+# Configurações da taxa adaptativa (AIMD)
+TAXA_CONFIG = {
+    "adaptativo": True,
+    "taxa_min": 0.2,
+    "taxa_max": 8,
+    "incremento": 0.25,
+    "fator_reducao": 0.5,
+    "limiar_latencia": 2.0,
+    "janela_latencia": 50,
+    "intervalo_reducao": 2
+}
+
+# Configurações de retentativa e circuit breaker
+RETENTATIVA_CONFIG = {
+    "max_tentativas": 3,
+    "espera_base": 2,
+    "espera_max": 30,
+    "falhas_para_abrir": 5,
+    "pausa_circuito": 30,
+    "pausa_circuito_max": 300
+}
+
+# Configurações de métricas por etapa
+METRICAS_CONFIG = {
+    "porta_prometheus": 0,
+    "endereco": "127.0.0.1",
+    "arquivo_json": "data/metricas.json"
+}
+
+# Configurações do modo de monitoramento
+MONITOR_CONFIG = {
+    "caminho": "data/monitoramento.db",
+    "confirmar_a_cada": 1000
+}
+
+# Configurações da fila de trabalho compartilhada
+FILA_CONFIG = {
+    "caminho": "data/fila.db",
+    "tamanho_reserva": 50,
+    "duracao_reserva": 120,
+    "max_reservas": 3,
+    "intervalo_espera": 2
+}
+
+# Configurações da análise das páginas em processos separados
+ANALISE_CONFIG = {
+    "processos": 0,
+    "profundidade_fila": 64
 }
@@ -0,0 +1,269 @@
+"""
+Exportação incremental dos resultados para arquivos em disco
+"""
+
+import csv
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+
+import pandas as pd
+
+from config import FILE_CONFIG
+from metricas import METRICAS
+from utils import gerar_nome_arquivo, validar_cpfs_vetorizado
+
+# pyarrow é opcional: sem ele a exportação Parquet fica indisponível
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+PARQUET_DISPONIVEL = pa is not None
+
+COLUNAS_ENCONTRADOS = ['CPF', 'Nome', 'Nome_Extraido', 'Sequencia_Processo', 'Numero_Processo',
+                       'Classe_Processo', 'Data_Processo', 'Data_Consulta']
+COLUNAS_NAO_ENCONTRADOS = ['cpf', 'nome', 'data_consulta']
+COLUNAS_ERROS = ['cpf', 'nome', 'erro', 'tentativas', 'data_consulta']
+COLUNAS_ALTERACOES = ['CPF', 'Nome', 'Situacao', 'Numero_Processo', 'Classe_Processo', 'Data_Processo',
+                      'Data_Consulta']
+
+TIPOS = {
+    "encontrados": COLUNAS_ENCONTRADOS,
+    "nao_encontrados": COLUNAS_NAO_ENCONTRADOS,
+    "erros": COLUNAS_ERROS
+}
+
+# Modo de monitoramento: só os processos novos/removidos (e os erros, para repetir)
+TIPOS_MONITORAMENTO = {
+    "alteracoes": COLUNAS_ALTERACOES,
+    "erros": COLUNAS_ERROS
+}
+
+if PARQUET_DISPONIVEL:
+    ESQUEMA_ENCONTRADOS = pa.schema([
+        # 11 dígitos ASCII de largura fixa: sem offsets por linha, como uma string de largura fixa
+        ("CPF", pa.binary(11)),
+        ("Nome", pa.string()),
+        ("Nome_Extraido", pa.string()),
+        ("Sequencia_Processo", pa.int16()),
+        ("Numero_Processo", pa.string()),
+        ("Classe_Processo", pa.string()),
+        ("Data_Processo", pa.date32()),
+        ("Data_Consulta", pa.timestamp("s"))
+    ])
+
+
+def _texto(serie: pd.Series) -> "pa.Array":
+    return pa.array(serie, type=pa.string(), from_pandas=True)
+
+
+def _data(serie: pd.Series, formato: str) -> "pa.Array":
+    # strptime do Arrow é vetorizado; valores fora do formato viram nulos
+    return pc.strptime(_texto(serie), format=formato, unit="s", error_is_null=True)
+
+
+def _tabela_encontrados(bloco: pd.DataFrame) -> "pa.Table":
+    """Converte um bloco do CSV de encontrados para as colunas tipadas"""
+    return pa.Table.from_arrays([
+        # CPF sempre com 11 dígitos, sem máscara
+        pa.array(validar_cpfs_vetorizado(bloco["CPF"])["cpf_normalizado"].str.encode("ascii"),
+                 type=pa.binary(11), from_pandas=True),
+        _texto(bloco["Nome"]),
+        _texto(bloco["Nome_Extraido"]),
+        pa.array(pd.to_numeric(bloco["Sequencia_Processo"]).to_numpy(dtype="int16")),
+        _texto(bloco["Numero_Processo"]),
+        _texto(bloco["Classe_Processo"]),
+        _data(bloco["Data_Processo"], "%d/%m/%Y").cast(pa.date32()),
+        _data(bloco["Data_Consulta"], "%d/%m/%Y %H:%M:%S")
+    ], schema=ESQUEMA_ENCONTRADOS)
+
+
+def converter_para_parquet(caminho_csv: str, caminho_parquet: Optional[str] = None,
+                           linhas_por_grupo: Optional[int] = None, compressao: Optional[str] = None) -> str:
+    """
+    Converte o CSV de encontrados em Parquet com colunas tipadas
+
+    O CSV é lido em blocos de `linhas_por_grupo` linhas e cada bloco vira um
+    row group, então a memória usada não depende do tamanho do arquivo.
+
+    Args:
+        caminho_csv: CSV no formato de `COLUNAS_ENCONTRADOS`
+        caminho_parquet: Arquivo de saída (mesmo nome com extensão .parquet se omitido)
+        linhas_por_grupo: Linhas por row group
+        compressao: Codec de compressão (zstd, snappy, gzip...)
+
+    Returns:
+        Caminho do arquivo Parquet gerado
+    """
+    if not PARQUET_DISPONIVEL:
+        raise RuntimeError("Exportação Parquet requer o pacote pyarrow (pip install pyarrow)")
+
+    caminho_parquet = caminho_parquet or os.path.splitext(caminho_csv)[0] + ".parquet"
+    linhas_por_grupo = linhas_por_grupo or FILE_CONFIG["parquet_linhas_por_grupo"]
+    compressao = compressao or FILE_CONFIG["parquet_compressao"]
+
+    with pq.ParquetWriter(caminho_parquet, ESQUEMA_ENCONTRADOS, compression=compressao) as escritor:
+        for bloco in pd.read_csv(caminho_csv, dtype=str, encoding="utf-8-sig", keep_default_na=False,
+                                 chunksize=linhas_por_grupo):
+            escritor.write_table(_tabela_encontrados(bloco), row_group_size=linhas_por_grupo)
+    return caminho_parquet
+
+
+class ExportadorResultados:
+    """
+    Grava as linhas de resultado em CSV à medida que cada CPF é concluído
+
+    Mantém um arquivo por tipo (encontrados, não encontrados e erros) no
+    mesmo formato dos downloads da interface. Os arquivos são descarregados
+    para o disco periodicamente, de modo que possam ser lidos (download
+    parcial) enquanto o lote ainda está em andamento.
+
+    Com `monitoramento`, os arquivos são o de alterações (uma linha por
+    processo novo ou removido, vindos de `processar_consultas(monitor=...)`)
+    e o de erros; as contagens de encontrados e não encontrados continuam.
+    """
+
+    def __init__(self, diretorio: str, intervalo_descarga: float = 1.0, monitoramento: bool = False):
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.intervalo_descarga = intervalo_descarga
+        self.monitoramento = monitoramento
+        self.tipos = TIPOS_MONITORAMENTO if monitoramento else TIPOS
+        self.caminhos = {tipo: os.path.join(diretorio, gerar_nome_arquivo(tipo)) for tipo in self.tipos}
+        self.contagens = {"encontrados": 0, "nao_encontrados": 0, "erros": 0, "processos": 0,
+                          "novos": 0, "removidos": 0}
+        self._lock = threading.Lock()
+        self._ultima_descarga = time.monotonic()
+        self._arquivos = {}
+        self._escritores = {}
+        for tipo, colunas in self.tipos.items():
+            arquivo = open(self.caminhos[tipo], 'w', encoding='utf-8-sig', newline='')
+            self._arquivos[tipo] = arquivo
+            self._escritores[tipo] = csv.writer(arquivo)
+            self._escritores[tipo].writerow(colunas)
+
+    def registrar(self, cpf: str, nome: str, resultado: Dict):
+        """
+        Anexa as linhas de um CPF concluído
+
+        Args:
+            cpf: CPF consultado
+            nome: Nome do CSV
+            resultado: Resultado da consulta (com data_consulta)
+        """
+        with self._lock, METRICAS.medir("exportacao"):
+            if not resultado['sucesso']:
+                self._escritores["erros"].writerow([cpf, nome, resultado.get('erro', ''),
+                                                    resultado.get('tentativas', 1), resultado['data_consulta']])
+                self.contagens["erros"] += 1
+            elif self.monitoramento:
+                self._registrar_alteracoes(cpf, nome, resultado)
+            elif resultado['encontrado']:
+                for i, processo in enumerate(resultado['processos'], 1):
+                    self._escritores["encontrados"].writerow([
+                        cpf, nome, resultado['nome_extraido'], i, processo['numero'],
+                        processo['classe'], processo['data'], resultado['data_consulta']
+                    ])
+                if not resultado['processos']:
+                    # Encontrado sem processos extraídos: uma linha com sequência 0, como em `colunas_encontrados`
+                    self._escritores["encontrados"].writerow([
+                        cpf, nome, resultado['nome_extraido'], 0, '', '', '', resultado['data_consulta']
+                    ])
+                self.contagens["encontrados"] += 1
+                self.contagens["processos"] += len(resultado['processos'])
+            else:
+                self._escritores["nao_encontrados"].writerow([cpf, nome, resultado['data_consulta']])
+                self.contagens["nao_encontrados"] += 1
+
+            agora = time.monotonic()
+            if agora - self._ultima_descarga >= self.intervalo_descarga:
+                self._descarregar()
+                self._ultima_descarga = agora
+
+    def _registrar_alteracoes(self, cpf: str, nome: str, resultado: Dict):
+        for situacao, chave in (("novo", "novos"), ("removido", "removidos")):
+            processos = resultado.get(chave, ())
+            for processo in processos:
+                self._escritores["alteracoes"].writerow([
+                    cpf, nome, situacao, processo['numero'], processo['classe'], processo['data'],
+                    resultado['data_consulta']
+                ])
+            self.contagens[chave] += len(processos)
+        if resultado['encontrado']:
+            self.contagens["encontrados"] += 1
+            self.contagens["processos"] += len(resultado['processos'])
+        else:
+            self.contagens["nao_encontrados"] += 1
+
+    def _descarregar(self):
+        for arquivo in self._arquivos.values():
+            if not arquivo.closed:
+                arquivo.flush()
+
+    def sincronizar(self):
+        """Grava em disco (fsync) as linhas registradas até agora"""
+        with self._lock:
+            for arquivo in self._arquivos.values():
+                if not arquivo.closed:
+                    arquivo.flush()
+                    os.fsync(arquivo.fileno())
+
+    def conteudo(self, tipo: str) -> bytes:
+        """
+        Conteúdo atual de um arquivo, inclusive durante o lote
+
+        Args:
+            tipo: Um dos tipos do exportador ("encontrados", "alteracoes", "erros"...)
+
+        Returns:
+            Bytes do CSV até a última linha completa gravada
+        """
+        with self._lock:
+            self._descarregar()
+            with open(self.caminhos[tipo], 'rb') as arquivo:
+                return arquivo.read()
+
+    def previa(self, tipo: str, linhas: int = 1000) -> pd.DataFrame:
+        """
+        Primeiras linhas de um arquivo para exibição
+
+        Args:
+            tipo: Um dos tipos do exportador ("encontrados", "alteracoes", "erros"...)
+            linhas: Quantidade máxima de linhas
+
+        Returns:
+            DataFrame com as linhas lidas do disco
+        """
+        with self._lock:
+            self._descarregar()
+            return pd.read_csv(self.caminhos[tipo], nrows=linhas, dtype=str, encoding='utf-8-sig')
+
+    def fechar(self):
+        """Fecha os arquivos (os dados permanecem em disco)"""
+        with self._lock:
+            for arquivo in self._arquivos.values():
+                arquivo.close()
+
+    def gerar_parquet(self) -> Optional[str]:
+        """
+        Gera a versão Parquet dos encontrados (após `fechar`)
+
+        Returns:
+            Caminho do arquivo, ou None se o pyarrow não estiver instalado
+            ou no modo de monitoramento
+        """
+        if not PARQUET_DISPONIVEL or "encontrados" not in self.caminhos:
+            return None
+        with METRICAS.medir("exportacao_parquet"):
+            self.caminhos["encontrados_parquet"] = converter_para_parquet(self.caminhos["encontrados"])
+        return self.caminhos["encontrados_parquet"]
+
+    def remover(self):
+        """Fecha e apaga o diretório de resultados"""
+        self.fechar()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
@@ -0,0 +1,476 @@
+"""
+Fila de trabalho compartilhada para dividir um lote entre processos ou nós
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from concorrencia import DisjuntorCircuito
+from config import FILA_CONFIG
+from lote import processar_consultas
+from utils import LeitorCsvEmBlocos, normalizar_cpf
+
+logger = logging.getLogger(__name__)
+
+# Campos do resultado de `consultar_esaj` guardados na fila (sem tempos nem HTML)
+CAMPOS_RESULTADO = ('sucesso', 'encontrado', 'nome_extraido', 'processos', 'total_processos', 'paginas',
+                    'erro', 'tentativas', 'data_consulta', 'novos', 'removidos')
+
+
+class ReservaPerdida(Exception):
+    """A reserva expirou e seus CPFs foram entregues a outro trabalhador"""
+
+
+class MonitoramentoIncompativel(Exception):
+    """O lote foi enfileirado com outro modo de monitoramento (com ou sem snapshot)"""
+
+
+class Reserva:
+    """
+    CPFs entregues a um trabalhador até `expira_em`
+
+    Attributes:
+        id: Identificador usado para aceitar apenas os resultados desta reserva
+        lote: Lote dos CPFs
+        itens: Lista de (indice, cpf, nome) na ordem do arquivo
+        expira_em: Instante (time.time) em que os CPFs voltam para a fila
+    """
+
+    __slots__ = ("id", "lote", "itens", "expira_em")
+
+    def __init__(self, id: str, lote: str, itens: List[Tuple[int, str, str]], expira_em: float):
+        self.id = id
+        self.lote = lote
+        self.itens = itens
+        self.expira_em = expira_em
+
+
+class FilaTrabalho:
+    """
+    Fila de CPFs em SQLite, entregue aos trabalhadores em reservas com prazo
+
+    Cada processo (ou nó com acesso ao mesmo arquivo) reserva um grupo de
+    CPFs pendentes por `duracao_reserva` segundos, consulta e devolve os
+    resultados. Se o processo morrer, a reserva expira e os CPFs voltam a ser
+    entregues a outro trabalhador; um CPF reservado `max_reservas` vezes sem
+    conclusão é encerrado como erro. Só a reserva vigente pode concluir seus
+    CPFs: resultados de um trabalhador que perdeu a reserva são descartados.
+
+    `reservar`, `renovar`, `concluir`, `liberar` e `progresso` são tudo o que
+    os trabalhadores usam; outra implementação (ex.: um banco compartilhado
+    pela rede) precisa oferecer apenas esses métodos.
+    """
+
+    def __init__(self, caminho: Optional[str] = None, tamanho_reserva: Optional[int] = None,
+                 duracao_reserva: Optional[float] = None, max_reservas: Optional[int] = None):
+        self.caminho = caminho or FILA_CONFIG["caminho"]
+        self.tamanho_reserva = tamanho_reserva or FILA_CONFIG["tamanho_reserva"]
+        self.duracao_reserva = duracao_reserva or FILA_CONFIG["duracao_reserva"]
+        self.max_reservas = max_reservas or FILA_CONFIG["max_reservas"]
+
+        diretorio = os.path.dirname(self.caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Transações explícitas: a reserva precisa de BEGIN IMMEDIATE entre processos
+        self._conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None,
+                                        check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS tarefas (
+                lote TEXT NOT NULL,
+                indice INTEGER NOT NULL,
+                cpf TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                estado TEXT NOT NULL DEFAULT 'pendente',
+                reserva TEXT,
+                expira_em REAL,
+                reservas INTEGER NOT NULL DEFAULT 0,
+                resultado TEXT,
+                PRIMARY KEY (lote, indice)
+            ) WITHOUT ROWID
+        """)
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_tarefas_estado ON tarefas (lote, estado, indice)")
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_tarefas_reserva ON tarefas (reserva)")
+        # Modo em que cada lote foi enfileirado; os trabalhadores precisam usar o mesmo
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS lotes (
+                lote TEXT PRIMARY KEY,
+                monitoramento INTEGER NOT NULL
+            )
+        """)
+
+    def _transacao(self, funcao: Callable[[sqlite3.Connection], object]):
+        with self._lock:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                retorno = funcao(self._conexao)
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+            self._conexao.execute("COMMIT")
+            return retorno
+
+    def enfileirar(self, id_lote: str, cpfs_validos, monitoramento: bool = False) -> int:
+        """
+        Inclui os CPFs de um lote na fila
+
+        Enfileirar de novo o mesmo lote (outro nó com o mesmo arquivo) não
+        duplica tarefas: cada linha é identificada pela sua posição.
+
+        Args:
+            id_lote: Identificador do lote (ex.: `gerar_id_lote` do arquivo)
+            cpfs_validos: DataFrame ou LeitorCsvEmBlocos com colunas cpf e nome
+            monitoramento: Se os resultados devem trazer processos novos e
+                removidos; gravado com o lote e exigido dos trabalhadores
+
+        Returns:
+            Total de CPFs do lote na fila
+
+        Raises:
+            MonitoramentoIncompativel: O lote já está na fila com o outro modo
+        """
+        def registrar_lote(conexao):
+            conexao.execute("INSERT OR IGNORE INTO lotes (lote, monitoramento) VALUES (?, ?)",
+                            (id_lote, int(monitoramento)))
+            return conexao.execute("SELECT monitoramento FROM lotes WHERE lote = ?", (id_lote,)).fetchone()[0]
+
+        if bool(self._transacao(registrar_lote)) != monitoramento:
+            raise MonitoramentoIncompativel(
+                f"Lote {id_lote} já está na fila {'com' if not monitoramento else 'sem'} monitoramento"
+            )
+        blocos = cpfs_validos if isinstance(cpfs_validos, LeitorCsvEmBlocos) else [cpfs_validos]
+        indice = 0
+        for bloco in blocos:
+            linhas = [(id_lote, indice + i, str(cpf), str(nome))
+                      for i, (cpf, nome) in enumerate(zip(bloco['cpf'], bloco['nome']))]
+            indice += len(linhas)
+            self._transacao(lambda conexao: conexao.executemany(
+                "INSERT OR IGNORE INTO tarefas (lote, indice, cpf, nome) VALUES (?, ?, ?, ?)", linhas
+            ))
+        return sum(self.progresso(id_lote).values())
+
+    def reservar(self, id_lote: Optional[str] = None, quantidade: Optional[int] = None) -> Optional[Reserva]:
+        """
+        Reserva os próximos CPFs pendentes ou com reserva expirada
+
+        Args:
+            id_lote: Lote desejado (None = qualquer lote)
+            quantidade: CPFs por reserva (padrão: `tamanho_reserva`)
+
+        Returns:
+            Reserva, ou None se não há CPF disponível no momento
+        """
+        quantidade = quantidade or self.tamanho_reserva
+
+        def reservar(conexao):
+            agora = time.time()
+            filtro_lote = "lote = ? AND " if id_lote is not None else ""
+            parametros = (id_lote,) if id_lote is not None else ()
+            linhas = conexao.execute(
+                f"SELECT lote, indice, cpf, nome, reservas FROM tarefas WHERE {filtro_lote}"
+                f"(estado = 'pendente' OR (estado = 'reservada' AND expira_em < ?)) "
+                f"ORDER BY lote, indice LIMIT ?",
+                parametros + (agora, quantidade)
+            ).fetchall()
+            if not linhas:
+                return None
+
+            # Uma reserva é sempre de um único lote
+            lote = linhas[0][0]
+            linhas = [linha for linha in linhas if linha[0] == lote]
+
+            # CPFs cujas reservas expiraram vezes demais provavelmente derrubam o trabalhador
+            esgotadas = [linha for linha in linhas if linha[4] >= self.max_reservas]
+            if esgotadas:
+                erro = json.dumps({'sucesso': False, 'tentativas': self.max_reservas,
+                                   'erro': f"Reserva expirada {self.max_reservas} vezes sem resultado",
+                                   'data_consulta': datetime.now().strftime('%d/%m/%Y %H:%M:%S')})
+                conexao.executemany(
+                    "UPDATE tarefas SET estado = 'concluida', reserva = NULL, resultado = ? "
+                    "WHERE lote = ? AND indice = ?",
+                    [(erro, lote, linha[1]) for linha in esgotadas]
+                )
+            linhas = [linha for linha in linhas if linha[4] < self.max_reservas]
+            if not linhas:
+                return Reserva("", lote, [], agora)
+
+            reserva = Reserva(uuid.uuid4().hex, lote, [(indice, cpf, nome) for _, indice, cpf, nome, _ in linhas],
+                              agora + self.duracao_reserva)
+            conexao.executemany(
+                "UPDATE tarefas SET estado = 'reservada', reserva = ?, expira_em = ?, reservas = reservas + 1 "
+                "WHERE lote = ? AND indice = ?",
+                [(reserva.id, reserva.expira_em, lote, indice) for indice, _, _ in reserva.itens]
+            )
+            return reserva
+
+        while True:
+            reserva = self._transacao(reservar)
+            # Só havia CPFs esgotados neste grupo: tentar o próximo
+            if reserva is None or reserva.itens:
+                return reserva
+
+    def renovar(self, reserva: Reserva) -> bool:
+        """
+        Estende o prazo de uma reserva em andamento
+
+        Args:
+            reserva: Reserva do trabalhador
+
+        Returns:
+            False se a reserva expirou e os CPFs já foram entregues a outro trabalhador
+        """
+        expira_em = time.time() + self.duracao_reserva
+        alteradas = self._transacao(lambda conexao: conexao.execute(
+            "UPDATE tarefas SET expira_em = ? WHERE reserva = ? AND estado = 'reservada'",
+            (expira_em, reserva.id)
+        ).rowcount)
+        if alteradas:
+            reserva.expira_em = expira_em
+        return alteradas > 0
+
+    def concluir(self, reserva: Reserva, resultados: List[Tuple[int, Dict]]) -> int:
+        """
+        Grava os resultados de uma reserva
+
+        Args:
+            reserva: Reserva do trabalhador
+            resultados: Lista de (indice, resultado de `consultar_esaj`)
+
+        Returns:
+            Quantidade aceita (CPFs cuja reserva já passou a outro trabalhador são ignorados)
+        """
+        linhas = [(json.dumps({campo: resultado[campo] for campo in CAMPOS_RESULTADO if campo in resultado},
+                              ensure_ascii=False), reserva.lote, indice, reserva.id)
+                  for indice, resultado in resultados]
+        return self._transacao(lambda conexao: conexao.executemany(
+            "UPDATE tarefas SET estado = 'concluida', resultado = ?, reserva = NULL "
+            "WHERE lote = ? AND indice = ? AND reserva = ?", linhas
+        ).rowcount)
+
+    def liberar(self, reserva: Reserva) -> int:
+        """
+        Devolve à fila os CPFs ainda não concluídos de uma reserva
+
+        Args:
+            reserva: Reserva do trabalhador
+
+        Returns:
+            Quantidade de CPFs devolvidos
+        """
+        return self._transacao(lambda conexao: conexao.execute(
+            "UPDATE tarefas SET estado = 'pendente', reserva = NULL, expira_em = NULL, reservas = reservas - 1 "
+            "WHERE reserva = ? AND estado = 'reservada'", (reserva.id,)
+        ).rowcount)
+
+    def monitoramento(self, id_lote: str) -> Optional[bool]:
+        """
+        Modo de monitoramento com que o lote foi enfileirado
+
+        Args:
+            id_lote: Lote
+
+        Returns:
+            True/False, ou None para lotes enfileirados sem essa informação
+        """
+        with self._lock:
+            linha = self._conexao.execute("SELECT monitoramento FROM lotes WHERE lote = ?", (id_lote,)).fetchone()
+        return None if linha is None else bool(linha[0])
+
+    def progresso(self, id_lote: Optional[str] = None) -> Dict[str, int]:
+        """
+        CPFs por estado
+
+        Args:
+            id_lote: Lote (None = todos)
+
+        Returns:
+            Dicionário com pendente, reservada e concluida
+        """
+        filtro = " WHERE lote = ?" if id_lote is not None else ""
+        parametros = (id_lote,) if id_lote is not None else ()
+        contagens = {'pendente': 0, 'reservada': 0, 'concluida': 0}
+        with self._lock:
+            for estado, quantidade in self._conexao.execute(
+                f"SELECT estado, COUNT(*) FROM tarefas{filtro} GROUP BY estado", parametros
+            ):
+                contagens[estado] = quantidade
+        return contagens
+
+    def resultados(self, id_lote: str, linhas_por_leitura: int = 1000) -> Iterator[Tuple[str, str, Dict]]:
+        """
+        Resultados concluídos do lote, na ordem do arquivo
+
+        Args:
+            id_lote: Lote
+            linhas_por_leitura: Linhas lidas do banco por vez
+
+        Yields:
+            Tuplas (cpf, nome, resultado)
+        """
+        ultimo = -1
+        while True:
+            with self._lock:
+                linhas = self._conexao.execute(
+                    "SELECT indice, cpf, nome, resultado FROM tarefas "
+                    "WHERE lote = ? AND indice > ? AND estado = 'concluida' ORDER BY indice LIMIT ?",
+                    (id_lote, ultimo, linhas_por_leitura)
+                ).fetchall()
+            if not linhas:
+                return
+            for indice, cpf, nome, resultado in linhas:
+                yield cpf, nome, json.loads(resultado)
+            ultimo = linhas[-1][0]
+
+    def remover(self, id_lote: str):
+        """Apaga as tarefas de um lote"""
+        def remover(conexao):
+            conexao.execute("DELETE FROM tarefas WHERE lote = ?", (id_lote,))
+            conexao.execute("DELETE FROM lotes WHERE lote = ?", (id_lote,))
+
+        self._transacao(remover)
+
+    def fechar(self):
+        """Fecha a conexão"""
+        with self._lock:
+            self._conexao.close()
+
+
+def identificar_trabalhador() -> str:
+    """Nome do trabalhador nos logs: host e PID"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def processar_reserva(fila: FilaTrabalho, reserva: Reserva,
+                      ao_concluir: Optional[Callable[[str, str, Dict], None]] = None, **opcoes) -> Dict:
+    """
+    Consulta os CPFs de uma reserva com `processar_consultas` e grava os resultados na fila
+
+    Enquanto a reserva está com este trabalhador, uma thread a renova a cada
+    terço do prazo, inclusive durante pausas do circuit breaker. Cada CPF é
+    gravado na fila assim que termina; se a reserva passou a outro
+    trabalhador, a gravação é recusada e as consultas desta reserva param
+    (com monitor, as comparações pendentes são descartadas).
+
+    Args:
+        fila: Fila de trabalho
+        reserva: Reserva obtida com `fila.reservar`
+        ao_concluir: Callback (cpf, nome, resultado) a cada CPF aceito pela fila
+        **opcoes: Repassadas a `processar_consultas` (workers, cliente, cache, limitador...)
+
+    Returns:
+        Estatísticas de `processar_consultas` e `aceitos` (resultados aceitos
+        pela fila); só `aceitos` se a reserva foi perdida
+    """
+    # Linhas repetidas do mesmo CPF recebem o mesmo resultado, uma chamada por linha
+    indices: Dict[str, List[int]] = {}
+    for indice, cpf, _ in reserva.itens:
+        indices.setdefault(normalizar_cpf(cpf), []).append(indice)
+    aceitos = 0
+
+    def registrar(cpf, nome, resultado):
+        nonlocal aceitos
+        if not fila.concluir(reserva, [(indices[normalizar_cpf(cpf)].pop(0), resultado)]):
+            raise ReservaPerdida(reserva.id)
+        aceitos += 1
+        if ao_concluir is not None:
+            ao_concluir(cpf, nome, resultado)
+
+    encerrar = threading.Event()
+
+    def renovar_periodicamente():
+        # Para quando a renovação falha: reserva perdida ou todos os CPFs concluídos
+        while not encerrar.wait(fila.duracao_reserva / 3):
+            if not fila.renovar(reserva):
+                return
+
+    renovacao = threading.Thread(target=renovar_periodicamente, name=f"reserva-{reserva.id[:8]}", daemon=True)
+    renovacao.start()
+    cpfs = pd.DataFrame(
+        [(cpf, nome) for _, cpf, nome in reserva.itens], columns=['cpf', 'nome']
+    )
+    try:
+        _, _, _, estatisticas = processar_consultas(cpfs, ao_concluir=registrar, **opcoes)
+    except ReservaPerdida:
+        logger.warning(f"⚠️ Reserva {reserva.id} expirou e passou a outro trabalhador; "
+                       f"{aceitos} de {len(reserva.itens)} CPFs gravados")
+        return {'aceitos': aceitos}
+    except BaseException:
+        # Interrompido: o que já terminou está gravado e o restante volta para a fila
+        fila.liberar(reserva)
+        raise
+    finally:
+        encerrar.set()
+        renovacao.join()
+    estatisticas['aceitos'] = aceitos
+    return estatisticas
+
+
+def executar_trabalhador(fila: FilaTrabalho, id_lote: Optional[str] = None,
+                         intervalo_espera: Optional[float] = None,
+                         ao_concluir: Optional[Callable[[str, str, Dict], None]] = None, **opcoes) -> Dict:
+    """
+    Reserva e consulta CPFs até a fila esvaziar
+
+    Enquanto houver reservas de outros trabalhadores em andamento, aguarda:
+    se alguma expirar (trabalhador morto), os CPFs são reservados aqui.
+
+    Um lote enfileirado com monitoramento só é consultado por trabalhadores
+    com `monitor` (e vice-versa): na primeira reserva de um lote de outro
+    modo, ela é devolvida à fila e o trabalhador para com
+    `MonitoramentoIncompativel`, em vez de gravar resultados sem (ou com)
+    processos novos e removidos.
+
+    Args:
+        fila: Fila de trabalho
+        id_lote: Lote a processar (None = qualquer lote da fila)
+        intervalo_espera: Segundos entre verificações sem CPF disponível
+        ao_concluir: Callback (cpf, nome, resultado) a cada CPF concluído
+        **opcoes: Repassadas a `processar_consultas`
+
+    Returns:
+        Estatísticas de `processar_consultas` somadas entre as reservas deste
+        trabalhador, com `reservas` e `aceitos`
+
+    Raises:
+        MonitoramentoIncompativel: Um lote reservado exige o outro modo de monitoramento
+    """
+    intervalo_espera = FILA_CONFIG["intervalo_espera"] if intervalo_espera is None else intervalo_espera
+    # O mesmo circuit breaker para todas as reservas: uma pausa vale para o trabalhador inteiro
+    disjuntor = opcoes.setdefault('disjuntor', DisjuntorCircuito())
+    totais = dict.fromkeys(('reservas', 'aceitos', 'consultas', 'acertos', 'retomados', 'erros', 'retentativas',
+                            'duplicados', 'compartilhadas', 'processos_novos', 'processos_removidos',
+                            'cpfs_alterados'), 0)
+    while True:
+        reserva = fila.reservar(id_lote)
+        if reserva is None:
+            if not fila.progresso(id_lote)['reservada']:
+                break
+            time.sleep(intervalo_espera)
+            continue
+        monitoramento = fila.monitoramento(reserva.lote)
+        if monitoramento is not None and monitoramento != (opcoes.get('monitor') is not None):
+            fila.liberar(reserva)
+            raise MonitoramentoIncompativel(
+                f"Lote {reserva.lote} foi enfileirado {'com' if monitoramento else 'sem'} monitoramento; "
+                f"execute o trabalhador {'com' if monitoramento else 'sem'} --monitorar"
+            )
+        estatisticas = processar_reserva(fila, reserva, ao_concluir=ao_concluir, **opcoes)
+        totais['reservas'] += 1
+        for chave, valor in estatisticas.items():
+            if chave in totais:
+                totais[chave] += valor
+    totais['taxa_acerto'] = totais['acertos'] / totais['consultas'] if totais['consultas'] else 0.0
+    totais['pausas_circuito'] = disjuntor.aberturas
+    return totais
@@ -0,0 +1,204 @@
+"""
+Execução de lotes em segundo plano, independente dos reruns do Streamlit
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from config import JOBS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelado(Exception):
+    """Lançada dentro do job quando o cancelamento é solicitado"""
+
+
+class Job:
+    """
+    Estado de um lote submetido ao GerenciadorJobs
+
+    Os campos de progresso são atualizados pela thread do job e lidos pela
+    interface a cada atualização da página.
+    """
+
+    PENDENTE = "pendente"
+    EXECUTANDO = "executando"
+    CONCLUIDO = "concluido"
+    ERRO = "erro"
+    CANCELADO = "cancelado"
+
+    def __init__(self, descricao: str, total: int, max_eventos: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.descricao = descricao
+        self.total = total
+        self.concluidos = 0
+        self.status = Job.PENDENTE
+        self.resultado: Any = None
+        self.erro: Optional[str] = None
+        self.criado_em = time.time()
+        self.iniciado_em: Optional[float] = None
+        self.finalizado_em: Optional[float] = None
+        self.eventos = deque(maxlen=max_eventos)
+        # Amostras (instante, concluídos) a cada segundo para a vazão recente
+        self._amostras = deque(maxlen=JOBS_CONFIG["janela_vazao"])
+        # Objetos do lote consultados pela interface durante a execução (ex.: limitador de taxa)
+        self.contexto: Dict[str, Any] = {}
+        self._cancelar = threading.Event()
+        self._limpeza: List[Callable[[], None]] = []
+
+    @property
+    def ativo(self) -> bool:
+        """True enquanto o job está na fila ou executando"""
+        return self.status in (Job.PENDENTE, Job.EXECUTANDO)
+
+    @property
+    def progresso(self) -> float:
+        """Fração concluída entre 0 e 1"""
+        if self.status == Job.CONCLUIDO:
+            return 1.0
+        return min(1.0, self.concluidos / self.total) if self.total else 0.0
+
+    @property
+    def vazao(self) -> Optional[float]:
+        """CPFs por segundo na janela recente (None no primeiro segundo)"""
+        if not self._amostras:
+            return None
+        inicio, concluidos_inicio = self._amostras[0]
+        # Medida até agora: um lote parado (ex.: circuito aberto) tem a vazão caindo
+        decorrido = time.monotonic() - inicio
+        if decorrido < 1:
+            return None
+        return (self.concluidos - concluidos_inicio) / decorrido
+
+    @property
+    def segundos_restantes(self) -> Optional[float]:
+        """Estimativa do tempo até o fim pela vazão recente (None se indisponível)"""
+        vazao = self.vazao
+        if not vazao or not self.total:
+            return None
+        return max(0, self.total - self.concluidos) / vazao
+
+    def registrar_progresso(self, cpf: str, nome: str, resultado: Dict):
+        """
+        Callback de progresso para `lote.processar_consultas`
+
+        Args:
+            cpf: CPF concluído
+            nome: Nome do CSV
+            resultado: Resultado da consulta
+        """
+        self.concluidos += 1
+        agora = time.monotonic()
+        if not self._amostras or agora - self._amostras[-1][0] >= 1:
+            self._amostras.append((agora, self.concluidos))
+        self.eventos.append({
+            'cpf': cpf,
+            'nome': nome,
+            'encontrado': bool(resultado.get('sucesso') and resultado.get('encontrado')),
+            'erro': not resultado.get('sucesso'),
+            'total_processos': resultado.get('total_processos', 0),
+            'cache': bool(resultado.get('cache'))
+        })
+        if self._cancelar.is_set():
+            raise JobCancelado()
+
+    def cancelar(self):
+        """Solicita o cancelamento; o job para após a próxima consulta concluída"""
+        self._cancelar.set()
+
+    def registrar_limpeza(self, funcao: Callable[[], None]):
+        """
+        Registra uma função chamada quando o job sai do histórico
+
+        Args:
+            funcao: Função sem argumentos (ex.: apagar arquivos de resultado)
+        """
+        self._limpeza.append(funcao)
+
+    def limpar(self):
+        """Executa as funções de limpeza registradas"""
+        for funcao in self._limpeza:
+            try:
+                funcao()
+            except Exception:
+                logger.exception(f"💥 Erro na limpeza do job {self.id}")
+        self._limpeza.clear()
+
+
+class GerenciadorJobs:
+    """
+    Pool de threads que executa lotes fora da thread do script Streamlit
+
+    Deve ser compartilhado via `st.cache_resource`, de modo que os jobs e seus
+    resultados sobrevivam a reruns e fiquem visíveis para todas as sessões.
+    """
+
+    def __init__(self, max_simultaneos: Optional[int] = None, max_historico: Optional[int] = None,
+                 max_eventos: Optional[int] = None):
+        self.max_historico = max_historico or JOBS_CONFIG["max_historico"]
+        self.max_eventos = max_eventos or JOBS_CONFIG["max_eventos"]
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_simultaneos or JOBS_CONFIG["max_simultaneos"],
+            thread_name_prefix="job-lote"
+        )
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+
+    def submeter(self, descricao: str, total: int, funcao: Callable[..., Any], *args, **kwargs) -> Job:
+        """
+        Enfileira um lote para execução em segundo plano
+
+        Args:
+            descricao: Texto exibido na interface
+            total: Quantidade de itens esperada (para progresso)
+            funcao: Função executada; recebe o Job como primeiro argumento
+            *args, **kwargs: Argumentos adicionais da função
+
+        Returns:
+            Job criado
+        """
+        job = Job(descricao, total, self.max_eventos)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._descartar_antigos()
+        self._executor.submit(self._executar, job, funcao, args, kwargs)
+        return job
+
+    def _executar(self, job: Job, funcao: Callable[..., Any], args, kwargs):
+        job.iniciado_em = time.time()
+        job.status = Job.EXECUTANDO
+        try:
+            job.resultado = funcao(job, *args, **kwargs)
+            job.status = Job.CONCLUIDO
+        except JobCancelado:
+            job.status = Job.CANCELADO
+        except Exception as e:
+            logger.exception(f"💥 Erro no job {job.id}")
+            job.erro = str(e)
+            job.status = Job.ERRO
+        finally:
+            job.finalizado_em = time.time()
+
+    def _descartar_antigos(self):
+        """Mantém no máximo `max_historico` jobs finalizados"""
+        finalizados = [job for job in self._jobs.values() if not job.ativo]
+        excedente = len(finalizados) - self.max_historico
+        for job in sorted(finalizados, key=lambda j: j.criado_em)[:max(0, excedente)]:
+            del self._jobs[job.id]
+            job.limpar()
+
+    def obter(self, job_id: str) -> Optional[Job]:
+        """Retorna o job pelo identificador"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def listar(self) -> List[Job]:
+        """Jobs conhecidos, do mais recente para o mais antigo"""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.criado_em, reverse=True)
@@ -0,0 +1,471 @@
+"""
+Execução de lotes de consultas ao e-SAJ (sem dependência do Streamlit)
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from analise import EtapaAnalise
+from cache import CacheResultados
+from checkpoint import DiarioLote
+from cliente import EsajClient
+from concorrencia import (ConsultasEmAndamento, DisjuntorCircuito, LimitadorTaxa, calcular_espera,
+                          executar_em_paralelo)
+from config import RETENTATIVA_CONFIG
+from exportacao import ExportadorResultados
+from metricas import METRICAS
+from monitoramento import SnapshotProcessos
+from registros import ConsultaResultado, converter_processos
+from utils import LeitorCsvEmBlocos, completar_analise, consultar_esaj, normalizar_cpf
+
+logger = logging.getLogger(__name__)
+
+# Compartilhado por todos os lotes do processo (sessões e jobs diferentes);
+# só agrupa consultas de lotes que rodam ao mesmo tempo (ver `ConsultasEmAndamento`)
+CONSULTAS_EM_ANDAMENTO = ConsultasEmAndamento()
+
+
+class _ConcluidosNoLote:
+    """
+    Resultados já concluídos em um lote lido em blocos, para CPFs repetidos em blocos seguintes
+
+    Em memória fica apenas o conjunto dos CPFs normalizados; os resultados
+    vão para um SQLite temporário, apagado em `fechar`.
+    """
+
+    def __init__(self):
+        descritor, self.caminho = tempfile.mkstemp(prefix="concluidos_lote_", suffix=".db")
+        os.close(descritor)
+        self.chaves = set()
+        self._conexao = sqlite3.connect(self.caminho)
+        # Arquivo descartável: sem journal nem fsync
+        self._conexao.execute("PRAGMA journal_mode=OFF")
+        self._conexao.execute("PRAGMA synchronous=OFF")
+        self._conexao.execute("CREATE TABLE resultados (cpf TEXT PRIMARY KEY, resultado TEXT NOT NULL) WITHOUT ROWID")
+
+    def __contains__(self, chave: str) -> bool:
+        return chave in self.chaves
+
+    def guardar(self, chave: str, resultado: Dict):
+        """Registra o resultado de um CPF concluído"""
+        dados = {campo: valor for campo, valor in resultado.items() if campo != "html"}
+        self._conexao.execute("INSERT OR REPLACE INTO resultados (cpf, resultado) VALUES (?, ?)",
+                              (chave, json.dumps(dados, ensure_ascii=False)))
+        self.chaves.add(chave)
+
+    def obter_varios(self, chaves: Iterable[str]) -> Dict[str, Dict]:
+        """Resultados dos CPFs informados que já foram concluídos"""
+        chaves = list(chaves)
+        encontrados = {}
+        for inicio in range(0, len(chaves), 500):
+            parte = chaves[inicio:inicio + 500]
+            for chave, resultado in self._conexao.execute(
+                f"SELECT cpf, resultado FROM resultados WHERE cpf IN ({','.join('?' * len(parte))})", parte
+            ):
+                encontrados[chave] = json.loads(resultado)
+        return encontrados
+
+    def fechar(self):
+        """Fecha e apaga o arquivo temporário"""
+        self._conexao.close()
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
+
+
+def estimar_total_cpfs(cpfs_validos) -> int:
+    """
+    Total de CPFs a consultar, usado para progresso
+
+    Args:
+        cpfs_validos: DataFrame ou LeitorCsvEmBlocos
+
+    Returns:
+        Quantidade exata (DataFrame) ou estimada pelo número de linhas (leitura em blocos)
+    """
+    if isinstance(cpfs_validos, LeitorCsvEmBlocos):
+        return cpfs_validos.estimar_total()
+    return len(cpfs_validos)
+
+
+def indica_sobrecarga(resultado: Dict) -> bool:
+    """
+    Verifica se o resultado de `consultar_esaj` sinaliza sobrecarga do e-SAJ
+
+    Args:
+        resultado: Resultado da consulta
+
+    Returns:
+        True para HTTP 429 ou 5xx, timeout e erro de rede
+    """
+    status = resultado.get('status_code') or 0
+    return status == 429 or status >= 500 or bool(resultado.get('timeout') or resultado.get('network_error'))
+
+
+def processar_consultas(cpfs_validos, delay_consulta: float = 0, workers: int = 1,
+                        cliente: Optional[EsajClient] = None, cache: Optional[CacheResultados] = None,
+                        id_lote: Optional[str] = None,
+                        ao_concluir: Optional[Callable[[str, str, Dict], None]] = None,
+                        limitador: Optional[LimitadorTaxa] = None,
+                        disjuntor: Optional[DisjuntorCircuito] = None,
+                        exportador: Optional[ExportadorResultados] = None,
+                        em_andamento: Optional[ConsultasEmAndamento] = None,
+                        monitor: Optional[SnapshotProcessos] = None,
+                        analise: Optional[EtapaAnalise] = None
+                        ) -> Tuple[List[ConsultaResultado], List[ConsultaResultado], List[ConsultaResultado], Dict]:
+    """
+    Processa as consultas de CPF no e-SAJ
+
+    `cpfs_validos` pode ser um DataFrame ou um `LeitorCsvEmBlocos`; no segundo
+    caso cada bloco é consultado assim que é lido do arquivo. Com `id_lote`,
+    cada consulta concluída é gravada em um diário em disco e uma execução
+    interrompida do mesmo lote continua de onde parou.
+
+    Linhas com o mesmo CPF normalizado são consultadas uma única vez e o
+    resultado é repassado a cada uma delas, inclusive quando estão em blocos
+    diferentes da leitura em blocos. Se outro lote (de outra sessão)
+    já está consultando o mesmo CPF, a consulta em andamento é aguardada em
+    vez de gerar uma nova requisição; na interface isso exige
+    `JOBS_CONFIG["max_simultaneos"]` > 1.
+
+    Sobrecarga, timeout e erro de rede são repetidos com backoff exponencial
+    até `RETENTATIVA_CONFIG["max_tentativas"]`; falhas seguidas abrem o
+    circuit breaker e pausam o lote inteiro. CPFs que continuam falhando vão
+    para a lista de erros (não para os não encontrados) e podem ser
+    consultados de novo depois.
+
+    Com `exportador`, as linhas são gravadas em disco assim que cada CPF é
+    concluído e as listas retornadas ficam vazias. Na leitura em blocos, fica
+    em memória apenas o conjunto dos CPFs já concluídos; os resultados, para
+    linhas repetidas em blocos seguintes, ficam em um SQLite temporário.
+
+    Com `monitor`, cada CPF consultado com sucesso é comparado com o snapshot
+    da execução anterior: o resultado passa a ter `novos` e `removidos` e o
+    snapshot é atualizado. O snapshot só é confirmado depois que as
+    alterações foram gravadas no diário e entregues ao exportador e a
+    `ao_concluir`; se o lote for interrompido, as comparações pendentes são
+    descartadas e, na retomada, as registradas no diário são reaplicadas.
+    As comparações de cada lote ficam em uma sessão própria do snapshot.
+    Nesse modo a lista de encontrados traz apenas os
+    CPFs com alteração (`processos` são os novos, `removidos` os que saíram).
+
+    Args:
+        cpfs_validos: CPFs a consultar (colunas cpf e nome)
+        delay_consulta: Intervalo global entre requisições em segundos (0 = sem limite)
+        workers: Consultas simultâneas
+        cliente: Cliente HTTP compartilhado
+        cache: Cache de resultados (None desativa)
+        id_lote: Identificador do lote para checkpoint (None desativa)
+        ao_concluir: Callback (cpf, nome, resultado) chamado na thread chamadora
+            a cada CPF concluído, inclusive os atendidos por cache ou checkpoint
+        limitador: Limitador de taxa (ex.: `LimitadorAdaptativo`); substitui
+            `delay_consulta` e recebe o desfecho de cada requisição
+        disjuntor: Circuit breaker do lote (um novo é criado se omitido)
+        exportador: Destino em disco dos resultados (None mantém as listas em memória)
+        em_andamento: Registro de consultas em andamento (padrão: o compartilhado
+            pelo processo, `CONSULTAS_EM_ANDAMENTO`)
+        monitor: Snapshot dos processos por CPF (None consulta sem comparar)
+        analise: Etapa de análise do HTML em processos separados (None analisa
+            na thread de cada consulta). As threads entregam as páginas com
+            processos à fila limitada da etapa e seguem para o próximo CPF; o
+            CPF é concluído quando a análise termina
+
+    Returns:
+        Tupla com (resultados_encontrados, resultados_nao_encontrados,
+        resultados_erros, estatisticas); os resultados são `ConsultaResultado`
+    """
+    resultados_encontrados = []
+    resultados_nao_encontrados = []
+    resultados_erros = []
+
+    blocos = cpfs_validos if isinstance(cpfs_validos, LeitorCsvEmBlocos) else [cpfs_validos]
+    total_itens = 0
+    acertos_cache = 0
+    total_erros = 0
+    duplicados = 0
+    processos_novos = 0
+    processos_removidos = 0
+    cpfs_alterados = 0
+
+    # O delay é o intervalo global entre requisições, compartilhado por todos os workers
+    if limitador is None:
+        limitador = LimitadorTaxa.por_intervalo(delay_consulta)
+    if disjuntor is None:
+        disjuntor = DisjuntorCircuito()
+    if em_andamento is None:
+        em_andamento = CONSULTAS_EM_ANDAMENTO
+    max_tentativas = max(1, RETENTATIVA_CONFIG["max_tentativas"])
+    retentativas = 0
+    compartilhadas = 0
+    lock_contadores = threading.Lock()
+
+    # CPFs já concluídos em blocos anteriores (apenas na leitura em blocos;
+    # com um DataFrame, `grupos` já reúne todas as linhas repetidas)
+    vistos = _ConcluidosNoLote() if isinstance(cpfs_validos, LeitorCsvEmBlocos) else None
+
+    diario = DiarioLote(id_lote) if id_lote else None
+    ja_concluidos = diario.carregar() if diario is not None else {}
+    retomados = 0
+
+    def consultar_com_retentativas(cpf, nome):
+        nonlocal retentativas
+        for tentativa in range(1, max_tentativas + 1):
+            disjuntor.aguardar()
+            limitador.aguardar()
+            resultado = consultar_esaj(cpf, nome, cliente, limitador=limitador, analise=analise)
+            sobrecarga = indica_sobrecarga(resultado)
+            limitador.registrar(resultado.get('tempo_requisicao'), sobrecarga)
+            if not sobrecarga:
+                disjuntor.registrar_sucesso()
+                break
+            disjuntor.registrar_falha()
+            if tentativa < max_tentativas:
+                with lock_contadores:
+                    retentativas += 1
+                METRICAS.incrementar("retentativas")
+                time.sleep(calcular_espera(tentativa))
+        resultado['tentativas'] = tentativa
+        return resultado
+
+    def consultar(item):
+        nonlocal compartilhadas
+        cpf, nome = item
+        resultado, compartilhado = em_andamento.executar(
+            normalizar_cpf(cpf), lambda: consultar_com_retentativas(cpf, nome)
+        )
+        # Cópia: o mesmo resultado pode ter sido entregue a outros lotes
+        resultado = dict(resultado)
+        resultado['data_consulta'] = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+        if compartilhado:
+            with lock_contadores:
+                compartilhadas += 1
+            METRICAS.incrementar("consultas_compartilhadas")
+        analise_pendente = resultado.get('analise')
+        if analise_pendente is None:
+            return registrar(cpf, resultado, compartilhado)
+
+        # Página na fila de análise: a thread volta a consultar e o resultado é
+        # completado pelo callback quando um processo termina de analisá-la
+        final = Future()
+
+        def ao_analisar(futuro):
+            try:
+                completo = completar_analise(cpf, resultado, futuro.result())
+            except Exception as e:
+                logger.error(f"💥 Erro na análise da página do CPF {cpf}: {e}")
+                completo = {
+                    "sucesso": False,
+                    "erro": f"Erro inesperado: {e}",
+                    "unexpected_error": True,
+                    "tentativas": resultado['tentativas'],
+                    "data_consulta": resultado['data_consulta']
+                }
+            try:
+                final.set_result(registrar(cpf, completo, compartilhado))
+            except Exception as e:
+                final.set_exception(e)
+
+        analise_pendente.add_done_callback(ao_analisar)
+        return final
+
+    def registrar(cpf, resultado, compartilhado):
+        if diario is not None:
+            diario.registrar(cpf, resultado)
+        # O lote que fez a requisição já gravou o resultado no cache
+        if cache is not None and not compartilhado:
+            cache.salvar(cpf, resultado)
+        return resultado
+
+    def notificar(item, resultado):
+        if not resultado['sucesso']:
+            METRICAS.incrementar("consultas", desfecho="erro")
+        else:
+            METRICAS.incrementar("consultas", desfecho="encontrado" if resultado['encontrado'] else "nao_encontrado")
+        if exportador is not None:
+            exportador.registrar(item[0], item[1], resultado)
+        if ao_concluir is not None:
+            ao_concluir(item[0], item[1], resultado)
+
+    def confirmar_snapshot():
+        # Só depois que as alterações foram entregues ao diário, ao exportador
+        # e a `ao_concluir`: interromper o lote não perde diferenças já
+        # gravadas no snapshot
+        if exportador is not None:
+            exportador.sincronizar()
+        sessao_monitor.confirmar()
+
+    # Comparações deste lote em uma sessão própria: confirmar ou descartar
+    # aqui não afeta outros lotes que usam o mesmo snapshot
+    sessao_monitor = monitor.sessao() if monitor is not None else None
+    try:
+        for bloco in blocos:
+            itens = list(zip(bloco['cpf'], bloco['nome']))
+            total_itens += len(itens)
+            if 'cpf_normalizado' in bloco:
+                chaves = bloco['cpf_normalizado'].tolist()
+            else:
+                chaves = [normalizar_cpf(cpf) for cpf, _ in itens]
+
+            # Cada CPF normalizado é consultado uma vez; `grupos` guarda as linhas que o repetem
+            grupos: Dict[str, List[int]] = {}
+            for indice, chave in enumerate(chaves):
+                grupos.setdefault(chave, []).append(indice)
+            duplicados += len(itens) - len(grupos)
+
+            resultados = [None] * len(itens)
+            pendentes = list(grupos)
+            if vistos is not None and vistos.chaves:
+                repetidos = vistos.obter_varios(chave for chave in grupos if chave in vistos)
+                for chave, resultado in repetidos.items():
+                    # Já consultado em um bloco anterior (e já comparado com o snapshot);
+                    # as demais linhas do grupo já entraram em `duplicados`
+                    duplicados += 1
+                    for indice in grupos[chave]:
+                        resultados[indice] = resultado
+                        notificar(itens[indice], resultado)
+                if repetidos:
+                    pendentes = [chave for chave in pendentes if chave not in repetidos]
+
+            def concluir(chave, resultado):
+                nonlocal processos_novos, processos_removidos, cpfs_alterados
+                if monitor is not None and resultado['sucesso']:
+                    if 'novos' in resultado:
+                        # Comparação registrada no diário por uma execução interrompida
+                        sessao_monitor.aplicar(chave, resultado['novos'], resultado['removidos'])
+                    else:
+                        if resultado['encontrado'] and not resultado['processos']:
+                            # Página com processos mas nada extraído: comparar apontaria
+                            # todos os processos conhecidos como removidos
+                            resultado['novos'], resultado['removidos'] = [], []
+                        else:
+                            resultado['novos'], resultado['removidos'] = sessao_monitor.comparar(chave, resultado['processos'])
+                        # As alterações entram no diário antes de o snapshot ser confirmado
+                        if diario is not None:
+                            diario.registrar(chave, resultado)
+                    processos_novos += len(resultado['novos'])
+                    processos_removidos += len(resultado['removidos'])
+                    if resultado['novos'] or resultado['removidos']:
+                        cpfs_alterados += 1
+                if vistos is not None:
+                    vistos.guardar(chave, resultado)
+                for indice in grupos[chave]:
+                    resultados[indice] = resultado
+                    notificar(itens[indice], resultado)
+                if sessao_monitor is not None and sessao_monitor.pendentes >= sessao_monitor.confirmar_a_cada:
+                    confirmar_snapshot()
+                return len(grupos[chave])
+
+            # CPFs já concluídos em uma execução anterior deste lote
+            if ja_concluidos:
+                restantes = []
+                for chave in pendentes:
+                    resultado = ja_concluidos.get(chave)
+                    if resultado is None:
+                        restantes.append(chave)
+                    else:
+                        retomados += concluir(chave, resultado)
+                pendentes = restantes
+
+            # Resultados recentes do cache não geram requisição ao e-SAJ
+            if cache is not None and pendentes:
+                acertos = cache.obter_varios(pendentes)
+                restantes = []
+                for chave in pendentes:
+                    resultado = acertos.get(chave)
+                    if resultado is None:
+                        restantes.append(chave)
+                    else:
+                        acertos_cache += concluir(chave, resultado)
+                METRICAS.incrementar("cache_acertos", len(pendentes) - len(restantes))
+                METRICAS.incrementar("cache_faltas", len(restantes))
+                pendentes = restantes
+
+            # O limitador é aplicado dentro de `consultar`, a cada tentativa; a
+            # consulta usa o CPF e o nome da primeira linha de cada grupo
+            executar_em_paralelo(
+                [itens[grupos[chave][0]] for chave in pendentes], consultar, workers,
+                ao_concluir=lambda indice, _, resultado: concluir(pendentes[indice], resultado)
+            )
+            if monitor is not None:
+                confirmar_snapshot()
+
+            if exportador is not None:
+                total_erros += sum(1 for resultado in resultados if not resultado['sucesso'])
+                continue
+
+            # Montar listas na ordem original do arquivo. Linhas do mesmo CPF
+            # compartilham o mesmo resultado e, portanto, a mesma tupla de processos
+            processos_convertidos = {}
+            for (cpf, nome), resultado in zip(itens, resultados):
+                if not resultado['sucesso']:
+                    resultados_erros.append(ConsultaResultado(
+                        cpf, nome, resultado['data_consulta'],
+                        erro=resultado.get('erro', ''), tentativas=resultado.get('tentativas', 1)
+                    ))
+                elif monitor is not None:
+                    if resultado['novos'] or resultado['removidos']:
+                        alteracoes = processos_convertidos.get(id(resultado))
+                        if alteracoes is None:
+                            alteracoes = processos_convertidos[id(resultado)] = (
+                                converter_processos(resultado['novos']), converter_processos(resultado['removidos'])
+                            )
+                        resultados_encontrados.append(ConsultaResultado(
+                            cpf, nome, resultado['data_consulta'], nome_extraido=resultado.get('nome_extraido', ''),
+                            processos=alteracoes[0], paginas=resultado.get('paginas', 1), removidos=alteracoes[1]
+                        ))
+                    elif not resultado['encontrado']:
+                        resultados_nao_encontrados.append(ConsultaResultado(cpf, nome, resultado['data_consulta']))
+                elif resultado['encontrado']:
+                    processos = processos_convertidos.get(id(resultado))
+                    if processos is None:
+                        processos = processos_convertidos[id(resultado)] = converter_processos(resultado['processos'])
+                    resultados_encontrados.append(ConsultaResultado(
+                        cpf, nome, resultado['data_consulta'], nome_extraido=resultado['nome_extraido'],
+                        processos=processos, paginas=resultado.get('paginas', 1)
+                    ))
+                else:
+                    resultados_nao_encontrados.append(ConsultaResultado(cpf, nome, resultado['data_consulta']))
+    except BaseException:
+        # Comparações cujas alterações ainda não foram entregues são refeitas na próxima execução
+        if sessao_monitor is not None:
+            sessao_monitor.descartar()
+        raise
+    finally:
+        if vistos is not None:
+            vistos.fechar()
+        if sessao_monitor is not None:
+            sessao_monitor.fechar()
+        # Cancelado ou com erro, o diário fica no disco para a retomada, mas fechado
+        if diario is not None:
+            diario.fechar()
+
+    total_erros += len(resultados_erros)
+
+    # Lote concluído: o diário não é mais necessário. Com erros ele é mantido,
+    # de modo que reenviar o arquivo consulta apenas os CPFs que falharam
+    if diario is not None and not total_erros:
+        diario.remover()
+
+    estatisticas = {
+        'acertos': acertos_cache,
+        'consultas': total_itens,
+        'taxa_acerto': acertos_cache / total_itens if total_itens else 0.0,
+        'retomados': retomados,
+        'erros': total_erros,
+        'retentativas': retentativas,
+        'pausas_circuito': disjuntor.aberturas,
+        'duplicados': duplicados,
+        'compartilhadas': compartilhadas,
+        'processos_novos': processos_novos,
+        'processos_removidos': processos_removidos,
+        'cpfs_alterados': cpfs_alterados
+    }
+
+    return resultados_encontrados, resultados_nao_encontrados, resultados_erros, estatisticas
@@ -0,0 +1,263 @@
+"""
+Métricas de tempo por etapa e contadores, exportáveis em Prometheus ou JSON
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from config import METRICAS_CONFIG
+
+PREFIXO = "esaj"
+
+# Limites dos buckets em segundos, de operações em memória até requisições lentas
+LIMITES_PADRAO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histograma:
+    """
+    Histograma de buckets cumulativos no formato do Prometheus
+
+    Guarda apenas a contagem por bucket, a soma e o total: a memória é fixa,
+    qualquer que seja o número de observações.
+    """
+
+    def __init__(self, limites: Sequence[float] = LIMITES_PADRAO):
+        self.limites = tuple(limites)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def quantil(self, fracao: float) -> Optional[float]:
+        """
+        Estimativa do quantil por interpolação linear dentro do bucket
+
+        Args:
+            fracao: Quantil entre 0 e 1 (ex.: 0.95)
+
+        Returns:
+            Valor estimado (o maior limite se cair no bucket +Inf), ou None sem observações
+        """
+        if not self.total:
+            return None
+        alvo = fracao * self.total
+        acumulado = 0
+        for indice, contagem in enumerate(self.contagens):
+            if contagem and acumulado + contagem >= alvo:
+                if indice == len(self.limites):
+                    return self.limites[-1]
+                inferior = self.limites[indice - 1] if indice else 0.0
+                return inferior + (self.limites[indice] - inferior) * (alvo - acumulado) / contagem
+            acumulado += contagem
+        return self.limites[-1]
+
+
+def _formatar_rotulos(rotulos: Tuple[Tuple[str, str], ...]) -> str:
+    if not rotulos:
+        return ""
+    return "{" + ",".join(f'{chave}="{valor}"' for chave, valor in rotulos) + "}"
+
+
+class RegistroMetricas:
+    """
+    Registro de métricas compartilhado por todas as threads do processo
+
+    Tempos são observados por etapa (leitura do CSV, validação, conexão HTTP,
+    primeiro byte, download, parse, exportação) em histogramas; eventos como
+    status HTTP, retentativas e acertos de cache são contadores com rótulos.
+    """
+
+    def __init__(self, limites: Sequence[float] = LIMITES_PADRAO):
+        self.limites = tuple(limites)
+        self.iniciado_em = time.time()
+        self._lock = threading.Lock()
+        self._etapas: Dict[str, Histograma] = {}
+        self._contadores: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def observar(self, etapa: str, segundos: float):
+        """
+        Registra a duração de uma etapa
+
+        Args:
+            etapa: Nome da etapa (ex.: "parse_html")
+            segundos: Duração medida
+        """
+        with self._lock:
+            histograma = self._etapas.get(etapa)
+            if histograma is None:
+                histograma = self._etapas[etapa] = Histograma(self.limites)
+            histograma.observar(segundos)
+
+    @contextmanager
+    def medir(self, etapa: str) -> Iterator[None]:
+        """Mede o bloco `with` e registra a duração na etapa"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(etapa, time.perf_counter() - inicio)
+
+    def incrementar(self, nome: str, valor: float = 1, **rotulos):
+        """
+        Soma `valor` a um contador
+
+        Args:
+            nome: Nome do contador (ex.: "respostas_http")
+            valor: Incremento
+            **rotulos: Rótulos do contador (ex.: status=200)
+        """
+        chave = (nome, tuple(sorted((k, str(v)) for k, v in rotulos.items())))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def contador(self, nome: str, **rotulos) -> float:
+        """
+        Valor de um contador somando os rótulos não informados
+
+        Args:
+            nome: Nome do contador
+            **rotulos: Filtro de rótulos (ex.: status=429)
+
+        Returns:
+            Soma dos contadores compatíveis
+        """
+        filtro = {k: str(v) for k, v in rotulos.items()}
+        with self._lock:
+            return sum(valor for (nome_contador, rotulos_contador), valor in self._contadores.items()
+                       if nome_contador == nome and filtro.items() <= dict(rotulos_contador).items())
+
+    def etapas(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        Resumo de cada etapa
+
+        Returns:
+            Dicionário {etapa: {contagem, total_s, media_s, p50_s, p95_s, p99_s}}
+        """
+        with self._lock:
+            return {
+                etapa: {
+                    "contagem": histograma.total,
+                    "total_s": histograma.soma,
+                    "media_s": histograma.soma / histograma.total if histograma.total else None,
+                    "p50_s": histograma.quantil(0.50),
+                    "p95_s": histograma.quantil(0.95),
+                    "p99_s": histograma.quantil(0.99)
+                }
+                for etapa, histograma in sorted(self._etapas.items())
+            }
+
+    def exportar_json(self) -> Dict:
+        """Etapas e contadores em um dicionário serializável"""
+        with self._lock:
+            contadores = {f"{nome}_total{_formatar_rotulos(rotulos)}": valor
+                          for (nome, rotulos), valor in sorted(self._contadores.items())}
+        return {
+            "iniciado_em": self.iniciado_em,
+            "gerado_em": time.time(),
+            "etapas": self.etapas(),
+            "contadores": contadores
+        }
+
+    def gravar_json(self, caminho: str):
+        """
+        Grava `exportar_json` em arquivo (substituição atômica)
+
+        Args:
+            caminho: Arquivo de destino
+        """
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(self.exportar_json(), arquivo, indent=2, ensure_ascii=False)
+        os.replace(temporario, caminho)
+
+    def exportar_prometheus(self) -> str:
+        """Métricas no formato de texto do Prometheus (versão 0.0.4)"""
+        linhas = []
+        with self._lock:
+            if self._etapas:
+                nome = f"{PREFIXO}_etapa_segundos"
+                linhas += [f"# HELP {nome} Duração de cada etapa do lote em segundos",
+                           f"# TYPE {nome} histogram"]
+                for etapa, histograma in sorted(self._etapas.items()):
+                    acumulado = 0
+                    for limite, contagem in zip(self.limites + (float("inf"),), histograma.contagens):
+                        acumulado += contagem
+                        le = "+Inf" if limite == float("inf") else repr(float(limite))
+                        linhas.append(f'{nome}_bucket{{etapa="{etapa}",le="{le}"}} {acumulado}')
+                    linhas.append(f'{nome}_sum{{etapa="{etapa}"}} {histograma.soma}')
+                    linhas.append(f'{nome}_count{{etapa="{etapa}"}} {histograma.total}')
+
+            anterior = None
+            for (nome, rotulos), valor in sorted(self._contadores.items()):
+                nome_completo = f"{PREFIXO}_{nome}_total"
+                if nome != anterior:
+                    linhas.append(f"# TYPE {nome_completo} counter")
+                    anterior = nome
+                linhas.append(f"{nome_completo}{_formatar_rotulos(rotulos)} {valor:g}")
+        return "\n".join(linhas) + "\n"
+
+    def zerar(self):
+        """Descarta todas as observações"""
+        with self._lock:
+            self._etapas.clear()
+            self._contadores.clear()
+            self.iniciado_em = time.time()
+
+
+# Registro do processo, compartilhado pela interface, jobs e linha de comando
+METRICAS = RegistroMetricas()
+
+
+def iniciar_servidor_metricas(porta: Optional[int] = None, endereco: Optional[str] = None,
+                              registro: RegistroMetricas = METRICAS) -> ThreadingHTTPServer:
+    """
+    Serve `/metrics` (Prometheus) e `/metrics.json` em uma thread em segundo plano
+
+    Args:
+        porta: Porta TCP (padrão: METRICAS_CONFIG["porta_prometheus"]; 0 = livre)
+        endereco: Interface de escuta (padrão: METRICAS_CONFIG["endereco"])
+        registro: Registro exportado
+
+    Returns:
+        Servidor iniciado (`shutdown()` para parar)
+    """
+    porta = METRICAS_CONFIG["porta_prometheus"] if porta is None else porta
+    endereco = endereco or METRICAS_CONFIG["endereco"]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                corpo = registro.exportar_prometheus().encode("utf-8")
+                tipo = "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path == "/metrics.json":
+                corpo = json.dumps(registro.exportar_json(), ensure_ascii=False).encode("utf-8")
+                tipo = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((endereco, porta), Handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True, name="metricas").start()
+    return servidor
@@ -0,0 +1,208 @@
+"""
+Snapshot dos processos de cada CPF para o modo de monitoramento
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import MONITOR_CONFIG
+from utils import normalizar_cpf
+
+
+def _conectar(caminho: str) -> sqlite3.Connection:
+    # Transações explícitas: a gravação usa BEGIN IMMEDIATE entre lotes e processos
+    conexao = sqlite3.connect(caminho, timeout=30, isolation_level=None, check_same_thread=False)
+    conexao.execute("PRAGMA journal_mode=WAL")
+    return conexao
+
+
+class SnapshotProcessos:
+    """
+    Conjunto de números de processo conhecidos por CPF, em SQLite
+
+    A chave primária (cpf, numero) é o índice usado na comparação: cada CPF
+    custa uma leitura indexada dos seus próprios processos, independente do
+    tamanho da carteira.
+
+    Pode ser compartilhado entre lotes (sessões e jobs): cada lote compara
+    em uma `SessaoSnapshot` própria, aberta com `sessao`, com conexão e
+    alterações pendentes só suas.
+    """
+
+    def __init__(self, caminho: Optional[str] = None, confirmar_a_cada: Optional[int] = None):
+        self.caminho = caminho or MONITOR_CONFIG["caminho"]
+        self.confirmar_a_cada = confirmar_a_cada or MONITOR_CONFIG["confirmar_a_cada"]
+
+        diretorio = os.path.dirname(self.caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+        conexao = _conectar(self.caminho)
+        try:
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS processos (
+                    cpf TEXT NOT NULL,
+                    numero TEXT NOT NULL,
+                    classe TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (cpf, numero)
+                ) WITHOUT ROWID
+            """)
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS monitorados (
+                    cpf TEXT PRIMARY KEY,
+                    atualizado_em REAL NOT NULL
+                )
+            """)
+        finally:
+            conexao.close()
+
+    def sessao(self) -> "SessaoSnapshot":
+        """
+        Abre a unidade de trabalho de um lote
+
+        Returns:
+            Sessão com conexão própria; feche com `SessaoSnapshot.fechar`
+        """
+        return SessaoSnapshot(self.caminho, self.confirmar_a_cada)
+
+    def estatisticas(self) -> Dict:
+        """
+        Tamanho do snapshot (apenas comparações confirmadas)
+
+        Returns:
+            Dicionário com cpfs monitorados e total de processos
+        """
+        conexao = _conectar(self.caminho)
+        try:
+            cpfs = conexao.execute("SELECT COUNT(*) FROM monitorados").fetchone()[0]
+            processos = conexao.execute("SELECT COUNT(*) FROM processos").fetchone()[0]
+        finally:
+            conexao.close()
+        return {"cpfs": cpfs, "processos": processos}
+
+
+class SessaoSnapshot:
+    """
+    Comparações de um lote com o snapshot
+
+    As alterações ficam pendentes na sessão (em memória, no máximo as
+    comparações entre duas confirmações) e só são gravadas em `confirmar`,
+    em uma transação curta com BEGIN IMMEDIATE; `descartar` as desfaz sem
+    tocar no banco. Assim, confirmar ou descartar em um lote nunca grava nem
+    desfaz comparações de outro lote que use o mesmo snapshot.
+    """
+
+    def __init__(self, caminho: str, confirmar_a_cada: int):
+        self.confirmar_a_cada = confirmar_a_cada
+        self._lock = threading.Lock()
+        self._conexao = _conectar(caminho)
+        # (cpf, novos, removidos) na ordem das comparações
+        self._alteracoes: List[Tuple[str, List[Dict], List[Dict]]] = []
+        # Processos de cada CPF comparado nesta sessão, ainda não confirmados
+        self._atuais: Dict[str, Dict[str, Dict]] = {}
+
+    def comparar(self, cpf: str, processos: Iterable[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Compara os processos atuais com o snapshot
+
+        Na primeira consulta de um CPF todos os processos aparecem como novos.
+        A atualização do snapshot fica pendente até `confirmar`.
+
+        Args:
+            cpf: CPF em qualquer formato
+            processos: Processos da consulta atual (numero, classe e data)
+
+        Returns:
+            Tupla (novos, removidos) com dicionários numero, classe e data
+        """
+        chave = normalizar_cpf(cpf)
+        atuais = {processo['numero']: processo for processo in processos}
+
+        with self._lock:
+            anteriores = self._atuais.get(chave)
+            if anteriores is None:
+                anteriores = {
+                    numero: {'numero': numero, 'classe': classe, 'data': data}
+                    for numero, classe, data in self._conexao.execute(
+                        "SELECT numero, classe, data FROM processos WHERE cpf = ?", (chave,)
+                    )
+                }
+            novos = [processo for numero, processo in atuais.items() if numero not in anteriores]
+            removidos = [processo for numero, processo in anteriores.items() if numero not in atuais]
+            self._alteracoes.append((chave, novos, removidos))
+            self._atuais[chave] = atuais
+
+        return novos, removidos
+
+    def aplicar(self, cpf: str, novos: Iterable[Dict], removidos: Iterable[Dict]):
+        """
+        Refaz no snapshot uma comparação já feita (ex.: registrada no diário do lote)
+
+        Aplicar de novo uma comparação já gravada não altera o snapshot.
+
+        Args:
+            cpf: CPF em qualquer formato
+            novos: Processos novos da comparação
+            removidos: Processos removidos da comparação
+        """
+        chave = normalizar_cpf(cpf)
+        novos, removidos = list(novos), list(removidos)
+        with self._lock:
+            self._alteracoes.append((chave, novos, removidos))
+            atuais = self._atuais.get(chave)
+            if atuais is not None:
+                atuais.update((processo['numero'], processo) for processo in novos)
+                for processo in removidos:
+                    atuais.pop(processo['numero'], None)
+
+    @property
+    def pendentes(self) -> int:
+        """Comparações ainda não confirmadas"""
+        with self._lock:
+            return len(self._alteracoes)
+
+    def confirmar(self):
+        """Grava as comparações pendentes"""
+        with self._lock:
+            if not self._alteracoes:
+                return
+            agora = time.time()
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                for chave, novos, removidos in self._alteracoes:
+                    if novos:
+                        self._conexao.executemany(
+                            "INSERT OR REPLACE INTO processos (cpf, numero, classe, data) VALUES (?, ?, ?, ?)",
+                            [(chave, p['numero'], p['classe'], p['data']) for p in novos]
+                        )
+                    if removidos:
+                        self._conexao.executemany(
+                            "DELETE FROM processos WHERE cpf = ? AND numero = ?",
+                            [(chave, p['numero']) for p in removidos]
+                        )
+                    self._conexao.execute(
+                        "INSERT OR REPLACE INTO monitorados (cpf, atualizado_em) VALUES (?, ?)", (chave, agora)
+                    )
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+            self._conexao.execute("COMMIT")
+            self._alteracoes.clear()
+            self._atuais.clear()
+
+    def descartar(self):
+        """Desfaz as comparações pendentes desta sessão (lote interrompido antes de registrar as alterações)"""
+        with self._lock:
+            self._alteracoes.clear()
+            self._atuais.clear()
+
+    def fechar(self):
+        """Fecha a conexão; comparações não confirmadas são descartadas"""
+        with self._lock:
+            self._alteracoes.clear()
+            self._atuais.clear()
+            self._conexao.close()
@@ -0,0 +1,161 @@
+"""
+Parser de passagem única para as páginas de resultado do e-SAJ
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Padrões pré-compilados sobre bytes; todos começam por um literal, o que permite
+# ao `re` saltar direto para as ocorrências em vez de testar cada posição
+_INICIO_PROCESSO = re.compile(rb'<li>\s*<div id="divProcesso[^"]*"[^>]*>')
+_FIM_PROCESSO = re.compile(rb'</div>\s*</li>')
+_NUMERO = re.compile(rb'class="linkProcesso"[^>]*>\s*([^<\s]+)')
+_CLASSE = re.compile(rb'<div class="classeProcesso">([^<]+)</div>')
+_DATA = re.compile(rb'<div class="dataLocalDistribuicaoProcesso">([^<]+?)\s*-')
+_NOME = re.compile(rb'<div class="unj-base-alt nomeParte">\s*([^<]+)')
+_TOTAL = re.compile(rb'(\d+)\s+Processos encontrados')
+_PAGINA = re.compile(rb'trocarPagina\.do\?[^"\']*?paginaConsulta=(\d+)')
+
+_MARCADORES_PROCESSOS = (b"Processos encontrados", b"linkProcesso")
+# "Não existem informações disponíveis...": trecho em ASCII, igual em UTF-8 e ISO-8859-1
+_MARCADORES_SEM_PROCESSOS = (b"existem informa",)
+_MARCADOR_TOTAL = b"Processos encontrados"
+_MARCADOR_PAGINACAO = b"trocarPagina.do"
+
+
+def _decidir(conteudo: bytes, marcadores_processos: Tuple[bytes, ...]) -> Optional[bool]:
+    # Regra única para os marcadores: a mensagem de "não existem informações"
+    # prevalece sobre qualquer marcador de processos presente na mesma página
+    if any(marcador in conteudo for marcador in _MARCADORES_SEM_PROCESSOS):
+        return False
+    if any(marcador in conteudo for marcador in marcadores_processos):
+        return True
+    return None
+
+
+class ParserEsaj:
+    """
+    Extrai nome e processos de uma página do e-SAJ em uma única varredura
+
+    Trabalha direto sobre os bytes da resposta (`response.content`) com
+    padrões pré-compilados e só decodifica os trechos capturados. Produz a
+    mesma saída que a extração original por regex sobre o texto
+    (`benchmarks/extracao_original.py`).
+    """
+
+    def __init__(self, encoding: str = "utf-8"):
+        self.encoding = encoding
+
+    def _texto(self, valor: bytes, encoding: str) -> str:
+        return valor.decode(encoding, errors="replace").strip()
+
+    @staticmethod
+    def tem_processos(conteudo: bytes) -> bool:
+        """
+        Verifica se a página indica processos encontrados
+
+        Args:
+            conteudo: Corpo da resposta em bytes
+
+        Returns:
+            True se algum marcador de processos está presente e a mensagem de
+            "não existem informações" não está (a mesma precedência de `decidir_parcial`)
+        """
+        return _decidir(conteudo, _MARCADORES_PROCESSOS) is True
+
+    @staticmethod
+    def decidir_parcial(conteudo: bytes) -> Optional[bool]:
+        """
+        Decide se há processos com apenas o início da página
+
+        A mensagem de "não existem informações" e o total de "Processos
+        encontrados" ficam na mesma região, logo após o cabeçalho; o restante
+        da página não muda a decisão. `linkProcesso` só aparece depois, na
+        lista de processos, e não é usado aqui.
+
+        Args:
+            conteudo: Bytes recebidos até agora
+
+        Returns:
+            False (não encontrado), True (encontrado) ou None (ainda não é possível decidir)
+        """
+        return _decidir(conteudo, (_MARCADOR_TOTAL,))
+
+    @staticmethod
+    def tem_paginacao(conteudo: bytes) -> bool:
+        """
+        Verifica, sem expressões regulares, se a página tem links para outras páginas
+
+        Args:
+            conteudo: Corpo da primeira página em bytes
+
+        Returns:
+            True se há links de paginação (use `paginacao` para os detalhes)
+        """
+        return _MARCADOR_PAGINACAO in conteudo
+
+    @staticmethod
+    def paginacao(conteudo: bytes) -> Tuple[Optional[int], int, int]:
+        """
+        Detecta a paginação da lista de processos
+
+        Args:
+            conteudo: Corpo da primeira página em bytes
+
+        Returns:
+            Tupla com (total de processos informado pela página ou None,
+            maior número de página referenciado nos links, 1 sem paginação,
+            e blocos de processo na página, inclusive os que não puderam ser
+            extraídos: o tamanho da página)
+        """
+        total = _TOTAL.search(conteudo)
+        paginas = [int(numero) for numero in _PAGINA.findall(conteudo)]
+        por_pagina = sum(1 for _ in _INICIO_PROCESSO.finditer(conteudo))
+        return (int(total.group(1)) if total else None), max(paginas, default=1), por_pagina
+
+    def analisar(self, conteudo: bytes, encoding: Optional[str] = None) -> Dict:
+        """
+        Extrai nome do requerente e processos da página
+
+        Args:
+            conteudo: Corpo da resposta em bytes
+            encoding: Encoding da página (usa o padrão do parser se omitido)
+
+        Returns:
+            Dicionário com nome_extraido (str) e processos (lista de dicionários
+            com numero, classe e data)
+        """
+        encoding = encoding or self.encoding
+        processos: List[Dict] = []
+        posicao = 0
+
+        # Uma única varredura para frente: cada bloco de processo é delimitado
+        # e os campos são buscados apenas dentro dele, sem copiar substrings
+        while True:
+            inicio = _INICIO_PROCESSO.search(conteudo, posicao)
+            if inicio is None:
+                break
+            fim = _FIM_PROCESSO.search(conteudo, inicio.end())
+            if fim is None:
+                break
+            posicao = fim.end()
+
+            numero = _NUMERO.search(conteudo, inicio.start(), posicao)
+            classe = _CLASSE.search(conteudo, inicio.start(), posicao)
+            data = _DATA.search(conteudo, inicio.start(), posicao)
+            if numero is None or classe is None or data is None:
+                continue
+
+            processo = {
+                "numero": self._texto(numero.group(1), encoding),
+                "classe": self._texto(classe.group(1), encoding),
+                "data": self._texto(data.group(1), encoding)
+            }
+            if processo["numero"] and processo["classe"] and processo["data"]:
+                processos.append(processo)
+
+        nome = _NOME.search(conteudo)
+        return {
+            "nome_extraido": self._texto(nome.group(1), encoding) if nome else "",
+            "processos": processos
+        }
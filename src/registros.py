@@ -0,0 +1,150 @@
+"""
+Registros compactos para os resultados mantidos em memória durante o lote
+"""
+
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+
+class _Registro:
+    """
+    Base dos registros com `__slots__`
+
+    Sem `__dict__` por instância, cada registro ocupa uma fração de um
+    dicionário equivalente. O acesso por chave (`registro['cpf']`, `get`) é
+    mantido para o código que já tratava os resultados como dicionários.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, campo: str) -> Any:
+        try:
+            return getattr(self, campo)
+        except AttributeError:
+            raise KeyError(campo) from None
+
+    def get(self, campo: str, padrao: Any = None) -> Any:
+        return getattr(self, campo, padrao)
+
+    def como_dict(self) -> Dict[str, Any]:
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+    def __eq__(self, outro) -> bool:
+        if type(outro) is not type(self):
+            return NotImplemented
+        return all(getattr(self, campo) == getattr(outro, campo) for campo in self.__slots__)
+
+    def __repr__(self) -> str:
+        campos = ", ".join(f"{campo}={getattr(self, campo)!r}" for campo in self.__slots__)
+        return f"{type(self).__name__}({campos})"
+
+
+class Processo(_Registro):
+    """Processo extraído da página do e-SAJ"""
+
+    __slots__ = ("numero", "classe", "data")
+
+    def __init__(self, numero: str, classe: str, data: str):
+        self.numero = numero
+        self.classe = classe
+        self.data = data
+
+    @classmethod
+    def de_dict(cls, processo: Union[Dict, "Processo"]) -> "Processo":
+        if isinstance(processo, Processo):
+            return processo
+        return cls(processo['numero'], processo['classe'], processo['data'])
+
+
+class ConsultaResultado(_Registro):
+    """
+    Resultado de um CPF nas listas devolvidas por `processar_consultas`
+
+    Um único tipo para encontrados, não encontrados e erros; os campos que
+    não se aplicam ficam com o valor padrão. No modo de monitoramento
+    `processos` traz apenas os processos novos e `removidos` os que saíram.
+    """
+
+    __slots__ = ("cpf", "nome", "data_consulta", "nome_extraido", "processos", "paginas", "erro", "tentativas",
+                 "removidos")
+
+    def __init__(self, cpf: str, nome: str, data_consulta: str, nome_extraido: str = "",
+                 processos: Tuple[Processo, ...] = (), paginas: int = 1, erro: str = "", tentativas: int = 1,
+                 removidos: Tuple[Processo, ...] = ()):
+        self.cpf = cpf
+        self.nome = nome
+        self.data_consulta = data_consulta
+        self.nome_extraido = nome_extraido
+        self.processos = processos
+        self.paginas = paginas
+        self.erro = erro
+        self.tentativas = tentativas
+        self.removidos = removidos
+
+    @property
+    def total_processos(self) -> int:
+        return len(self.processos)
+
+    def __getitem__(self, campo: str) -> Any:
+        if campo == "total_processos":
+            return self.total_processos
+        return super().__getitem__(campo)
+
+    def get(self, campo: str, padrao: Any = None) -> Any:
+        if campo == "total_processos":
+            return self.total_processos
+        return super().get(campo, padrao)
+
+
+def converter_processos(processos: Iterable[Union[Dict, Processo]]) -> Tuple[Processo, ...]:
+    """
+    Converte a lista de processos de `consultar_esaj` em uma tupla de `Processo`
+
+    Args:
+        processos: Dicionários com numero, classe e data (ou registros)
+
+    Returns:
+        Tupla imutável, que pode ser compartilhada entre linhas do mesmo CPF
+    """
+    return tuple(Processo.de_dict(processo) for processo in processos)
+
+
+def colunas_encontrados(resultados: Iterable[Union[Dict, ConsultaResultado]]) -> Dict[str, List]:
+    """
+    Monta as colunas do CSV de encontrados (uma linha por processo)
+
+    As listas de cada coluna são preenchidas diretamente, sem criar um
+    dicionário por linha.
+
+    Args:
+        resultados: Resultados encontrados (registros ou dicionários com
+            cpf, nome, nome_extraido, processos e data_consulta)
+
+    Returns:
+        Dicionário {coluna: valores} na ordem das colunas do download
+    """
+    colunas = {nome: [] for nome in ('CPF', 'Nome', 'Nome_Extraido', 'Sequencia_Processo', 'Numero_Processo',
+                                     'Classe_Processo', 'Data_Processo', 'Data_Consulta')}
+    cpfs, nomes, nomes_extraidos = colunas['CPF'], colunas['Nome'], colunas['Nome_Extraido']
+    sequencias, numeros = colunas['Sequencia_Processo'], colunas['Numero_Processo']
+    classes, datas, datas_consulta = colunas['Classe_Processo'], colunas['Data_Processo'], colunas['Data_Consulta']
+
+    for resultado in resultados:
+        processos = resultado['processos']
+        # Encontrado sem processos extraídos: uma linha com sequência 0
+        linhas = len(processos) or 1
+        cpfs.extend([resultado['cpf']] * linhas)
+        nomes.extend([resultado['nome']] * linhas)
+        nomes_extraidos.extend([resultado['nome_extraido']] * linhas)
+        datas_consulta.extend([resultado['data_consulta']] * linhas)
+        if processos:
+            sequencias.extend(range(1, linhas + 1))
+            for processo in processos:
+                numeros.append(processo['numero'])
+                classes.append(processo['classe'])
+                datas.append(processo['data'])
+        else:
+            sequencias.append(0)
+            numeros.append('')
+            classes.append('')
+            datas.append('')
+    return colunas
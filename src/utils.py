@@ -2,14 +2,27 @@
 Utilitários para a aplicação Streamlit de consulta CPF e-SAJ
 """
 
+import os
 import re
+import tempfile
+import numpy as np
 import pandas as pd
 import requests
 import logging
+import logging.handlers
+import atexit
+import queue
+import threading
 import time
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
-from config import ESAJ_CONFIG, HEADERS, LOG_CONFIG
+from typing import Dict, Iterator, List, Tuple, Optional
+from config import ESAJ_CONFIG, FILE_CONFIG, HEADERS, LOG_CONFIG
+from analise import EtapaAnalise, analisar_pagina
+from cliente import EsajClient, obter_cliente_padrao
+from concorrencia import LimitadorTaxa, executar_em_paralelo
+from metricas import METRICAS
+from parser_esaj import ParserEsaj
+from registros import colunas_encontrados
 
 def normalizar_cpf(cpf: str) -> str:
     """
@@ -63,6 +76,88 @@ def validar_cpf(cpf: str) -> bool:
     
     return cpf[-2:] == f"{digito1}{digito2}"
 
+# Pesos dos dígitos verificadores do CPF
+_PESOS_DIGITO1 = np.arange(10, 1, -1)
+_PESOS_DIGITO2 = np.arange(11, 1, -1)
+
+def validar_cpfs_vetorizado(cpfs: pd.Series) -> pd.DataFrame:
+    """
+    Normaliza e valida uma série de CPFs sem percorrer linha a linha
+    
+    Equivalente a aplicar `normalizar_cpf` e `validar_cpf` em cada valor, mas
+    usando operações `.str` do pandas e cálculo matricial dos dígitos
+    verificadores com NumPy.
+    
+    Args:
+        cpfs: Série com CPFs em qualquer formato
+        
+    Returns:
+        DataFrame com colunas cpf_normalizado, cpf_tamanho_ok e cpf_valido
+    """
+    texto = cpfs.astype(str)
+    digitos = texto.str.replace(r'[^0-9]', '', regex=True).fillna('')
+    normalizado = digitos.str.slice(0, 11).str.zfill(11)
+    tamanho = digitos.str.len()
+    tamanho_ok = ((tamanho >= 9) & (tamanho <= 11)).to_numpy(dtype=bool, copy=True)
+    valido = np.zeros(len(cpfs), dtype=bool)
+    
+    # normalizar_cpf aceita dígitos Unicode (ex.: '٣'); valores não ASCII seguem pelo caminho escalar
+    nao_ascii = texto.str.contains(r'[^\x00-\x7f]', regex=True, na=False).to_numpy(dtype=bool)
+    candidatos = tamanho_ok & ~nao_ascii
+    
+    if candidatos.any():
+        bytes_cpfs = ''.join(normalizado[candidatos].tolist()).encode('ascii')
+        matriz = np.frombuffer(bytes_cpfs, dtype=np.uint8).reshape(-1, 11).astype(np.int64) - 48
+        
+        resto1 = (matriz[:, :9] @ _PESOS_DIGITO1) % 11
+        digito1 = np.where(resto1 < 2, 0, 11 - resto1)
+        resto2 = (matriz[:, :10] @ _PESOS_DIGITO2) % 11
+        digito2 = np.where(resto2 < 2, 0, 11 - resto2)
+        
+        repetido = (matriz == matriz[:, :1]).all(axis=1)
+        valido[candidatos] = (matriz[:, 9] == digito1) & (matriz[:, 10] == digito2) & ~repetido
+    
+    normalizado = normalizado.to_numpy(dtype=object, copy=True)
+    if nao_ascii.any():
+        for posicao in np.flatnonzero(nao_ascii):
+            cpf = cpfs.iloc[posicao]
+            normalizado[posicao] = normalizar_cpf(cpf)
+            tamanho_ok[posicao] = 9 <= len(re.sub(r'\D', '', str(cpf))) <= 11
+            valido[posicao] = tamanho_ok[posicao] and validar_cpf(cpf)
+    
+    return pd.DataFrame({
+        "cpf_normalizado": normalizado,
+        "cpf_tamanho_ok": tamanho_ok,
+        "cpf_valido": valido
+    }, index=cpfs.index)
+
+def _preparar_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Padroniza colunas e adiciona as colunas de validação de CPF
+    
+    Args:
+        df: DataFrame lido do CSV (arquivo inteiro ou um bloco)
+        
+    Returns:
+        DataFrame com colunas cpf, nome, cpf_normalizado, cpf_tamanho_ok e cpf_valido
+    """
+    # Verificar colunas necessárias (aceitar 'Nome' e 'CPF' ou 'nome' e 'cpf')
+    if 'CPF' in df.columns and 'Nome' in df.columns:
+        # Renomear colunas para minúsculas para padronização
+        df = df.rename(columns={'CPF': 'cpf', 'Nome': 'nome'})
+    elif 'cpf' in df.columns and 'nome' in df.columns:
+        pass  # Já está no formato correto
+    else:
+        raise ValueError("CSV deve conter colunas 'CPF' e 'Nome' (ou 'cpf' e 'nome')")
+    
+    # Normalizar CPFs (aceitar 9-11 dígitos) e validar apenas os de tamanho adequado
+    with METRICAS.medir("validacao"):
+        validacao = validar_cpfs_vetorizado(df["cpf"])
+    df["cpf_normalizado"] = validacao["cpf_normalizado"]
+    df["cpf_tamanho_ok"] = validacao["cpf_tamanho_ok"]
+    df["cpf_valido"] = validacao["cpf_valido"]
+    return df
+
 def processar_csv(uploaded_file) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
     """
     Processa arquivo CSV e valida CPFs
@@ -75,95 +170,97 @@ def processar_csv(uploaded_file) -> Tuple[Optional[pd.DataFrame], Optional[pd.Da
     """
     try:
         # Ler CSV - IMPORTANTE: tratar coluna CPF como string para preservar zeros à esquerda
-        df = pd.read_csv(uploaded_file, dtype={'CPF': str, 'cpf': str})
-        
-        # Verificar colunas necessárias (aceitar 'Nome' e 'CPF' ou 'nome' e 'cpf')
-        if 'CPF' in df.columns and 'Nome' in df.columns:
-            # Renomear colunas para minúsculas para padronização
-            df = df.rename(columns={'CPF': 'cpf', 'Nome': 'nome'})
-        elif 'cpf' in df.columns and 'nome' in df.columns:
-            pass  # Já está no formato correto
-        else:
-            raise ValueError("CSV deve conter colunas 'CPF' e 'Nome' (ou 'cpf' e 'nome')")
-        
-        # Normalizar CPFs (aceitar 9-11 dígitos)
-        df["cpf_normalizado"] = df["cpf"].apply(normalizar_cpf)
-        
-        # Verificar se CPF tem entre 9 e 11 dígitos antes da normalização
-        df["cpf_tamanho_ok"] = df["cpf"].apply(lambda x: 9 <= len(re.sub(r'\D', '', str(x))) <= 11)
-        
-        # Validar CPFs apenas se tiverem tamanho adequado
-        df["cpf_valido"] = df.apply(lambda row: validar_cpf(row["cpf"]) if row["cpf_tamanho_ok"] else False, axis=1)
+        with METRICAS.medir("leitura_csv"):
+            df = pd.read_csv(uploaded_file, dtype={'CPF': str, 'cpf': str})
+        df = _preparar_dataframe(df)
         
         # Separar válidos e inválidos
-        cpfs_validos = df[df["cpf_valido"] == True].copy()
-        cpfs_invalidos = df[df["cpf_valido"] == False].copy()
+        cpfs_validos = df[df["cpf_valido"]].copy()
+        cpfs_invalidos = df[~df["cpf_valido"]].copy()
         
         return cpfs_validos, cpfs_invalidos
         
     except Exception as e:
         raise Exception(f"Erro ao processar CSV: {str(e)}")
 
-def extrair_processos_html(html: str) -> List[Dict]:
+class LeitorCsvEmBlocos:
     """
-    Extrai informações dos processos do HTML do e-SAJ
+    Leitura do CSV em blocos com memória limitada
     
-    Args:
-        html: Conteúdo HTML da resposta
-        
-    Returns:
-        Lista de dicionários com informações dos processos
+    Cada iteração entrega um DataFrame apenas com os CPFs válidos do bloco,
+    pronto para ser consultado. Os inválidos são gravados em um CSV em disco
+    em vez de ficarem na memória.
     """
-    processos = []
     
-    try:
-        # Buscar todas as seções de processo
-        processos_matches = re.findall(
-            r'<li>\s*<div id="divProcesso[^"]*"[^>]*>.*?</div>\s*</li>', 
-            html, 
-            re.DOTALL
-        )
-        
-        for processo_html in processos_matches:
-            # Extrair número do processo
-            numero_match = re.search(r'class="linkProcesso"[^>]*>\s*([^<\s]+)', processo_html)
-            numero_processo = numero_match.group(1).strip() if numero_match else ""
-            
-            # Extrair classe do processo
-            classe_match = re.search(r'<div class="classeProcesso">([^<]+)</div>', processo_html)
-            classe_processo = classe_match.group(1).strip() if classe_match else ""
-            
-            # Extrair data do recebimento
-            data_match = re.search(r'<div class="dataLocalDistribuicaoProcesso">([^<]+?)\s*-', processo_html)
-            data_processo = data_match.group(1).strip() if data_match else ""
-            
-            if numero_processo and classe_processo and data_processo:
-                processos.append({
-                    "numero": numero_processo,
-                    "classe": classe_processo,
-                    "data": data_processo
-                })
+    def __init__(self, arquivo, tamanho_bloco: Optional[int] = None, caminho_invalidos: Optional[str] = None):
+        """
+        Args:
+            arquivo: Caminho ou arquivo (file-like) CSV
+            tamanho_bloco: Linhas por bloco
+            caminho_invalidos: CSV onde gravar os CPFs inválidos (temporário se omitido)
+        """
+        self.arquivo = arquivo
+        self.tamanho_bloco = tamanho_bloco or FILE_CONFIG["bloco_linhas"]
+        self.caminho_invalidos = caminho_invalidos
+        self._invalidos_temporario = caminho_invalidos is None
+        self.total_validos = 0
+        self.total_invalidos = 0
     
-    except Exception as e:
-        print(f"Erro ao extrair processos: {e}")
+    def estimar_total(self) -> int:
+        """
+        Conta as linhas de dados do arquivo sem carregá-lo na memória
+        
+        Returns:
+            Número aproximado de linhas (ignora quebras de linha dentro de aspas)
+        """
+        if isinstance(self.arquivo, (str, os.PathLike)):
+            with open(self.arquivo, 'rb') as f:
+                linhas = sum(bloco.count(b'\n') for bloco in iter(lambda: f.read(1 << 20), b''))
+        else:
+            posicao = self.arquivo.tell()
+            vazio = self.arquivo.read(0)
+            quebra = b'\n' if isinstance(vazio, bytes) else '\n'
+            linhas = sum(bloco.count(quebra) for bloco in iter(lambda: self.arquivo.read(1 << 20), vazio))
+            self.arquivo.seek(posicao)
+        return max(0, linhas - 1)
     
-    return processos
-
-def extrair_nome_html(html: str) -> str:
-    """
-    Extrai nome do requerente do HTML do e-SAJ
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        if hasattr(self.arquivo, 'seek'):
+            self.arquivo.seek(0)
+        self.total_validos = 0
+        self.total_invalidos = 0
+        
+        if self.caminho_invalidos is None:
+            descritor, self.caminho_invalidos = tempfile.mkstemp(prefix="cpfs_invalidos_", suffix=".csv")
+            os.close(descritor)
+        
+        leitor = pd.read_csv(self.arquivo, dtype={'CPF': str, 'cpf': str}, chunksize=self.tamanho_bloco)
+        with open(self.caminho_invalidos, 'w', encoding='utf-8', newline='') as saida_invalidos:
+            primeiro = True
+            while True:
+                with METRICAS.medir("leitura_csv"):
+                    bloco = next(leitor, None)
+                if bloco is None:
+                    break
+                bloco = _preparar_dataframe(bloco)
+                invalidos = bloco[~bloco["cpf_valido"]]
+                if len(invalidos) > 0:
+                    invalidos.to_csv(saida_invalidos, index=False, header=primeiro)
+                    primeiro = False
+                    saida_invalidos.flush()
+                self.total_invalidos += len(invalidos)
+                
+                validos = bloco[bloco["cpf_valido"]]
+                self.total_validos += len(validos)
+                if len(validos) > 0:
+                    yield validos
     
-    Args:
-        html: Conteúdo HTML da resposta
-        
-    Returns:
-        Nome extraído ou string vazia
-    """
-    try:
-        nome_match = re.search(r'<div class="unj-base-alt nomeParte">\s*([^<]+)', html)
-        return nome_match.group(1).strip() if nome_match else ""
-    except Exception:
-        return ""
+    def remover_invalidos(self):
+        """Apaga o CSV de inválidos, se foi criado como temporário pelo leitor"""
+        if self._invalidos_temporario and self.caminho_invalidos is not None:
+            if os.path.exists(self.caminho_invalidos):
+                os.remove(self.caminho_invalidos)
+            self.caminho_invalidos = None
 
 def formatar_resposta_consulta(cpf: str, nome: str, nome_extraido: str, processos: List[Dict]) -> str:
     """
@@ -206,52 +303,38 @@ def gerar_nome_arquivo(tipo: str, extensao: str = "csv") -> str:
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     return f"cpfs_{tipo}_{timestamp}.{extensao}"
 
+def formatar_duracao(segundos: Optional[float]) -> str:
+    """
+    Formata uma duração para exibição (ex: "1h 05min", "3min 20s", "45s")
+    
+    Args:
+        segundos: Duração em segundos (None = desconhecida)
+        
+    Returns:
+        Texto curto; "-" se a duração for desconhecida
+    """
+    if segundos is None:
+        return "-"
+    minutos, segundos = divmod(int(round(segundos)), 60)
+    horas, minutos = divmod(minutos, 60)
+    if horas:
+        return f"{horas}h {minutos:02d}min"
+    if minutos:
+        return f"{minutos}min {segundos:02d}s"
+    return f"{segundos}s"
+
 def reformatar_dados_para_csv(resultados_encontrados: List[Dict]) -> pd.DataFrame:
     """
     Reformatar dados para CSV com uma linha por processo
     
     Args:
-        resultados_encontrados: Lista de resultados encontrados
+        resultados_encontrados: Lista de resultados encontrados (dicionários ou `ConsultaResultado`)
         
     Returns:
         DataFrame reformatado
     """
-    dados_reformatados = []
-    
-    for resultado in resultados_encontrados:
-        cpf = resultado['cpf']
-        nome = resultado['nome']
-        nome_extraido = resultado['nome_extraido']
-        data_consulta = resultado['data_consulta']
-        processos = resultado['processos']
-        
-        if processos and len(processos) > 0:
-            # Para cada processo, criar uma linha
-            for i, processo in enumerate(processos, 1):
-                dados_reformatados.append({
-                    'CPF': cpf,
-                    'Nome': nome,
-                    'Nome_Extraido': nome_extraido,
-                    'Sequencia_Processo': i,
-                    'Numero_Processo': processo['numero'],
-                    'Classe_Processo': processo['classe'],
-                    'Data_Processo': processo['data'],
-                    'Data_Consulta': data_consulta
-                })
-        else:
-            # Se não tem processos, criar uma linha vazia
-            dados_reformatados.append({
-                'CPF': cpf,
-                'Nome': nome,
-                'Nome_Extraido': nome_extraido,
-                'Sequencia_Processo': 0,
-                'Numero_Processo': '',
-                'Classe_Processo': '',
-                'Data_Processo': '',
-                'Data_Consulta': data_consulta
-            })
-    
-    return pd.DataFrame(dados_reformatados)
+    # Colunas montadas diretamente, sem um dicionário intermediário por linha
+    return pd.DataFrame(colunas_encontrados(resultados_encontrados))
 
 def calcular_estatisticas(resultados_encontrados: List[Dict], resultados_nao_encontrados: List[Dict]) -> Dict:
     """
@@ -275,35 +358,214 @@ def calcular_estatisticas(resultados_encontrados: List[Dict], resultados_nao_enc
         "total_consultados": total_encontrados + total_nao_encontrados
     }
 
+logger = logging.getLogger(__name__)
+
+_logging_lock = threading.Lock()
+_logging_listener = None
+
 def configurar_logging():
     """
-    Configura o sistema de logging
+    Configura o sistema de logging (apenas na primeira chamada)
+    
+    Os registros vão para uma fila em memória e são gravados no arquivo
+    (com rotação por tamanho) e no stderr por uma thread separada, fora do
+    caminho das consultas.
+    """
+    global _logging_listener
+    
+    with _logging_lock:
+        if _logging_listener is not None:
+            return logger
+        
+        raiz = logging.getLogger()
+        # Reexecuções do módulo (ex.: recarga do Streamlit) não devem duplicar handlers
+        for handler in list(raiz.handlers):
+            if getattr(handler, '_consulta_esaj', False):
+                raiz.removeHandler(handler)
+        
+        formatter = logging.Formatter(LOG_CONFIG["log_format"])
+        arquivo = logging.handlers.RotatingFileHandler(
+            LOG_CONFIG["log_file"],
+            maxBytes=LOG_CONFIG["max_bytes"],
+            backupCount=LOG_CONFIG["backup_count"],
+            encoding='utf-8'
+        )
+        arquivo.setFormatter(formatter)
+        console = logging.StreamHandler()
+        console.setFormatter(formatter)
+        
+        fila = queue.SimpleQueue()
+        _logging_listener = logging.handlers.QueueListener(fila, arquivo, console, respect_handler_level=True)
+        _logging_listener.start()
+        atexit.register(encerrar_logging)
+        
+        handler_fila = logging.handlers.QueueHandler(fila)
+        handler_fila._consulta_esaj = True
+        raiz.addHandler(handler_fila)
+        raiz.setLevel(getattr(logging, LOG_CONFIG["log_level"]))
+    
+    return logger
+
+def encerrar_logging():
+    """
+    Grava os registros pendentes e encerra a thread de logging
+    """
+    global _logging_listener
+    
+    with _logging_lock:
+        if _logging_listener is None:
+            return
+        _logging_listener.stop()
+        for handler in _logging_listener.handlers:
+            handler.close()
+        _logging_listener = None
+        
+        raiz = logging.getLogger()
+        for handler in list(raiz.handlers):
+            if getattr(handler, '_consulta_esaj', False):
+                raiz.removeHandler(handler)
+
+def _resumir_html(conteudo: bytes, encoding: str, limite: int = 500) -> str:
+    """
+    Decodifica apenas o início da página para fins de diagnóstico
+    
+    Args:
+        conteudo: Corpo da resposta em bytes
+        encoding: Encoding da página
+        limite: Número máximo de caracteres
+        
+    Returns:
+        Trecho inicial do HTML, com "..." se truncado
+    """
+    # Cada caractere ocupa no máximo 4 bytes
+    trecho = conteudo[:limite * 4].decode(encoding, errors='replace')
+    if len(trecho) > limite or len(conteudo) > limite * 4:
+        return trecho[:limite] + "..."
+    return trecho
+
+def _diagnostico(conteudo: bytes, encoding: str) -> Dict:
+    """
+    Campos de diagnóstico do resultado (vazio se `ESAJ_CONFIG["html_diagnostico"]` estiver desligado)
+    
+    O trecho de HTML não é usado pela aplicação e ocuparia memória em cada
+    resultado mantido durante o lote.
+    """
+    if not ESAJ_CONFIG["html_diagnostico"]:
+        return {}
+    return {"html": _resumir_html(conteudo, encoding)}
+
+def _analisar(conteudo: bytes, encoding: str, analise: Optional[EtapaAnalise], paginacao: bool = False) -> Dict:
+    """
+    Analisa a página na thread atual ou, com `analise`, nos processos da etapa de análise
+    """
+    with METRICAS.medir("parse_html"):
+        if analise is None:
+            return analisar_pagina(conteudo, encoding, paginacao)
+        return analise.analisar(conteudo, encoding, paginacao)
+
+def _paginas_restantes(paginacao: Tuple[Optional[int], int, int]) -> int:
+    """
+    Última página da lista de processos
+    
+    Usa os links de paginação e, quando a página informa o total de processos,
+    também o total dividido pelo tamanho da página (blocos de processo da
+    primeira página, não os extraídos: um bloco fora do padrão não aumenta a
+    estimativa), para listas com links apenas para as páginas próximas.
+    
+    Args:
+        paginacao: Saída de `ParserEsaj.paginacao` para a primeira página
+    """
+    total_informado, ultima_pagina, por_pagina = paginacao
+    if total_informado and por_pagina and total_informado > por_pagina:
+        ultima_pagina = max(ultima_pagina, -(-total_informado // por_pagina))
+    if ultima_pagina > ESAJ_CONFIG['max_paginas']:
+        logger.warning(f"📚 {ultima_pagina} páginas de processos; consultando apenas {ESAJ_CONFIG['max_paginas']}")
+        ultima_pagina = ESAJ_CONFIG['max_paginas']
+    return ultima_pagina
+
+def _buscar_paginas(params: Dict, paginas: List[int], cliente: EsajClient,
+                    limitador: Optional[LimitadorTaxa],
+                    analise: Optional[EtapaAnalise] = None) -> Tuple[List[Dict], Optional[Dict]]:
     """
-    logging.basicConfig(
-        level=getattr(logging, LOG_CONFIG["log_level"]),
-        format=LOG_CONFIG["log_format"],
-        handlers=[
-            logging.FileHandler(LOG_CONFIG["log_file"], encoding='utf-8'),
-            logging.StreamHandler()
-        ]
+    Busca as páginas adicionais da lista de processos em paralelo
+    
+    Args:
+        params: Parâmetros da consulta original
+        paginas: Números das páginas a buscar
+        cliente: Cliente HTTP
+        limitador: Limitador de taxa global do lote (cada página consome uma requisição)
+        analise: Etapa de análise em processos (None analisa na thread)
+        
+    Returns:
+        Tupla com (processos de todas as páginas em ordem, falha ou None); a
+        falha traz status_code e tempo_requisicao da primeira página com erro
+    """
+    def buscar(pagina):
+        response, medicao = cliente.buscar(ESAJ_CONFIG['url_paginacao'], params={**params, "paginaConsulta": pagina})
+        if limitador is not None:
+            limitador.registrar(medicao['duracao'], response.status_code == 429 or response.status_code >= 500)
+        if response.status_code != 200:
+            return {"pagina": pagina, "status_code": response.status_code, "tempo_requisicao": medicao['duracao']}
+        return _analisar(response.content, response.encoding or 'utf-8', analise)["processos"]
+    
+    respostas = executar_em_paralelo(
+        paginas, buscar, min(len(paginas), ESAJ_CONFIG['workers_paginas']), limitador
     )
-    return logging.getLogger(__name__)
+    processos = []
+    for resposta in respostas:
+        if isinstance(resposta, dict):
+            return [], resposta
+        processos.extend(resposta)
+    return processos, None
+
+def completar_analise(cpf: str, resultado: Dict, extraido: Dict) -> Dict:
+    """
+    Completa um resultado de `consultar_esaj` que saiu com a análise pendente
+    
+    Args:
+        cpf: CPF consultado (para o log)
+        resultado: Resultado com o Future em `analise`
+        extraido: Saída de `analisar_pagina` (resultado do Future)
+        
+    Returns:
+        Novo dicionário, sem `analise`, com nome_extraido, processos e total_processos
+    """
+    completo = {chave: valor for chave, valor in resultado.items() if chave != 'analise'}
+    completo['nome_extraido'] = extraido['nome_extraido']
+    completo['processos'] = extraido['processos']
+    completo['total_processos'] = len(extraido['processos'])
+    logger.info(f"✅ Processos encontrados para CPF {cpf}: {completo['total_processos']}")
+    return completo
 
-def consultar_esaj(cpf: str, nome: str) -> Dict:
+def consultar_esaj(cpf: str, nome: str, cliente: Optional[EsajClient] = None,
+                   limitador: Optional[LimitadorTaxa] = None,
+                   analise: Optional[EtapaAnalise] = None) -> Dict:
     """
     Consulta CPF no e-SAJ TJSP (baseado no n8n que funciona)
     
+    Quando a lista de processos é paginada, as demais páginas são buscadas em
+    paralelo, respeitando o limitador de taxa do lote, e os processos são
+    reunidos em uma única lista. Com `analise`, o HTML das páginas com
+    processos é analisado nos processos da etapa de análise em vez da thread
+    da consulta.
+    
     Args:
         cpf: CPF para consultar
         nome: Nome da pessoa
+        cliente: Cliente HTTP com pool de conexões (usa o cliente compartilhado se omitido)
+        limitador: Limitador de taxa global usado nas páginas adicionais
+        analise: Etapa de análise em processos (None analisa na thread)
         
     Returns:
-        Dicionário com resultado da consulta
+        Dicionário com resultado da consulta; `paginas` indica quantas páginas
+        foram buscadas. Com `analise`, um resultado encontrado pode sair antes
+        da análise, com um Future em `analise` e sem nome_extraido/processos
+        (ver `completar_analise`)
     """
-    logger = configurar_logging()
+    cliente = cliente or obter_cliente_padrao()
     
     try:
-        logger.info(f"🔍 Iniciando consulta CPF: {cpf} - {nome}")
+        logger.debug(f"🔍 Iniciando consulta CPF: {cpf} - {nome}")
         
         # Parâmetros da consulta (baseado no n8n)
         params = {
@@ -313,19 +575,28 @@ def consultar_esaj(cpf: str, nome: str) -> Dict:
             "consultaDeRequisitorios": "true"
         }
         
-        logger.info(f"📡 Enviando requisição para: {ESAJ_CONFIG['base_url']}")
-        logger.info(f"📋 Parâmetros: {params}")
-        
-        # Fazer requisição GET (como no n8n)
-        response = requests.get(
-            ESAJ_CONFIG['base_url'],
-            params=params,
-            headers=HEADERS,
-            timeout=ESAJ_CONFIG['timeout']
-        )
-        
-        logger.info(f"📊 Status da resposta: {response.status_code}")
-        logger.info(f"📏 Tamanho da resposta: {len(response.text)} caracteres")
+        logger.debug(f"📡 Enviando requisição para: {ESAJ_CONFIG['base_url']}")
+        logger.debug(f"📋 Parâmetros: {params}")
+        
+        # Fazer requisição GET (como no n8n) reaproveitando conexões do pool; com leitura
+        # parcial a página "nenhum processo" deixa de ser lida assim que se identifica
+        decidir = ParserEsaj.decidir_parcial if ESAJ_CONFIG.get('leitura_parcial') else None
+        response, medicao = cliente.buscar(ESAJ_CONFIG['base_url'], params=params, decidir=decidir)
+        
+        logger.info(f"📊 Status da resposta: {response.status_code} em {medicao['duracao']:.3f}s"
+                    f" ({'conexão nova' if medicao['conexao_nova'] else 'conexão reutilizada'})")
+        # Trabalhar sobre os bytes evita decodificar a página inteira
+        conteudo = response.content
+        encoding = response.encoding or 'utf-8'
+        logger.debug(f"📏 Tamanho da resposta: {len(conteudo)} bytes")
+        if medicao['leitura_interrompida']:
+            logger.debug(f"✂️ Leitura interrompida após {medicao['bytes_lidos']} bytes"
+                         f" ({medicao['bytes_evitados'] or 'restante desconhecido'} bytes evitados)")
+        leitura = {
+            "bytes_lidos": medicao['bytes_lidos'],
+            "bytes_evitados": medicao['bytes_evitados'],
+            "tempo_economizado": medicao['tempo_economizado']
+        }
         
         if response.status_code != 200:
             logger.error(f"❌ Erro HTTP: {response.status_code}")
@@ -333,16 +604,18 @@ def consultar_esaj(cpf: str, nome: str) -> Dict:
                 "sucesso": False,
                 "erro": f"Erro HTTP {response.status_code}",
                 "status_code": response.status_code,
-                "html": response.text[:500] + "..." if len(response.text) > 500 else response.text
+                "tempo_requisicao": medicao['duracao'],
+                **_diagnostico(conteudo, encoding)
             }
         
-        html = response.text
-        logger.info(f"📄 HTML recebido: {len(html)} caracteres")
-        
-        # Verificar se tem processos encontrados
-        has_processes = "Processos encontrados" in html or "linkProcesso" in html
-        
-        if not has_processes:
+        # Verificar se tem processos encontrados; a leitura só é interrompida quando
+        # `decidir_parcial` já respondeu "não encontrado", e o buffer truncado não é reavaliado
+        if medicao['leitura_interrompida']:
+            tem_processos = False
+        else:
+            with METRICAS.medir("parse_html"):
+                tem_processos = ParserEsaj.tem_processos(conteudo)
+        if not tem_processos:
             logger.info(f"❌ Nenhum processo encontrado para CPF: {cpf}")
             return {
                 "sucesso": True,
@@ -350,21 +623,59 @@ def consultar_esaj(cpf: str, nome: str) -> Dict:
                 "nome_extraido": "",
                 "processos": [],
                 "total_processos": 0,
-                "html": html[:500] + "..." if len(html) > 500 else html
+                "paginas": 1,
+                "tempo_requisicao": medicao['duracao'],
+                **leitura,
+                **_diagnostico(conteudo, encoding)
             }
         
-        logger.info(f"✅ Processos encontrados para CPF: {cpf}")
-        
-        # Extrair nome do requerente
-        nome_extraido = extrair_nome_html(html)
-        logger.info(f"👤 Nome extraído: {nome_extraido}")
-        
-        # Extrair processos
-        processos = extrair_processos_html(html)
-        logger.info(f"📋 Processos extraídos: {len(processos)}")
+        # Com a etapa de análise em processos, uma página sem paginação vai para a fila
+        # de análise e a thread fica livre para a próxima consulta; `completar_analise`
+        # preenche nome e processos quando a análise termina
+        if analise is not None and not ParserEsaj.tem_paginacao(conteudo):
+            logger.debug(f"🧩 Página do CPF {cpf} enviada para análise")
+            return {
+                "sucesso": True,
+                "encontrado": True,
+                "paginas": 1,
+                "tempo_requisicao": medicao['duracao'],
+                **leitura,
+                **_diagnostico(conteudo, encoding),
+                "analise": analise.enviar(conteudo, encoding)
+            }
         
-        for i, processo in enumerate(processos):
-            logger.info(f"  {i+1}. {processo['numero']} - {processo['classe']} - {processo['data']}")
+        # Extrair nome do requerente, processos e paginação em uma única varredura
+        extraido = _analisar(conteudo, encoding, analise, paginacao=True)
+        nome_extraido = extraido["nome_extraido"]
+        processos = extraido["processos"]
+        
+        # Demais páginas da lista de processos
+        ultima_pagina = _paginas_restantes(extraido["paginacao"])
+        if ultima_pagina > 1:
+            logger.debug(f"📚 Lista paginada para CPF {cpf}: {ultima_pagina} páginas")
+            adicionais, falha = _buscar_paginas(params, list(range(2, ultima_pagina + 1)), cliente, limitador,
+                                                analise)
+            if falha is not None:
+                logger.error(f"❌ Erro HTTP {falha['status_code']} na página {falha['pagina']} do CPF {cpf}")
+                return {
+                    "sucesso": False,
+                    "erro": f"Erro HTTP {falha['status_code']} na página {falha['pagina']}",
+                    "status_code": falha['status_code'],
+                    "tempo_requisicao": falha['tempo_requisicao']
+                }
+            # Um processo repetido entre páginas (lista alterada durante a consulta) entra uma vez
+            vistos = {processo["numero"] for processo in processos}
+            for processo in adicionais:
+                if processo["numero"] not in vistos:
+                    vistos.add(processo["numero"])
+                    processos.append(processo)
+        
+        logger.info(f"✅ Processos encontrados para CPF {cpf}: {len(processos)}")
+        logger.debug(f"👤 Nome extraído: {nome_extraido}")
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, processo in enumerate(processos):
+                logger.debug(f"  {i+1}. {processo['numero']} - {processo['classe']} - {processo['data']}")
         
         return {
             "sucesso": True,
@@ -372,11 +683,15 @@ def consultar_esaj(cpf: str, nome: str) -> Dict:
             "nome_extraido": nome_extraido,
             "processos": processos,
             "total_processos": len(processos),
-            "html": html[:500] + "..." if len(html) > 500 else html
+            "paginas": ultima_pagina,
+            "tempo_requisicao": medicao['duracao'],
+            **leitura,
+            **_diagnostico(conteudo, encoding)
         }
         
     except requests.exceptions.Timeout:
         logger.error(f"⏰ Timeout na consulta CPF: {cpf}")
+        METRICAS.incrementar("erros_rede", tipo="timeout")
         return {
             "sucesso": False,
             "erro": "Timeout na consulta",
@@ -384,6 +699,7 @@ def consultar_esaj(cpf: str, nome: str) -> Dict:
         }
     except requests.exceptions.RequestException as e:
         logger.error(f"🌐 Erro de rede na consulta CPF {cpf}: {str(e)}")
+        METRICAS.incrementar("erros_rede", tipo="conexao")
         return {
             "sucesso": False,
             "erro": f"Erro de rede: {str(e)}",
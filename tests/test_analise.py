@@ -0,0 +1,89 @@
+"""
+Testes para o módulo analise
+"""
+import unittest
+import sys
+import os
+from unittest import mock
+
+# Adicionar os diretórios src e benchmarks ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import pandas as pd
+
+from analise import EtapaAnalise, analisar_pagina
+from cliente import EsajClient
+from concorrencia import ConsultasEmAndamento, LimitadorTaxa
+from config import ESAJ_CONFIG
+from lote import processar_consultas
+from paginas_esaj import gerar_pagina
+from servidor_esaj import ServidorEsajFalso
+from utils import completar_analise, consultar_esaj
+
+class TestEtapaAnalise(unittest.TestCase):
+    """Testes para a análise do HTML em processos separados"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.analise = EtapaAnalise(processos=2, profundidade=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.analise.fechar()
+
+    def test_mesma_saida_que_na_thread(self):
+        """Os processos devem produzir o mesmo resultado que a análise na thread"""
+        paginas = [gerar_pagina(total, semente=total, tamanho_enfeite=500, por_pagina=por_pagina).encode("utf-8")
+                   for total, por_pagina in ((0, 0), (3, 0), (60, 25))]
+        for conteudo in paginas:
+            self.assertEqual(self.analise.analisar(conteudo, "utf-8", paginacao=True),
+                             analisar_pagina(conteudo, "utf-8", paginacao=True))
+        self.assertEqual(analisar_pagina(paginas[2], "utf-8", paginacao=True)["paginacao"], (60, 3, 25))
+
+    def test_fila_limitada_bloqueia(self):
+        """Com a fila cheia, `enviar` deve aguardar uma vaga"""
+        conteudo = gerar_pagina(10, tamanho_enfeite=0).encode("utf-8")
+        antes = self.analise.estatisticas()["esperas_fila_cheia"]
+        futuros = [self.analise.enviar(conteudo, "utf-8") for _ in range(5)]
+        resultados = [futuro.result() for futuro in futuros]
+
+        self.assertTrue(all(len(resultado["processos"]) == 10 for resultado in resultados))
+        self.assertGreater(self.analise.estatisticas()["esperas_fila_cheia"], antes)
+
+    def test_lote_com_analise(self):
+        """O lote com a etapa de análise deve devolver os mesmos resultados, com páginas na fila"""
+        cpfs = pd.DataFrame({"cpf": [f"{i:011d}" for i in range(1, 25)], "nome": "Teste"})
+        cliente = EsajClient(pool_size=4, timeout=5)
+        with ServidorEsajFalso(encontrados=0.7, paginados=0.3, tamanho_enfeite=0) as servidor:
+            try:
+                with mock.patch.dict(ESAJ_CONFIG, {"base_url": servidor.url_base,
+                                                   "url_paginacao": servidor.url_paginacao}):
+                    opcoes = dict(workers=4, cliente=cliente, limitador=LimitadorTaxa(None),
+                                  em_andamento=ConsultasEmAndamento())
+                    na_thread = processar_consultas(cpfs, **opcoes)
+                    antes = self.analise.estatisticas()["paginas"]
+                    em_processos = processar_consultas(cpfs, analise=self.analise, **opcoes)
+                    # Desfecho (total, por página): encontrado em uma única página
+                    sem_paginacao = next(cpf for cpf in cpfs["cpf"] if servidor.desfecho(cpf)[0]
+                                         and not servidor.desfecho(cpf)[1])
+                    pendente = consultar_esaj(sem_paginacao, "Teste", cliente, analise=self.analise)
+            finally:
+                cliente.fechar()
+
+        for esperados, obtidos in zip(na_thread[:3], em_processos[:3]):
+            self.assertEqual([(r.cpf, r.nome_extraido, r.processos, r.paginas) for r in esperados],
+                             [(r.cpf, r.nome_extraido, r.processos, r.paginas) for r in obtidos])
+        self.assertTrue(na_thread[0])
+        self.assertTrue(any(r.paginas > 1 for r in na_thread[0]))
+        self.assertGreater(self.analise.estatisticas()["paginas"], antes)
+
+        # Página encontrada sem paginação: a consulta sai antes da análise
+        self.assertIn("analise", pendente)
+        self.assertNotIn("processos", pendente)
+        completo = completar_analise("00000000000", pendente, pendente["analise"].result())
+        self.assertNotIn("analise", completo)
+        self.assertEqual(completo["total_processos"], len(completo["processos"]))
+
+if __name__ == '__main__':
+    unittest.main()
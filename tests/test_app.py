@@ -0,0 +1,71 @@
+"""
+Testes para o cache dos uploads da interface (app.py)
+"""
+import unittest
+import sys
+import os
+import io
+from unittest import mock
+
+# Adicionar a raiz do projeto (app.py) ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import streamlit as st
+    import app
+    STREAMLIT_DISPONIVEL = True
+except ImportError:
+    STREAMLIT_DISPONIVEL = False
+
+class ArquivoEnviado(io.BytesIO):
+    """Imitação do `UploadedFile` do Streamlit: conteúdo e `file_id` do upload"""
+
+    def __init__(self, conteudo, file_id):
+        super().__init__(conteudo)
+        self.file_id = file_id
+
+@unittest.skipUnless(STREAMLIT_DISPONIVEL, "streamlit não instalado")
+class TestCacheUpload(unittest.TestCase):
+    """Testes para `hash_upload` e `processar_upload`"""
+
+    CONTEUDO = b"Nome,CPF\nJoao,11144477735\nMaria,52998224725\nPedro,123\n"
+
+    def setUp(self):
+        st.session_state.clear()
+        app.processar_upload.clear()
+
+    def consultar(self, arquivo):
+        return app.processar_upload(arquivo, app.hash_upload(arquivo))
+
+    def test_mesmo_conteudo_nao_e_relido(self):
+        """O mesmo upload (ou o mesmo conteúdo em outro upload) não é lido nem validado de novo"""
+        with mock.patch.object(app, 'gerar_id_lote', wraps=app.gerar_id_lote) as gerar_hash, \
+                mock.patch.object(app, 'processar_csv', wraps=app.processar_csv) as processar_csv:
+            validos, invalidos = self.consultar(ArquivoEnviado(self.CONTEUDO, "upload-1"))
+            self.consultar(ArquivoEnviado(self.CONTEUDO, "upload-1"))
+            self.assertEqual((gerar_hash.call_count, processar_csv.call_count), (1, 1))
+
+            # Outro upload com o mesmo conteúdo: o hash é recalculado, a validação não
+            novamente = self.consultar(ArquivoEnviado(self.CONTEUDO, "upload-2"))
+            self.assertEqual((gerar_hash.call_count, processar_csv.call_count), (2, 1))
+
+        self.assertEqual(validos['cpf'].tolist(), ['11144477735', '52998224725'])
+        self.assertEqual(len(invalidos), 1)
+        self.assertEqual(novamente[0]['cpf'].tolist(), validos['cpf'].tolist())
+
+    def test_conteudo_diferente_e_validado(self):
+        """Um arquivo com outro conteúdo tem outro hash e é lido e validado"""
+        with mock.patch.object(app, 'processar_csv', wraps=app.processar_csv) as processar_csv:
+            primeiro = ArquivoEnviado(self.CONTEUDO, "upload-1")
+            segundo = ArquivoEnviado(b"Nome,CPF\nAna,39053344705\n", "upload-2")
+            self.consultar(primeiro)
+            validos_segundo, _ = self.consultar(segundo)
+
+        self.assertNotEqual(app.hash_upload(primeiro), app.hash_upload(segundo))
+        self.assertEqual(processar_csv.call_count, 2)
+        self.assertEqual(validos_segundo['cpf'].tolist(), ['39053344705'])
+        # Apenas o upload atual fica na sessão
+        self.assertEqual(list(st.session_state['hashes_upload']), ["upload-2"])
+
+if __name__ == '__main__':
+    unittest.main()
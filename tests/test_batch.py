@@ -0,0 +1,211 @@
+"""
+Testes para a execução em lote pela linha de comando
+"""
+import unittest
+import sys
+import os
+import io
+import json
+import argparse
+import subprocess
+import tempfile
+from contextlib import redirect_stdout, redirect_stderr
+from unittest import mock
+
+import pandas as pd
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import batch
+import lote
+from config import CHECKPOINT_CONFIG
+from fila import FilaTrabalho
+
+
+def consulta_falsa(cpf, nome, cliente=None, limitador=None, analise=None):
+    """Simula o e-SAJ: CPFs terminados em 25 têm dois processos"""
+    if cpf.endswith('25'):
+        processos = [{'numero': f'000{i}-00.2020.8.26.0100', 'classe': 'Precatório', 'data': '01/01/2020'}
+                     for i in range(2)]
+        return {'sucesso': True, 'encontrado': True, 'nome_extraido': nome.upper(),
+                'processos': processos, 'total_processos': 2}
+    return {'sucesso': True, 'encontrado': False, 'processos': [], 'total_processos': 0}
+
+
+class TestBatch(unittest.TestCase):
+    """Testes para src/batch.py"""
+
+    def test_interpretar_taxa(self):
+        """Aceita taxa por segundo, minuto ou hora"""
+        self.assertEqual(batch.interpretar_taxa("4/s"), 4)
+        self.assertEqual(batch.interpretar_taxa("120/min"), 2)
+        self.assertEqual(batch.interpretar_taxa("0.5"), 0.5)
+        self.assertEqual(batch.interpretar_taxa("0"), 0)
+        for invalida in ("rapido", "4/dia", "-1/s"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                batch.interpretar_taxa(invalida)
+
+    def test_main_grava_saidas(self):
+        """Executa o lote sem Streamlit e grava as saídas no diretório informado"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            entrada = os.path.join(diretorio, "entrada.csv")
+            with open(entrada, "w", encoding="utf-8") as f:
+                f.write("Nome,CPF\nAna,529.982.247-25\nBruno,111.444.777-35\nCarla,123\nDiego,390.533.447-05\n")
+            saida = os.path.join(diretorio, "saida")
+
+            with mock.patch.object(lote, "consultar_esaj", consulta_falsa), \
+                    redirect_stdout(io.StringIO()) as stdout, redirect_stderr(io.StringIO()):
+                codigo = batch.main([entrada, "--workers", "2", "--rate", "0", "--out", saida,
+                                     "--sem-cache", "--sem-checkpoint",
+                                     "--metricas", os.path.join(diretorio, "metricas.json")])
+
+            self.assertEqual(codigo, 0)
+            self.assertIn("Vazão", stdout.getvalue())
+            with open(os.path.join(diretorio, "metricas.json"), encoding="utf-8") as f:
+                metricas = json.load(f)
+            self.assertIn("exportacao", metricas["etapas"])
+            self.assertIn("validacao", metricas["etapas"])
+
+            arquivos = sorted(os.listdir(saida))
+            encontrados = next(a for a in arquivos if a.startswith("cpfs_encontrados_"))
+            nao_encontrados = next(a for a in arquivos if a.startswith("cpfs_nao_encontrados_"))
+            with open(os.path.join(saida, encontrados), encoding="utf-8-sig") as f:
+                linhas = f.read().splitlines()
+            # Cabeçalho + 2 processos do único CPF encontrado
+            self.assertEqual(len(linhas), 3)
+            with open(os.path.join(saida, nao_encontrados), encoding="utf-8-sig") as f:
+                self.assertEqual(len(f.read().splitlines()), 3)
+
+    def test_main_monitorar(self):
+        """Com --monitorar, a segunda execução sem mudanças gera um arquivo de alterações vazio"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            entrada = os.path.join(diretorio, "entrada.csv")
+            with open(entrada, "w", encoding="utf-8") as f:
+                f.write("Nome,CPF\nAna,529.982.247-25\nBruno,111.444.777-35\n")
+            argumentos = [entrada, "--rate", "0", "--sem-cache", "--sem-checkpoint", "--monitorar",
+                          "--snapshot", os.path.join(diretorio, "monitoramento.db")]
+
+            linhas = []
+            for execucao in ("primeira", "segunda"):
+                saida = os.path.join(diretorio, execucao)
+                with mock.patch.object(lote, "consultar_esaj", consulta_falsa), \
+                        redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+                    self.assertEqual(batch.main(argumentos + ["--out", saida]), 0)
+                arquivos = os.listdir(saida)
+                self.assertFalse(any("encontrados" in arquivo for arquivo in arquivos))
+                alteracoes = next(a for a in arquivos if "alteracoes" in a)
+                with open(os.path.join(saida, alteracoes), encoding="utf-8-sig") as f:
+                    linhas.append(len(f.read().splitlines()))
+
+            # Primeira execução: cabeçalho + 2 processos novos; segunda: só o cabeçalho
+            self.assertEqual(linhas, [3, 1])
+
+    def test_main_com_fila(self):
+        """Com --fila, o lote passa pela fila compartilhada e gera as mesmas saídas"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            entrada = os.path.join(diretorio, "entrada.csv")
+            with open(entrada, "w", encoding="utf-8") as f:
+                f.write("Nome,CPF\nAna,529.982.247-25\nBruno,111.444.777-35\nAna,52998224725\n")
+            saida = os.path.join(diretorio, "saida")
+            caminho_fila = os.path.join(diretorio, "fila.db")
+
+            with mock.patch.object(lote, "consultar_esaj", consulta_falsa), \
+                    redirect_stdout(io.StringIO()) as stdout, redirect_stderr(io.StringIO()):
+                codigo = batch.main([entrada, "--rate", "0", "--out", saida, "--sem-cache", "--fila", caminho_fila])
+
+            self.assertEqual(codigo, 0)
+            self.assertIn("3 CPFs consultados aqui", stdout.getvalue())
+            encontrados = next(a for a in os.listdir(saida) if a.startswith("cpfs_encontrados_"))
+            with open(os.path.join(saida, encontrados), encoding="utf-8-sig") as f:
+                # Cabeçalho + 2 processos para cada uma das duas linhas da Ana
+                self.assertEqual(len(f.read().splitlines()), 5)
+            # Lote exportado: a fila não guarda mais os CPFs
+            fila = FilaTrabalho(caminho_fila)
+            self.assertEqual(sum(fila.progresso().values()), 0)
+            fila.fechar()
+
+    def test_trabalhador_sem_monitorar_recusa_lote_monitorado(self):
+        """Um trabalhador sem --monitorar não consulta um lote enfileirado com --monitorar"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho_fila = os.path.join(diretorio, "fila.db")
+            fila = FilaTrabalho(caminho_fila)
+            fila.enfileirar("lote", pd.DataFrame({'cpf': ['52998224725'], 'nome': ['Ana']}), monitoramento=True)
+            fila.fechar()
+
+            with mock.patch.object(lote, "consultar_esaj", consulta_falsa), \
+                    redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()) as stderr:
+                codigo = batch.main(["--trabalhador", "--fila", caminho_fila, "--rate", "0", "--sem-cache"])
+
+            self.assertEqual(codigo, 1)
+            self.assertIn("--monitorar", stderr.getvalue())
+            fila = FilaTrabalho(caminho_fila)
+            self.assertEqual(fila.progresso("lote")['pendente'], 1)
+            fila.fechar()
+
+    def interromper(self, diretorio, *opcoes):
+        """Executa o lote interrompendo-o (Ctrl+C) após o primeiro CPF concluído"""
+        entrada = os.path.join(diretorio, "entrada.csv")
+        with open(entrada, "w", encoding="utf-8") as f:
+            f.write("Nome,CPF\nAna,529.982.247-25\nBruno,111.444.777-35\nDiego,390.533.447-05\n")
+        diarios = []
+        processar = batch.processar_consultas
+        criar_diario = lote.DiarioLote
+
+        def diario_observado(*args, **kwargs):
+            diarios.append(criar_diario(*args, **kwargs))
+            return diarios[-1]
+
+        def processar_interrompido(*args, ao_concluir=None, **kwargs):
+            def concluir(cpf, nome, resultado):
+                ao_concluir(cpf, nome, resultado)
+                raise KeyboardInterrupt
+            return processar(*args, ao_concluir=concluir, **kwargs)
+
+        with mock.patch.object(lote, "consultar_esaj", consulta_falsa), \
+                mock.patch.object(lote, "DiarioLote", diario_observado), \
+                mock.patch.object(batch, "processar_consultas", processar_interrompido), \
+                mock.patch.dict(CHECKPOINT_CONFIG, {"diretorio": os.path.join(diretorio, "checkpoints")}), \
+                redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()) as stderr:
+            codigo = batch.main([entrada, "--workers", "1", "--rate", "0", "--sem-cache",
+                                 "--out", os.path.join(diretorio, "saida"), *opcoes])
+        self.assertEqual(codigo, 130)
+        return stderr.getvalue(), diarios
+
+    def test_interrupcao_com_checkpoint(self):
+        """Interrompido, o diário fica no disco e fechado, e a mensagem indica a retomada"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            mensagens, diarios = self.interromper(diretorio)
+            self.assertIn("execute novamente para continuar", mensagens)
+            self.assertEqual(len(diarios), 1)
+            self.assertIsNone(diarios[0]._arquivo)
+            self.assertTrue(diarios[0].carregar())
+
+    def test_interrupcao_sem_checkpoint(self):
+        """Com --sem-checkpoint não há de onde continuar e a mensagem não sugere a retomada"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            mensagens, diarios = self.interromper(diretorio, "--sem-checkpoint")
+            self.assertNotIn("execute novamente", mensagens)
+            self.assertIn("nenhum checkpoint gravado", mensagens)
+            self.assertEqual(diarios, [])
+
+    def test_trabalhador_requer_fila(self):
+        """--trabalhador sem --fila e execução sem entrada retornam erro"""
+        with redirect_stderr(io.StringIO()):
+            self.assertEqual(batch.main(["--trabalhador"]), 1)
+            self.assertEqual(batch.main([]), 1)
+
+    def test_nao_importa_streamlit(self):
+        """O módulo roda em servidores sem Streamlit"""
+        codigo = ("import sys; sys.path.insert(0, {!r}); import batch; "
+                  "sys.exit('streamlit' in sys.modules)").format(os.path.dirname(batch.__file__))
+        self.assertEqual(subprocess.run([sys.executable, "-c", codigo]).returncode, 0)
+
+    def test_main_arquivo_inexistente(self):
+        """Arquivo de entrada ausente retorna código de erro"""
+        with redirect_stderr(io.StringIO()):
+            self.assertEqual(batch.main(["/nao/existe.csv"]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Testes para o módulo cache
+"""
+import unittest
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+import time
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from cache import CacheResultados
+
+RESULTADO = {
+    "sucesso": True,
+    "encontrado": True,
+    "nome_extraido": "JOÃO DA SILVA",
+    "processos": [{"numero": "0001234-56.2020.8.26.0053", "classe": "Precatório", "data": "01/02/2020"}],
+    "total_processos": 1
+}
+
+class TestCacheResultados(unittest.TestCase):
+    """Testes para o cache persistente de resultados"""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.diretorio.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_acerto_por_cpf_normalizado(self):
+        """CPF em formatos diferentes deve usar a mesma entrada"""
+        cache = CacheResultados(self.caminho, ttl_horas=1, max_entradas=10)
+        cache.salvar("111.444.777-35", RESULTADO)
+
+        resultado = cache.obter("11144477735")
+        self.assertIsNotNone(resultado)
+        self.assertTrue(resultado["cache"])
+        self.assertEqual(resultado["processos"], RESULTADO["processos"])
+        self.assertIsNone(cache.obter("52998224725"))
+        self.assertEqual(cache.estatisticas()["taxa_acerto"], 0.5)
+        cache.fechar()
+
+        # Persistência entre instâncias
+        self.assertIsNotNone(CacheResultados(self.caminho, ttl_horas=1).obter("11144477735"))
+
+    def test_ttl_e_erros(self):
+        """Resultados expirados e consultas com erro não devem ser servidos"""
+        cache = CacheResultados(self.caminho, ttl_horas=0.5 / 3600, max_entradas=10)
+        cache.salvar("11144477735", RESULTADO)
+        cache.salvar("52998224725", {"sucesso": False, "erro": "Timeout na consulta"})
+        self.assertIsNone(cache.obter("52998224725"))
+
+        time.sleep(0.6)
+        self.assertIsNone(cache.obter("11144477735"))
+        self.assertEqual(cache.limpar_expirados(), 1)
+
+    def test_remove_mais_antigos(self):
+        """Ao passar do limite, as entradas mais antigas são descartadas"""
+        cache = CacheResultados(self.caminho, ttl_horas=1, max_entradas=2)
+        for cpf in ("11144477735", "52998224725", "39053344705"):
+            cache.salvar(cpf, RESULTADO)
+            time.sleep(0.01)
+
+        self.assertEqual(set(cache.obter_varios(["11144477735", "52998224725", "39053344705"])),
+                         {"52998224725", "39053344705"})
+
+    def test_preserva_encontrado_e_paginas(self):
+        """Encontrado sem processos extraídos e o número de páginas voltam como foram gravados"""
+        cache = CacheResultados(self.caminho, ttl_horas=1, max_entradas=10)
+        cache.salvar("11144477735", {**RESULTADO, "processos": [], "total_processos": 0, "paginas": 1})
+        cache.salvar("52998224725", {**RESULTADO, "paginas": 3})
+        cache.salvar("39053344705", {"sucesso": True, "encontrado": False, "nome_extraido": "", "processos": []})
+
+        resultados = cache.obter_varios(["11144477735", "52998224725", "39053344705"])
+        self.assertTrue(resultados["11144477735"]["encontrado"])
+        self.assertEqual(resultados["52998224725"]["paginas"], 3)
+        self.assertFalse(resultados["39053344705"]["encontrado"])
+        self.assertEqual(resultados["39053344705"]["paginas"], 1)
+
+    def test_cache_sem_colunas_novas(self):
+        """Um cache gravado antes das colunas encontrado/paginas continua legível"""
+        conexao = sqlite3.connect(self.caminho)
+        conexao.execute("CREATE TABLE resultados (cpf TEXT PRIMARY KEY, nome_extraido TEXT NOT NULL, "
+                        "processos TEXT NOT NULL, consultado_em REAL NOT NULL)")
+        conexao.execute("INSERT INTO resultados VALUES (?, ?, ?, ?)",
+                        ("11144477735", "JOÃO", json.dumps(RESULTADO["processos"]), time.time()))
+        conexao.commit()
+        conexao.close()
+
+        resultado = CacheResultados(self.caminho, ttl_horas=1).obter("11144477735")
+        self.assertTrue(resultado["encontrado"])
+        self.assertEqual(resultado["paginas"], 1)
+
+    def test_salvar_sem_contar_a_tabela(self):
+        """Abaixo do limite, salvar não deve contar a tabela; substituir não aumenta a contagem"""
+        cache = CacheResultados(self.caminho, ttl_horas=1, max_entradas=100)
+        comandos = []
+        cache._conexao.set_trace_callback(comandos.append)
+        for _ in range(3):
+            cache.salvar("11144477735", RESULTADO)
+        for i in range(120):
+            cache.salvar(f"{i:011d}", RESULTADO)
+
+        contagens = [comando for comando in comandos if "COUNT(*)" in comando]
+        # Só as limpezas contam a tabela (antes: uma contagem por inserção)
+        self.assertLessEqual(len(contagens), 12)
+        total = cache._conexao.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+        self.assertEqual(cache._total, total)
+        self.assertLessEqual(total, 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Testes para o módulo checkpoint
+"""
+import unittest
+import sys
+import os
+import io
+import tempfile
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from checkpoint import DiarioLote, gerar_id_lote
+
+RESULTADO = {"sucesso": True, "encontrado": False, "nome_extraido": "", "processos": [],
+             "total_processos": 0, "html": "<html>", "data_consulta": "01/01/2025 10:00:00"}
+
+class TestDiarioLote(unittest.TestCase):
+    """Testes para o diário de checkpoint"""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_id_lote_pelo_conteudo(self):
+        """O mesmo conteúdo gera o mesmo identificador, em caminho ou file-like"""
+        caminho = os.path.join(self.diretorio.name, "entrada.csv")
+        with open(caminho, "wb") as f:
+            f.write(b"Nome,CPF\nA,11144477735\n")
+
+        arquivo = io.BytesIO(b"Nome,CPF\nA,11144477735\n")
+        arquivo.seek(5)
+        self.assertEqual(gerar_id_lote(caminho), gerar_id_lote(arquivo))
+        self.assertEqual(arquivo.tell(), 5)
+        self.assertNotEqual(gerar_id_lote(caminho), gerar_id_lote(io.BytesIO(b"Nome,CPF\n")))
+
+    def test_retomada_apos_interrupcao(self):
+        """Consultas registradas sobrevivem a uma gravação interrompida"""
+        diario = DiarioLote("lote", self.diretorio.name, fsync=False)
+        diario.registrar("111.444.777-35", RESULTADO)
+        diario.registrar("52998224725", {"sucesso": False, "erro": "Timeout na consulta"})
+        diario.fechar()
+
+        # Simular queda no meio da gravação de uma linha
+        with open(diario.caminho, "a", encoding="utf-8") as f:
+            f.write('{"cpf": "3905334')
+
+        diario = DiarioLote("lote", self.diretorio.name, fsync=False)
+        diario.registrar("39053344705", RESULTADO)
+        diario.fechar()
+
+        concluidos = DiarioLote("lote", self.diretorio.name).carregar()
+        self.assertEqual(set(concluidos), {"11144477735", "39053344705"})
+        self.assertNotIn("html", concluidos["11144477735"])
+
+        diario.remover()
+        self.assertEqual(DiarioLote("lote", self.diretorio.name).carregar(), {})
+
+if __name__ == '__main__':
+    unittest.main()
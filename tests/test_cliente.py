@@ -0,0 +1,199 @@
+"""
+Testes para o módulo cliente
+"""
+import unittest
+import sys
+import os
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Adicionar os diretórios src e benchmarks ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import requests
+
+from cliente import EsajClient
+from metricas import METRICAS
+from parser_esaj import ParserEsaj
+from servidor_esaj import ServidorEsajFalso
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        corpo = b"<html>ok</html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+class _HandlerChunked(BaseHTTPRequestHandler):
+    """Página sem processos em Transfer-Encoding chunked (sem Content-Length)"""
+    protocol_version = "HTTP/1.1"
+    tamanho_rodape = 0
+
+    def do_GET(self):
+        partes = [b"<html><div id=\"cabecalho\"></div>",
+                  "<li>Não existem informações disponíveis para os parâmetros informados.</li>".encode("utf-8")]
+        partes += [b"x" * 4096] * (type(self).tamanho_rodape // 4096) + [b"</html>"]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for parte in partes:
+                self.wfile.write(f"{len(parte):x}\r\n".encode() + parte + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+class TestEsajClient(unittest.TestCase):
+    """Testes para o cliente HTTP com pool de conexões"""
+
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}/cpopg/search.do"
+
+    def tearDown(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def test_conexao_reutilizada(self):
+        """Requisições sequenciais devem reaproveitar a mesma conexão"""
+        cliente = EsajClient(pool_size=2, timeout=5)
+        medicoes = [cliente.buscar(self.url, params={"i": i})[1] for i in range(5)]
+        cliente.fechar()
+
+        self.assertTrue(medicoes[0]["conexao_nova"])
+        self.assertFalse(any(m["conexao_nova"] for m in medicoes[1:]))
+
+        estatisticas = cliente.estatisticas()
+        self.assertEqual(estatisticas["total_requisicoes"], 5)
+        self.assertEqual(estatisticas["conexoes_abertas"], 1)
+
+    def test_falhas_de_conexao_contadas(self):
+        """Tentativas sem resposta entram no total de requisições e são contadas à parte"""
+        # Porta livre sem servidor: a conexão é recusada
+        with socket.socket() as livre:
+            livre.bind(("127.0.0.1", 0))
+            porta = livre.getsockname()[1]
+        antes = METRICAS.contador("falhas_http", tipo="conexao")
+        cliente = EsajClient(pool_size=1, timeout=5)
+        for _ in range(3):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                cliente.buscar(f"http://127.0.0.1:{porta}/cpopg/search.do")
+        cliente.buscar(self.url)
+        cliente.fechar()
+
+        estatisticas = cliente.estatisticas()
+        self.assertEqual(estatisticas["total_requisicoes"], 4)
+        self.assertEqual(estatisticas["requisicoes_falhas"], 3)
+        self.assertEqual(METRICAS.contador("falhas_http", tipo="conexao") - antes, 3)
+
+    def test_pool_limita_conexoes(self):
+        """Requisições concorrentes não devem abrir mais conexões que o pool"""
+        cliente = EsajClient(pool_size=2, timeout=5)
+        threads = [threading.Thread(target=cliente.buscar, args=(self.url,)) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        cliente.fechar()
+
+        self.assertLessEqual(cliente.estatisticas()["conexoes_abertas"], 2)
+
+class TestLeituraParcial(unittest.TestCase):
+    """Testes da leitura em blocos interrompida nas páginas sem processos"""
+
+    def buscar(self, servidor, cliente, cpf):
+        return cliente.buscar(servidor.url_base, params={"dadosConsulta.valorConsulta": cpf},
+                              decidir=ParserEsaj.decidir_parcial)
+
+    def test_pagina_sem_processos_interrompida(self):
+        """A página sem processos deve parar de ser lida e a conexão descartada ser reaberta"""
+        with ServidorEsajFalso(encontrados=0, tamanho_enfeite=80000) as servidor:
+            cliente = EsajClient(pool_size=1, timeout=5)
+            response, medicao = self.buscar(servidor, cliente, "00000000191")
+            tamanho = int(response.headers["Content-Length"])
+            segunda = self.buscar(servidor, cliente, "00000000272")[1]
+            cliente.fechar()
+
+        self.assertTrue(medicao["leitura_interrompida"])
+        self.assertLess(medicao["bytes_lidos"], tamanho)
+        self.assertEqual(medicao["bytes_lidos"] + medicao["bytes_evitados"], tamanho)
+        self.assertFalse(ParserEsaj.tem_processos(response.content))
+        self.assertTrue(segunda["conexao_nova"])
+
+        estatisticas = cliente.estatisticas()
+        self.assertEqual(estatisticas["leituras_interrompidas"], 2)
+        self.assertEqual(estatisticas["conexoes_descartadas"], 2)
+        self.assertEqual(estatisticas["conexoes_abertas"], 2)
+
+    def test_restante_pequeno_drenado(self):
+        """Um restante abaixo de `dreno_max_bytes` deve ser lido para reaproveitar a conexão"""
+        with ServidorEsajFalso(encontrados=0, tamanho_enfeite=1000) as servidor:
+            cliente = EsajClient(pool_size=1, timeout=5)
+            medicoes = [self.buscar(servidor, cliente, cpf)[1] for cpf in ("00000000191", "00000000272")]
+            cliente.fechar()
+
+        self.assertTrue(medicoes[0]["leitura_interrompida"])
+        self.assertEqual(medicoes[0]["bytes_evitados"], 0)
+        self.assertFalse(medicoes[1]["conexao_nova"])
+
+    def test_pagina_com_processos_completa(self):
+        """Páginas com processos devem ser lidas inteiras"""
+        with ServidorEsajFalso(encontrados=1, paginados=0, tamanho_enfeite=80000) as servidor:
+            cliente = EsajClient(pool_size=1, timeout=5)
+            response, medicao = self.buscar(servidor, cliente, "00000000191")
+            cliente.fechar()
+
+        self.assertFalse(medicao["leitura_interrompida"])
+        self.assertEqual(len(response.content), int(response.headers["Content-Length"]))
+        self.assertIn(b"</html>", response.content)
+
+    def buscar_chunked(self, tamanho_rodape):
+        _HandlerChunked.tamanho_rodape = tamanho_rodape
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), _HandlerChunked)
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{servidor.server_address[1]}/cpopg/search.do"
+        cliente = EsajClient(pool_size=1, timeout=5)
+        try:
+            medicoes = [cliente.buscar(url, decidir=ParserEsaj.decidir_parcial)[1] for _ in range(2)]
+        finally:
+            cliente.fechar()
+            servidor.shutdown()
+            servidor.server_close()
+        return medicoes, cliente.estatisticas()
+
+    def test_chunked_restante_pequeno_mantem_conexao(self):
+        """Sem Content-Length, um restante pequeno é lido e a conexão volta ao pool"""
+        medicoes, estatisticas = self.buscar_chunked(12288)
+
+        self.assertTrue(medicoes[0]["leitura_interrompida"])
+        self.assertEqual(medicoes[0]["bytes_evitados"], 0)
+        self.assertGreater(medicoes[0]["bytes_lidos"], 0)
+        self.assertFalse(medicoes[1]["conexao_nova"])
+        self.assertEqual(estatisticas["conexoes_descartadas"], 0)
+
+    def test_chunked_restante_grande_fecha_conexao(self):
+        """Sem Content-Length, a conexão só é fechada se o corpo passar de `dreno_max_bytes`"""
+        medicoes, estatisticas = self.buscar_chunked(200000)
+
+        self.assertTrue(medicoes[0]["leitura_interrompida"])
+        self.assertIsNone(medicoes[0]["bytes_evitados"])
+        self.assertTrue(medicoes[1]["conexao_nova"])
+        self.assertEqual(estatisticas["conexoes_descartadas"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
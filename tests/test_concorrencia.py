@@ -0,0 +1,404 @@
+"""
+Testes para o módulo concorrencia
+"""
+import unittest
+import sys
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from cliente import EsajClient
+from concorrencia import (ConsultasEmAndamento, DisjuntorCircuito, LimitadorAdaptativo, LimitadorTaxa,
+                          calcular_espera, executar_em_paralelo)
+from config import ESAJ_CONFIG, RETENTATIVA_CONFIG
+from exportacao import ExportadorResultados
+import lote
+from lote import processar_consultas
+from utils import LeitorCsvEmBlocos
+
+def gerar_cpf_valido(numero):
+    """CPF válido com os 9 primeiros dígitos a partir de `numero`"""
+    digitos = [int(c) for c in f"{numero:09d}"]
+    for _ in range(2):
+        resto = sum(d * peso for d, peso in zip(digitos, range(len(digitos) + 1, 1, -1))) % 11
+        digitos.append(0 if resto < 2 else 11 - resto)
+    return "".join(map(str, digitos))
+
+RETENTATIVA_RAPIDA = {"espera_base": 0.001, "espera_max": 0.01}
+
+class _HandlerSobrecarregado(BaseHTTPRequestHandler):
+    """Responde 429 às primeiras requisições e depois uma página sem processos"""
+    protocol_version = "HTTP/1.1"
+    recusar = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            recusado = type(self).recusar > 0
+            type(self).recusar -= 1
+        corpo = b"<html>Nenhum processo</html>"
+        self.send_response(429 if recusado else 200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+class TestConcorrencia(unittest.TestCase):
+    """Testes para execução concorrente e limitador de taxa"""
+
+    def test_resultados_na_ordem_de_entrada(self):
+        """Resultados devem voltar na ordem original mesmo terminando fora de ordem"""
+        def funcao(x):
+            time.sleep(random.uniform(0, 0.01))
+            return x * 2
+
+        concluidos = []
+        resultados = executar_em_paralelo(
+            iter(range(50)), funcao, workers=8,
+            ao_concluir=lambda i, item, r: concluidos.append(i)
+        )
+
+        self.assertEqual(resultados, [x * 2 for x in range(50)])
+        self.assertEqual(sorted(concluidos), list(range(50)))
+
+    def test_workers_executam_simultaneamente(self):
+        """Com vários workers, chamadas lentas devem se sobrepor"""
+        ativos = 0
+        maximo = 0
+        lock = threading.Lock()
+
+        def funcao(x):
+            nonlocal ativos, maximo
+            with lock:
+                ativos += 1
+                maximo = max(maximo, ativos)
+            time.sleep(0.05)
+            with lock:
+                ativos -= 1
+            return x
+
+        executar_em_paralelo(range(8), funcao, workers=4)
+        self.assertGreater(maximo, 1)
+        self.assertLessEqual(maximo, 4)
+
+    def test_taxa_global_compartilhada(self):
+        """O limitador deve impor a taxa somando todos os workers"""
+        limitador = LimitadorTaxa(requisicoes_por_segundo=50)
+        inicio = time.monotonic()
+        executar_em_paralelo(range(11), lambda x: x, workers=4, limitador=limitador)
+        duracao = time.monotonic() - inicio
+
+        # 11 requisições a 50/s exigem pelo menos 10 intervalos de 20 ms
+        self.assertGreaterEqual(duracao, 0.19)
+
+    def test_limitador_por_intervalo(self):
+        """Intervalo zero significa sem limite"""
+        self.assertIsNone(LimitadorTaxa.por_intervalo(0).taxa)
+        self.assertAlmostEqual(LimitadorTaxa.por_intervalo(0.5).taxa, 2.0)
+
+class TestLimitadorAdaptativo(unittest.TestCase):
+    """Testes para o controle AIMD da taxa"""
+
+    def test_aumento_aditivo(self):
+        """Respostas saudáveis aumentam a taxa até o máximo"""
+        limitador = LimitadorAdaptativo(2, taxa_min=1, taxa_max=3, incremento=1)
+        for _ in range(4):
+            limitador.registrar(0.1)
+        self.assertGreater(limitador.taxa, 2)
+        for _ in range(100):
+            limitador.registrar(0.1)
+        self.assertAlmostEqual(limitador.taxa, 3)
+
+    def test_reducao_multiplicativa(self):
+        """Sobrecarga reduz a taxa uma vez por intervalo, respeitando o mínimo"""
+        limitador = LimitadorAdaptativo(8, taxa_min=1, taxa_max=10, fator_reducao=0.5, intervalo_reducao=60)
+        limitador.registrar(sobrecarga=True)
+        limitador.registrar(sobrecarga=True)
+        self.assertAlmostEqual(limitador.taxa, 4)
+        self.assertEqual(limitador.reducoes, 1)
+
+        limitador = LimitadorAdaptativo(2, taxa_min=1, fator_reducao=0.1, intervalo_reducao=0)
+        limitador.registrar(sobrecarga=True)
+        self.assertAlmostEqual(limitador.taxa, 1)
+
+    def test_reducao_por_latencia(self):
+        """p95 acima do limiar em relação à linha de base reduz a taxa"""
+        limitador = LimitadorAdaptativo(4, taxa_min=0.5, taxa_max=4, janela_latencia=10,
+                                        limiar_latencia=2, intervalo_reducao=0)
+        for _ in range(10):
+            limitador.registrar(0.1)
+        self.assertEqual(limitador.reducoes, 0)
+        for _ in range(10):
+            limitador.registrar(0.5)
+        self.assertEqual(limitador.reducoes, 1)
+        self.assertLess(limitador.taxa, 4)
+
+    def test_servidor_local_com_429(self):
+        """Contra um servidor que recusa as primeiras requisições, a taxa cai e volta a subir"""
+        _HandlerSobrecarregado.recusar = 5
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), _HandlerSobrecarregado)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{servidor.server_address[1]}/cpopg/search.do"
+        cliente = EsajClient(pool_size=4, timeout=5)
+
+        taxas = []
+        limitador = LimitadorAdaptativo(50, taxa_min=5, taxa_max=100, incremento=20, intervalo_reducao=0.05)
+        cpfs = pd.DataFrame({'cpf': [f"{i:011d}" for i in range(40)], 'nome': ['Teste'] * 40})
+        try:
+            with mock.patch.dict(ESAJ_CONFIG, {"base_url": url}), \
+                    mock.patch.dict(RETENTATIVA_CONFIG, RETENTATIVA_RAPIDA):
+                _, nao_encontrados, erros, _ = processar_consultas(
+                    cpfs, workers=4, cliente=cliente, limitador=limitador,
+                    disjuntor=DisjuntorCircuito(limite_falhas=100),
+                    ao_concluir=lambda cpf, nome, resultado: taxas.append(limitador.taxa)
+                )
+        finally:
+            cliente.fechar()
+            servidor.shutdown()
+            servidor.server_close()
+
+        # As respostas 429 são repetidas e não viram "não encontrado" nem erro
+        self.assertEqual(len(nao_encontrados), 40)
+        self.assertEqual(erros, [])
+        self.assertGreaterEqual(limitador.reducoes, 1)
+        self.assertLess(min(taxas), 50)
+        self.assertGreater(taxas[-1], min(taxas))
+
+class TestRetentativas(unittest.TestCase):
+    """Testes para backoff, circuit breaker e lista de erros"""
+
+    def test_calcular_espera(self):
+        """A espera cresce exponencialmente e respeita o teto"""
+        for tentativa in range(1, 10):
+            espera = calcular_espera(tentativa, base=1, maximo=8)
+            self.assertGreaterEqual(espera, 0)
+            self.assertLessEqual(espera, min(8, 2 ** (tentativa - 1)))
+
+    def test_disjuntor_pausa_e_fecha(self):
+        """Falhas seguidas abrem o circuito; o teste bem-sucedido fecha"""
+        disjuntor = DisjuntorCircuito(limite_falhas=3, pausa=0.1, pausa_max=1)
+        for _ in range(3):
+            disjuntor.registrar_falha()
+        self.assertEqual(disjuntor.estado, DisjuntorCircuito.ABERTO)
+
+        inicio = time.monotonic()
+        disjuntor.aguardar()
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.09)
+        self.assertEqual(disjuntor.estado, DisjuntorCircuito.MEIO_ABERTO)
+
+        # Teste falhou: reabre com a pausa dobrada
+        disjuntor.registrar_falha()
+        self.assertEqual(disjuntor.aberturas, 2)
+        self.assertGreater(disjuntor.segundos_para_reabrir, 0.1)
+
+        disjuntor.aguardar()
+        disjuntor.registrar_sucesso()
+        self.assertEqual(disjuntor.estado, DisjuntorCircuito.FECHADO)
+
+    def test_meio_aberto_libera_um_teste(self):
+        """Com o circuito meio aberto, os demais workers esperam o resultado do teste"""
+        disjuntor = DisjuntorCircuito(limite_falhas=1, pausa=0)
+        disjuntor.registrar_falha()
+        disjuntor.aguardar()
+
+        liberado = threading.Event()
+        threading.Thread(target=lambda: (disjuntor.aguardar(), liberado.set()), daemon=True).start()
+        self.assertFalse(liberado.wait(0.1))
+        disjuntor.registrar_sucesso()
+        self.assertTrue(liberado.wait(1))
+
+    def test_falhas_vao_para_erros(self):
+        """Falha transitória é repetida; falha persistente vai para a lista de erros"""
+        chamadas = {}
+
+        def consulta_falsa(cpf, nome, cliente=None, limitador=None, analise=None):
+            chamadas[cpf] = chamadas.get(cpf, 0) + 1
+            if cpf == '11111111111' and chamadas[cpf] == 1:
+                return {'sucesso': False, 'erro': 'Timeout na consulta', 'timeout': True}
+            if cpf == '22222222222':
+                return {'sucesso': False, 'erro': 'Erro HTTP 503', 'status_code': 503}
+            return {'sucesso': True, 'encontrado': False, 'processos': [], 'total_processos': 0}
+
+        cpfs = pd.DataFrame({'cpf': ['11111111111', '22222222222', '33333333333'], 'nome': ['A', 'B', 'C']})
+        with mock.patch.object(lote, 'consultar_esaj', consulta_falsa), \
+                mock.patch.dict(RETENTATIVA_CONFIG, {"max_tentativas": 3, **RETENTATIVA_RAPIDA}):
+            encontrados, nao_encontrados, erros, estatisticas = processar_consultas(
+                cpfs, disjuntor=DisjuntorCircuito(limite_falhas=100)
+            )
+
+        self.assertEqual([r['cpf'] for r in nao_encontrados], ['11111111111', '33333333333'])
+        self.assertEqual(len(erros), 1)
+        self.assertEqual(erros[0]['cpf'], '22222222222')
+        self.assertEqual(erros[0]['tentativas'], 3)
+        self.assertEqual(chamadas['22222222222'], 3)
+        self.assertEqual(estatisticas['retentativas'], 3)
+
+class TestDeduplicacao(unittest.TestCase):
+    """Testes para deduplicação de CPFs e agrupamento de consultas em andamento"""
+
+    def test_cpf_repetido_consultado_uma_vez(self):
+        """Formatos diferentes do mesmo CPF geram uma consulta e um resultado por linha"""
+        chamadas = []
+
+        def consulta_falsa(cpf, nome, cliente=None, limitador=None, analise=None):
+            chamadas.append(cpf)
+            return {'sucesso': True, 'encontrado': False, 'processos': [], 'total_processos': 0}
+
+        cpfs = pd.DataFrame({'cpf': ['111.444.777-35', '11144477735', '52998224725', '11144477735'],
+                             'nome': ['A', 'B', 'C', 'D']})
+        with mock.patch.object(lote, 'consultar_esaj', consulta_falsa):
+            _, nao_encontrados, _, estatisticas = processar_consultas(cpfs, workers=4)
+
+        self.assertEqual(len(chamadas), 2)
+        self.assertEqual([r['nome'] for r in nao_encontrados], ['A', 'B', 'C', 'D'])
+        self.assertEqual([r['cpf'] for r in nao_encontrados], list(cpfs['cpf']))
+        self.assertEqual(estatisticas['duplicados'], 2)
+
+    def test_cpf_repetido_em_blocos_diferentes(self):
+        """Na leitura em blocos, um CPF repetido em outro bloco reaproveita o resultado"""
+        chamadas = []
+
+        def consulta_falsa(cpf, nome, cliente=None, limitador=None, analise=None):
+            chamadas.append(cpf)
+            return {'sucesso': True, 'encontrado': False, 'processos': [], 'total_processos': 0}
+
+        arquivo = io.StringIO("cpf,nome\n11144477735,A\n52998224725,B\n111.444.777-35,C\n11144477735,D\n")
+        leitor = LeitorCsvEmBlocos(arquivo, tamanho_bloco=2)
+        try:
+            with mock.patch.object(lote, 'consultar_esaj', consulta_falsa):
+                _, nao_encontrados, _, estatisticas = processar_consultas(leitor, workers=2)
+        finally:
+            leitor.remover_invalidos()
+
+        self.assertEqual(sorted(chamadas), ['11144477735', '52998224725'])
+        self.assertEqual([r['nome'] for r in nao_encontrados], ['A', 'B', 'C', 'D'])
+        self.assertEqual(estatisticas['duplicados'], 2)
+        self.assertEqual(estatisticas['consultas'], 4)
+
+    def test_repetidos_em_blocos_memoria_constante(self):
+        """Com exportador e leitura em blocos, o pico de memória não cresce com o arquivo"""
+        def consulta_falsa(cpf, nome, cliente=None, limitador=None, analise=None):
+            return {'sucesso': True, 'encontrado': True, 'nome_extraido': 'FULANO DE TAL', 'total_processos': 10,
+                    'processos': [{'numero': f'{cpf}-{i:04d}.2020.8.26.0100', 'classe': 'Precatório',
+                                   'data': '01/01/2020'} for i in range(10)]}
+
+        def pico_memoria(distintos):
+            # Cada CPF aparece duas vezes, a segunda em um bloco posterior
+            cpfs = [gerar_cpf_valido(i) for i in range(1, distintos + 1)]
+            arquivo = io.StringIO("cpf,nome\n" + "".join(f"{cpf},Nome\n" for cpf in cpfs * 2))
+            leitor = LeitorCsvEmBlocos(arquivo, tamanho_bloco=100)
+            with tempfile.TemporaryDirectory() as diretorio:
+                exportador = ExportadorResultados(os.path.join(diretorio, "lote"))
+                with mock.patch.object(lote, 'consultar_esaj', consulta_falsa):
+                    tracemalloc.start()
+                    try:
+                        _, _, _, estatisticas = processar_consultas(leitor, workers=2, exportador=exportador,
+                                                                    em_andamento=ConsultasEmAndamento())
+                        pico = tracemalloc.get_traced_memory()[1]
+                    finally:
+                        tracemalloc.stop()
+                        exportador.fechar()
+                        leitor.remover_invalidos()
+            self.assertEqual(estatisticas['duplicados'], distintos)
+            return pico
+
+        pequeno = pico_memoria(300)
+        grande = pico_memoria(1500)
+        self.assertLess(grande, pequeno * 1.3)
+
+    def test_agrupa_chamadas_simultaneas(self):
+        """Chamadas simultâneas com a mesma chave executam a função uma vez"""
+        em_andamento = ConsultasEmAndamento()
+        execucoes = []
+        liberar = threading.Event()
+
+        def funcao():
+            execucoes.append(1)
+            liberar.wait(1)
+            return {'valor': 42}
+
+        resultados = []
+        threads = [threading.Thread(target=lambda: resultados.append(em_andamento.executar('x', funcao)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        liberar.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(execucoes), 1)
+        self.assertEqual([r for r, _ in resultados], [{'valor': 42}] * 5)
+        self.assertEqual(sum(compartilhado for _, compartilhado in resultados), 4)
+        self.assertEqual(em_andamento.compartilhadas, 4)
+        self.assertEqual(len(em_andamento), 0)
+
+    def test_excecao_repassada(self):
+        """Uma falha na execução original chega a todas as chamadas que aguardavam"""
+        em_andamento = ConsultasEmAndamento()
+        iniciou = threading.Event()
+        erros = []
+
+        def falha():
+            iniciou.set()
+            time.sleep(0.05)
+            raise RuntimeError("queda")
+
+        def aguardar():
+            iniciou.wait(1)
+            try:
+                em_andamento.executar('x', falha)
+            except RuntimeError as e:
+                erros.append(e)
+
+        thread = threading.Thread(target=aguardar)
+        thread.start()
+        with self.assertRaises(RuntimeError):
+            em_andamento.executar('x', falha)
+        thread.join()
+        self.assertEqual(len(erros), 1)
+        self.assertEqual(len(em_andamento), 0)
+
+    def test_lotes_simultaneos_compartilham_requisicao(self):
+        """Dois lotes consultando o mesmo CPF ao mesmo tempo geram uma única requisição"""
+        chamadas = []
+        lock = threading.Lock()
+
+        def consulta_lenta(cpf, nome, cliente=None, limitador=None, analise=None):
+            with lock:
+                chamadas.append(cpf)
+            time.sleep(0.2)
+            return {'sucesso': True, 'encontrado': False, 'processos': [], 'total_processos': 0}
+
+        em_andamento = ConsultasEmAndamento()
+        cpfs = pd.DataFrame({'cpf': ['11144477735'], 'nome': ['A']})
+        estatisticas = []
+
+        def lote_simultaneo():
+            estatisticas.append(processar_consultas(cpfs, em_andamento=em_andamento)[3])
+
+        with mock.patch.object(lote, 'consultar_esaj', consulta_lenta):
+            threads = [threading.Thread(target=lote_simultaneo) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(chamadas, ['11144477735'])
+        self.assertEqual(sorted(e['compartilhadas'] for e in estatisticas), [0, 1])
+
+if __name__ == '__main__':
+    unittest.main()
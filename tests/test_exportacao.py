@@ -0,0 +1,119 @@
+"""
+Testes para o módulo exportacao
+"""
+import unittest
+import sys
+import os
+import tempfile
+import pandas as pd
+from unittest import mock
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import lote
+from exportacao import PARQUET_DISPONIVEL, ExportadorResultados, converter_para_parquet
+from utils import reformatar_dados_para_csv
+
+ENCONTRADO = {
+    'sucesso': True, 'encontrado': True, 'nome_extraido': 'JOAO DA SILVA', 'total_processos': 2,
+    'processos': [
+        {'numero': '0001234-56.2020.8.26.0100', 'classe': 'Precatório', 'data': '01/02/2020'},
+        {'numero': '0006543-21.2021.8.26.0100', 'classe': 'Requisição', 'data': '03/04/2021'}
+    ],
+    'data_consulta': '01/01/2025 10:00:00'
+}
+NAO_ENCONTRADO = {'sucesso': True, 'encontrado': False, 'processos': [], 'total_processos': 0,
+                  'data_consulta': '01/01/2025 10:00:01'}
+ERRO = {'sucesso': False, 'erro': 'Timeout na consulta', 'tentativas': 3, 'data_consulta': '01/01/2025 10:00:02'}
+
+class TestExportadorResultados(unittest.TestCase):
+    """Testes para a gravação incremental dos resultados"""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_mesmo_formato_do_download(self):
+        """O CSV de encontrados deve ser igual ao gerado por reformatar_dados_para_csv"""
+        exportador = ExportadorResultados(os.path.join(self.diretorio.name, "lote"))
+        exportador.registrar('11144477735', 'João', ENCONTRADO)
+        exportador.fechar()
+
+        esperado = reformatar_dados_para_csv([{'cpf': '11144477735', 'nome': 'João', **ENCONTRADO}])
+        gravado = pd.read_csv(exportador.caminhos['encontrados'], dtype=str, encoding='utf-8-sig')
+        pd.testing.assert_frame_equal(gravado, esperado.astype(str))
+
+    def test_encontrado_sem_processos(self):
+        """Um CPF encontrado sem processos extraídos deve gerar a linha de sequência 0"""
+        sem_processos = {**ENCONTRADO, 'processos': [], 'total_processos': 0}
+        exportador = ExportadorResultados(os.path.join(self.diretorio.name, "lote"))
+        exportador.registrar('11144477735', 'João', sem_processos)
+        exportador.fechar()
+
+        esperado = reformatar_dados_para_csv([{'cpf': '11144477735', 'nome': 'João', **sem_processos}])
+        gravado = pd.read_csv(exportador.caminhos['encontrados'], dtype=str, encoding='utf-8-sig',
+                              keep_default_na=False)
+        self.assertEqual(len(gravado), 1)
+        self.assertEqual(gravado['Sequencia_Processo'].tolist(), ['0'])
+        pd.testing.assert_frame_equal(gravado, esperado.fillna('').astype(str))
+
+    def test_leitura_parcial_e_contagens(self):
+        """O conteúdo pode ser lido durante o lote e as contagens acompanham as linhas"""
+        exportador = ExportadorResultados(os.path.join(self.diretorio.name, "lote"), intervalo_descarga=3600)
+        exportador.registrar('11144477735', 'João', ENCONTRADO)
+        exportador.registrar('52998224725', 'Maria', NAO_ENCONTRADO)
+        exportador.registrar('39053344705', 'Pedro', ERRO)
+
+        self.assertEqual(exportador.contagens,
+                         {'encontrados': 1, 'nao_encontrados': 1, 'erros': 1, 'processos': 2,
+                          'novos': 0, 'removidos': 0})
+        self.assertIn(b'52998224725', exportador.conteudo('nao_encontrados'))
+        self.assertEqual(len(exportador.previa('encontrados')), 2)
+        self.assertEqual(exportador.previa('erros')['erro'].tolist(), ['Timeout na consulta'])
+
+        exportador.remover()
+        self.assertFalse(os.path.exists(exportador.diretorio))
+
+    def test_processar_consultas_com_exportador(self):
+        """Com exportador, o lote grava em disco e não acumula listas em memória"""
+        def consulta_falsa(cpf, nome, cliente=None, limitador=None, analise=None):
+            return dict(ENCONTRADO if cpf.endswith('35') else NAO_ENCONTRADO)
+
+        cpfs = pd.DataFrame({'cpf': ['11144477735', '52998224725'], 'nome': ['João', 'Maria']})
+        exportador = ExportadorResultados(os.path.join(self.diretorio.name, "lote"))
+        with mock.patch.object(lote, 'consultar_esaj', consulta_falsa):
+            encontrados, nao_encontrados, erros, _ = lote.processar_consultas(cpfs, exportador=exportador)
+        exportador.fechar()
+
+        self.assertEqual((encontrados, nao_encontrados, erros), ([], [], []))
+        self.assertEqual(exportador.contagens['processos'], 2)
+        self.assertEqual(len(exportador.previa('nao_encontrados')), 1)
+
+    @unittest.skipUnless(PARQUET_DISPONIVEL, "pyarrow não instalado")
+    def test_parquet_tipado(self):
+        """O Parquet tem CPF normalizado, datas e sequência tipadas e um row group por bloco"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        exportador = ExportadorResultados(os.path.join(self.diretorio.name, "lote"))
+        exportador.registrar('111.444.777-35', 'João', ENCONTRADO)
+        exportador.registrar('52998224725', 'Maria', ENCONTRADO)
+        exportador.fechar()
+        caminho = converter_para_parquet(exportador.caminhos['encontrados'], linhas_por_grupo=3)
+
+        arquivo = pq.ParquetFile(caminho)
+        self.assertEqual(arquivo.metadata.num_row_groups, 2)
+        self.assertEqual(arquivo.metadata.row_group(0).column(0).compression, 'ZSTD')
+
+        tabela = arquivo.read()
+        self.assertEqual(tabela.schema.field('CPF').type, pa.binary(11))
+        self.assertEqual(tabela.schema.field('Sequencia_Processo').type, pa.int16())
+        self.assertEqual(tabela.schema.field('Data_Processo').type, pa.date32())
+        self.assertEqual(tabela.column('CPF').to_pylist(), [b'11144477735'] * 2 + [b'52998224725'] * 2)
+        self.assertEqual(str(tabela.column('Data_Processo')[1]), '2021-04-03')
+
+if __name__ == '__main__':
+    unittest.main()
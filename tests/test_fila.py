@@ -0,0 +1,199 @@
+"""
+Testes para a fila de trabalho compartilhada
+"""
+import unittest
+import sys
+import os
+import time
+import logging
+import tempfile
+import multiprocessing
+import pandas as pd
+from unittest import mock
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import lote
+from concorrencia import ConsultasEmAndamento, LimitadorTaxa
+from fila import FilaTrabalho, MonitoramentoIncompativel, executar_trabalhador, processar_reserva
+from monitoramento import SnapshotProcessos
+
+def gerar_cpfs(quantidade):
+    return pd.DataFrame({'cpf': [f"{i:011d}" for i in range(1, quantidade + 1)],
+                         'nome': [f"Pessoa {i}" for i in range(1, quantidade + 1)]})
+
+def trabalhador(caminho, id_lote, morrer_apos=None):
+    """Processo trabalhador com e-SAJ falso; com `morrer_apos`, encerra no meio de uma reserva"""
+    logging.disable(logging.CRITICAL)
+    chamadas = []
+
+    def consulta_falsa(cpf, nome, cliente=None, limitador=None, analise=None):
+        chamadas.append(cpf)
+        if morrer_apos is not None and len(chamadas) > morrer_apos:
+            os._exit(1)
+        time.sleep(0.01)
+        return {'sucesso': True, 'encontrado': False, 'nome_extraido': '', 'processos': [],
+                'total_processos': 0, 'tempo_requisicao': 0.01}
+
+    fila = FilaTrabalho(caminho, tamanho_reserva=5, duracao_reserva=1)
+    with mock.patch.object(lote, 'consultar_esaj', consulta_falsa):
+        executar_trabalhador(fila, id_lote, intervalo_espera=0.05, workers=2, limitador=LimitadorTaxa(None),
+                             em_andamento=ConsultasEmAndamento())
+    fila.fechar()
+
+class TestFilaTrabalho(unittest.TestCase):
+    """Testes para reservas, expiração e trabalhadores em processos separados"""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.diretorio.name, "fila.db")
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_enfileirar_idempotente(self):
+        """Enfileirar o mesmo lote de novo (outro nó) não duplica CPFs"""
+        fila = FilaTrabalho(self.caminho)
+        self.assertEqual(fila.enfileirar("lote", gerar_cpfs(7)), 7)
+        self.assertEqual(fila.enfileirar("lote", gerar_cpfs(7)), 7)
+        self.assertEqual(fila.progresso("lote"), {'pendente': 7, 'reservada': 0, 'concluida': 0})
+        fila.fechar()
+
+    def test_modo_de_monitoramento_do_lote(self):
+        """O lote guarda o modo de monitoramento e recusa trabalhadores e reenvios do outro modo"""
+        fila = FilaTrabalho(self.caminho)
+        fila.enfileirar("lote", gerar_cpfs(3), monitoramento=True)
+        self.assertTrue(fila.monitoramento("lote"))
+        with self.assertRaises(MonitoramentoIncompativel):
+            fila.enfileirar("lote", gerar_cpfs(3))
+
+        chamadas = []
+
+        def consulta_falsa(cpf, nome, cliente=None, limitador=None, analise=None):
+            chamadas.append(cpf)
+            return {'sucesso': True, 'encontrado': False, 'processos': [], 'total_processos': 0}
+
+        with mock.patch.object(lote, 'consultar_esaj', consulta_falsa):
+            with self.assertRaises(MonitoramentoIncompativel):
+                executar_trabalhador(fila, workers=1, limitador=LimitadorTaxa(None))
+            # Nada consultado e a reserva devolvida sem contar como tentativa
+            self.assertEqual(chamadas, [])
+            self.assertEqual(fila.progresso("lote"), {'pendente': 3, 'reservada': 0, 'concluida': 0})
+
+            monitor = SnapshotProcessos(os.path.join(self.diretorio.name, "monitoramento.db"))
+            estatisticas = executar_trabalhador(fila, workers=1, limitador=LimitadorTaxa(None), monitor=monitor)
+        self.assertEqual(estatisticas['aceitos'], 3)
+        self.assertTrue(all('novos' in resultado for _, _, resultado in fila.resultados("lote")))
+
+        fila.remover("lote")
+        self.assertIsNone(fila.monitoramento("lote"))
+        fila.fechar()
+
+    def test_reserva_expirada_volta_para_a_fila(self):
+        """Após expirar, os CPFs vão para outro trabalhador e a reserva antiga não conclui mais"""
+        fila = FilaTrabalho(self.caminho, tamanho_reserva=2, duracao_reserva=0.2)
+        fila.enfileirar("lote", gerar_cpfs(4))
+        primeira = fila.reservar("lote")
+        segunda = fila.reservar("lote")
+        self.assertEqual([item[0] for item in primeira.itens], [0, 1])
+        self.assertEqual([item[0] for item in segunda.itens], [2, 3])
+        self.assertIsNone(fila.reservar("lote"))
+
+        time.sleep(0.3)
+        # Expirada, mas ainda não reservada por outro: a renovação recupera a reserva
+        self.assertTrue(fila.renovar(segunda))
+        terceira = fila.reservar("lote")
+        self.assertEqual([item[0] for item in terceira.itens], [0, 1])
+
+        resultado = {'sucesso': True, 'encontrado': False, 'data_consulta': '01/01/2025 10:00:00'}
+        self.assertEqual(fila.concluir(primeira, [(0, resultado), (1, resultado)]), 0)
+        self.assertFalse(fila.renovar(primeira))
+        self.assertEqual(fila.concluir(terceira, [(0, resultado), (1, resultado)]), 2)
+        self.assertEqual(fila.progresso("lote")['concluida'], 2)
+        fila.fechar()
+
+    def test_cpf_esgotado_vira_erro(self):
+        """Um CPF cujas reservas expiram `max_reservas` vezes é encerrado como erro"""
+        fila = FilaTrabalho(self.caminho, tamanho_reserva=1, duracao_reserva=0.05, max_reservas=1)
+        fila.enfileirar("lote", gerar_cpfs(1))
+        self.assertIsNotNone(fila.reservar("lote"))
+        time.sleep(0.1)
+        self.assertIsNone(fila.reservar("lote"))
+
+        (cpf, _, resultado), = list(fila.resultados("lote"))
+        self.assertEqual(cpf, "00000000001")
+        self.assertFalse(resultado['sucesso'])
+        self.assertIn("expirada", resultado['erro'])
+        fila.fechar()
+
+    def consultar_reserva(self, fila, reserva, atraso, ao_concluir=None):
+        def consulta_lenta(cpf, nome, cliente=None, limitador=None, analise=None):
+            time.sleep(atraso)
+            return {'sucesso': True, 'encontrado': False, 'processos': [], 'total_processos': 0}
+
+        with mock.patch.object(lote, 'consultar_esaj', consulta_lenta):
+            return processar_reserva(fila, reserva, ao_concluir=ao_concluir, workers=1,
+                                     limitador=LimitadorTaxa(None), em_andamento=ConsultasEmAndamento())
+
+    def test_reserva_renovada_e_gravada_a_cada_cpf(self):
+        """Consultas mais longas que o prazo não perdem a reserva e cada CPF é gravado ao terminar"""
+        fila = FilaTrabalho(self.caminho, tamanho_reserva=3, duracao_reserva=0.3)
+        fila.enfileirar("lote", gerar_cpfs(3))
+        reserva = fila.reservar("lote")
+        outra = FilaTrabalho(self.caminho, duracao_reserva=0.3)
+        gravados = []
+
+        def ao_concluir(cpf, nome, resultado):
+            gravados.append(outra.progresso("lote")['concluida'])
+            self.assertIsNone(outra.reservar("lote"))
+
+        estatisticas = self.consultar_reserva(fila, reserva, 0.4, ao_concluir)
+        self.assertEqual(estatisticas['aceitos'], 3)
+        self.assertEqual(gravados, [1, 2, 3])
+        self.assertEqual(fila.progresso("lote"), {'pendente': 0, 'reservada': 0, 'concluida': 3})
+        outra.fechar()
+        fila.fechar()
+
+    def test_reserva_perdida_interrompe_consultas(self):
+        """Sem renovação, a reserva passa a outro trabalhador e as gravações seguintes são recusadas"""
+        fila = FilaTrabalho(self.caminho, tamanho_reserva=3, duracao_reserva=0.2)
+        fila.enfileirar("lote", gerar_cpfs(3))
+        reserva = fila.reservar("lote")
+        outra = FilaTrabalho(self.caminho, duracao_reserva=60)
+        tomadas = []
+
+        def ao_concluir(cpf, nome, resultado):
+            time.sleep(0.3)
+            tomadas.append(outra.reservar("lote"))
+
+        with mock.patch.object(FilaTrabalho, 'renovar', return_value=False):
+            estatisticas = self.consultar_reserva(fila, reserva, 0.01, ao_concluir)
+
+        self.assertEqual(estatisticas, {'aceitos': 1})
+        self.assertEqual([item[0] for item in tomadas[0].itens], [1, 2])
+        self.assertEqual(fila.progresso("lote"), {'pendente': 0, 'reservada': 2, 'concluida': 1})
+        outra.fechar()
+        fila.fechar()
+
+    def test_varios_processos_com_trabalhador_morto(self):
+        """Três processos dividem o lote; as reservas do que morre são refeitas pelos outros"""
+        fila = FilaTrabalho(self.caminho)
+        fila.enfileirar("lote", gerar_cpfs(60))
+
+        processos = [multiprocessing.Process(target=trabalhador, args=(self.caminho, "lote", morrer_apos))
+                     for morrer_apos in (3, None, None)]
+        for processo in processos:
+            processo.start()
+        for processo in processos:
+            processo.join(timeout=60)
+
+        self.assertEqual([processo.exitcode for processo in processos], [1, 0, 0])
+        self.assertEqual(fila.progresso("lote"), {'pendente': 0, 'reservada': 0, 'concluida': 60})
+        resultados = list(fila.resultados("lote"))
+        self.assertEqual([cpf for cpf, _, _ in resultados], gerar_cpfs(60)['cpf'].tolist())
+        self.assertTrue(all(resultado['sucesso'] for _, _, resultado in resultados))
+        fila.fechar()
+
+if __name__ == '__main__':
+    unittest.main()
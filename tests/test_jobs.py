@@ -0,0 +1,101 @@
+"""
+Testes para o módulo jobs
+"""
+import unittest
+import sys
+import os
+import threading
+import time
+from unittest import mock
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from jobs import GerenciadorJobs, Job
+
+def aguardar(job, limite=5):
+    inicio = time.monotonic()
+    while job.ativo and time.monotonic() - inicio < limite:
+        time.sleep(0.01)
+
+class TestGerenciadorJobs(unittest.TestCase):
+    """Testes para a execução de lotes em segundo plano"""
+
+    def test_job_concluido_com_progresso(self):
+        """O job roda fora da thread chamadora e guarda o resultado"""
+        gerenciador = GerenciadorJobs(max_simultaneos=1, max_historico=5, max_eventos=3)
+        liberar = threading.Event()
+
+        def lote(job, cpfs):
+            liberar.wait(5)
+            for cpf in cpfs:
+                job.registrar_progresso(cpf, "Fulano", {"sucesso": True, "encontrado": True, "total_processos": 1})
+            return len(cpfs)
+
+        job = gerenciador.submeter("lote", 4, lote, ["1", "2", "3", "4"])
+        self.assertTrue(job.ativo)
+        liberar.set()
+        aguardar(job)
+
+        self.assertEqual(job.status, Job.CONCLUIDO)
+        self.assertEqual(job.resultado, 4)
+        self.assertEqual(job.progresso, 1.0)
+        self.assertEqual([e["cpf"] for e in job.eventos], ["2", "3", "4"])
+        self.assertIs(gerenciador.obter(job.id), job)
+
+    def test_cancelamento_e_erro(self):
+        """Cancelamento interrompe o job; exceções ficam registradas no job"""
+        gerenciador = GerenciadorJobs(max_simultaneos=2, max_historico=5, max_eventos=3)
+
+        def infinito(job):
+            while True:
+                job.registrar_progresso("1", "Fulano", {"sucesso": True, "encontrado": False})
+                time.sleep(0.01)
+
+        def falha(job):
+            raise ValueError("arquivo inválido")
+
+        cancelado = gerenciador.submeter("infinito", 10, infinito)
+        com_erro = gerenciador.submeter("falha", 1, falha)
+        cancelado.cancelar()
+        aguardar(cancelado)
+        aguardar(com_erro)
+
+        self.assertEqual(cancelado.status, Job.CANCELADO)
+        self.assertEqual(com_erro.status, Job.ERRO)
+        self.assertEqual(com_erro.erro, "arquivo inválido")
+        self.assertEqual([j.id for j in gerenciador.listar()], [com_erro.id, cancelado.id])
+
+    def test_historico_limitado(self):
+        """Apenas os jobs finalizados mais recentes são mantidos"""
+        gerenciador = GerenciadorJobs(max_simultaneos=1, max_historico=2, max_eventos=3)
+        limpos = []
+        for i in range(4):
+            job = gerenciador.submeter(f"lote {i}", 0, lambda job: None)
+            job.registrar_limpeza(lambda i=i: limpos.append(i))
+            aguardar(job)
+        gerenciador.submeter("último", 0, lambda job: None)
+
+        self.assertLessEqual(len(gerenciador.listar()), 3)
+        # Jobs descartados do histórico liberam seus recursos
+        self.assertEqual(limpos, [0, 1])
+
+    def test_vazao_e_tempo_restante(self):
+        """Vazão medida na janela recente e tempo restante estimado a partir dela"""
+        job = Job("lote", 100, max_eventos=3)
+        relogio = [1000.0]
+        with mock.patch("jobs.time.monotonic", lambda: relogio[0]):
+            self.assertIsNone(job.vazao)
+            for _ in range(20):
+                job.registrar_progresso("1", "Fulano", {"sucesso": True, "encontrado": False})
+                relogio[0] += 0.5
+            # 20 CPFs em 10 s
+            self.assertAlmostEqual(job.vazao, 2.0, delta=0.2)
+            self.assertAlmostEqual(job.segundos_restantes, 42, delta=4)
+
+            # Lote parado: a vazão cai em vez de manter o último valor
+            relogio[0] += 30
+            self.assertLess(job.vazao, 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
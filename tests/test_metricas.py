@@ -0,0 +1,108 @@
+"""
+Testes para o módulo metricas
+"""
+import unittest
+import sys
+import os
+import json
+import tempfile
+from unittest import mock
+from urllib.request import urlopen
+
+# Adicionar os diretórios src e benchmarks ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from cliente import EsajClient
+from config import ESAJ_CONFIG
+from metricas import METRICAS, Histograma, RegistroMetricas, iniciar_servidor_metricas
+from servidor_esaj import ServidorEsajFalso
+from utils import consultar_esaj
+
+class TestMetricas(unittest.TestCase):
+    """Testes para histogramas, contadores e exportação"""
+
+    def test_quantis_do_histograma(self):
+        """Quantis estimados caem no bucket correto"""
+        histograma = Histograma((0.01, 0.1, 1))
+        self.assertIsNone(histograma.quantil(0.5))
+        for _ in range(90):
+            histograma.observar(0.005)
+        for _ in range(10):
+            histograma.observar(0.5)
+        self.assertLessEqual(histograma.quantil(0.5), 0.01)
+        self.assertGreater(histograma.quantil(0.95), 0.1)
+        self.assertAlmostEqual(histograma.soma, 90 * 0.005 + 10 * 0.5)
+
+        histograma.observar(60)
+        self.assertEqual(histograma.quantil(1.0), 1)
+
+    def test_contadores_com_rotulos(self):
+        """Contadores somam os rótulos não filtrados"""
+        registro = RegistroMetricas()
+        registro.incrementar("respostas_http", status=200)
+        registro.incrementar("respostas_http", 3, status=429)
+        self.assertEqual(registro.contador("respostas_http"), 4)
+        self.assertEqual(registro.contador("respostas_http", status=429), 3)
+        self.assertEqual(registro.contador("inexistente"), 0)
+
+    def test_exportacao_prometheus_e_json(self):
+        """Texto do Prometheus com buckets cumulativos e JSON equivalente em arquivo"""
+        registro = RegistroMetricas(limites=(0.1, 1))
+        with registro.medir("parse_html"):
+            pass
+        registro.observar("parse_html", 0.5)
+        registro.incrementar("retentativas", 2)
+
+        texto = registro.exportar_prometheus()
+        self.assertIn("# TYPE esaj_etapa_segundos histogram", texto)
+        self.assertIn('esaj_etapa_segundos_bucket{etapa="parse_html",le="0.1"} 1', texto)
+        self.assertIn('esaj_etapa_segundos_bucket{etapa="parse_html",le="+Inf"} 2', texto)
+        self.assertIn('esaj_etapa_segundos_count{etapa="parse_html"} 2', texto)
+        self.assertIn("esaj_retentativas_total 2", texto)
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, "sub", "metricas.json")
+            registro.gravar_json(caminho)
+            with open(caminho, encoding="utf-8") as arquivo:
+                dados = json.load(arquivo)
+        self.assertEqual(dados["etapas"]["parse_html"]["contagem"], 2)
+        self.assertEqual(dados["contadores"]["retentativas_total"], 2)
+
+    def test_endpoint_metrics(self):
+        """O endpoint HTTP serve o texto do Prometheus e o JSON"""
+        registro = RegistroMetricas()
+        registro.incrementar("consultas", desfecho="encontrado")
+        servidor = iniciar_servidor_metricas(0, "127.0.0.1", registro)
+        try:
+            base = f"http://127.0.0.1:{servidor.server_address[1]}"
+            with urlopen(f"{base}/metrics") as resposta:
+                self.assertIn('esaj_consultas_total{desfecho="encontrado"} 1', resposta.read().decode())
+            with urlopen(f"{base}/metrics.json") as resposta:
+                self.assertIn('consultas_total{desfecho="encontrado"}', json.load(resposta)["contadores"])
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+
+    def test_etapas_da_consulta(self):
+        """Uma consulta registra conexão, primeiro byte, download, parse e status"""
+        METRICAS.zerar()
+        cliente = EsajClient(pool_size=1, timeout=5)
+        with ServidorEsajFalso(encontrados=1, tamanho_enfeite=0) as servidor:
+            try:
+                with mock.patch.dict(ESAJ_CONFIG, {"base_url": servidor.url_base,
+                                                   "url_paginacao": servidor.url_paginacao}):
+                    for cpf in ("11144477735", "52998224725"):
+                        consultar_esaj(cpf, "Teste", cliente)
+            finally:
+                cliente.fechar()
+
+        etapas = METRICAS.etapas()
+        # Conexão keep-alive: aberta uma vez para as duas consultas
+        self.assertEqual(etapas["http_conexao"]["contagem"], 1)
+        for etapa in ("http_primeiro_byte", "http_download", "parse_html"):
+            self.assertGreaterEqual(etapas[etapa]["contagem"], 2)
+        self.assertEqual(METRICAS.contador("respostas_http", status=200), 2)
+
+if __name__ == '__main__':
+    unittest.main()
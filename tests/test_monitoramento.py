@@ -0,0 +1,190 @@
+"""
+Testes para o modo de monitoramento
+"""
+import unittest
+import sys
+import os
+import tempfile
+import pandas as pd
+from unittest import mock
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import lote
+from concorrencia import ConsultasEmAndamento
+from config import CHECKPOINT_CONFIG
+from exportacao import ExportadorResultados
+from monitoramento import SnapshotProcessos
+
+PROCESSO_A = {'numero': '0001234-56.2020.8.26.0100', 'classe': 'Precatório', 'data': '01/02/2020'}
+PROCESSO_B = {'numero': '0006543-21.2021.8.26.0100', 'classe': 'Requisição', 'data': '03/04/2021'}
+PROCESSO_C = {'numero': '0009999-00.2024.8.26.0100', 'classe': 'Precatório', 'data': '05/06/2024'}
+
+def resultado(*processos):
+    return {'sucesso': True, 'encontrado': bool(processos), 'nome_extraido': 'JOAO DA SILVA' if processos else '',
+            'processos': list(processos), 'total_processos': len(processos)}
+
+class TestSnapshotProcessos(unittest.TestCase):
+    """Testes para a comparação com o snapshot"""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.diretorio.name, "monitoramento.db")
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_novos_e_removidos(self):
+        """A primeira consulta traz tudo como novo; as seguintes apenas a diferença"""
+        sessao = SnapshotProcessos(self.caminho).sessao()
+        self.assertEqual(sessao.comparar('111.444.777-35', [PROCESSO_A, PROCESSO_B]), ([PROCESSO_A, PROCESSO_B], []))
+        self.assertEqual(sessao.comparar('11144477735', [PROCESSO_A, PROCESSO_B]), ([], []))
+        self.assertEqual(sessao.comparar('11144477735', [PROCESSO_B, PROCESSO_C]), ([PROCESSO_C], [PROCESSO_A]))
+        self.assertEqual(sessao.comparar('11144477735', []), ([], [PROCESSO_B, PROCESSO_C]))
+        sessao.confirmar()
+        sessao.fechar()
+        self.assertEqual(SnapshotProcessos(self.caminho).estatisticas(), {'cpfs': 1, 'processos': 0})
+
+    def test_persistencia_e_confirmacao(self):
+        """Comparações pendentes só são gravadas em `confirmar` e valem na próxima execução"""
+        snapshot = SnapshotProcessos(self.caminho)
+        sessao = snapshot.sessao()
+        sessao.comparar('11144477735', [PROCESSO_A])
+        sessao.comparar('52998224725', [PROCESSO_B])
+        self.assertEqual(sessao.pendentes, 2)
+        self.assertEqual(snapshot.estatisticas(), {'cpfs': 0, 'processos': 0})
+        sessao.confirmar()
+        sessao.comparar('39053344705', [PROCESSO_C])
+        # Fechar sem confirmar descarta
+        sessao.fechar()
+
+        snapshot = SnapshotProcessos(self.caminho)
+        self.assertEqual(snapshot.estatisticas(), {'cpfs': 2, 'processos': 2})
+        sessao = snapshot.sessao()
+        self.assertEqual(sessao.comparar('11144477735', [PROCESSO_A, PROCESSO_C]), ([PROCESSO_C], []))
+        sessao.fechar()
+
+    def test_sessoes_independentes(self):
+        """Confirmar ou descartar em um lote não grava nem desfaz as comparações de outro"""
+        snapshot = SnapshotProcessos(self.caminho)
+        primeiro, segundo = snapshot.sessao(), snapshot.sessao()
+        primeiro.comparar('11144477735', [PROCESSO_A])
+        segundo.comparar('52998224725', [PROCESSO_B])
+
+        primeiro.descartar()
+        self.assertEqual(segundo.pendentes, 1)
+        primeiro.comparar('39053344705', [PROCESSO_C])
+        segundo.confirmar()
+        self.assertEqual(snapshot.estatisticas(), {'cpfs': 1, 'processos': 1})
+        self.assertEqual(primeiro.pendentes, 1)
+
+        primeiro.confirmar()
+        self.assertEqual(snapshot.estatisticas(), {'cpfs': 2, 'processos': 2})
+        primeiro.fechar()
+        segundo.fechar()
+
+class TestProcessarConsultasMonitoramento(unittest.TestCase):
+    """Testes para `processar_consultas` com monitor"""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.snapshot = SnapshotProcessos(os.path.join(self.diretorio.name, "monitoramento.db"))
+        self.cpfs = pd.DataFrame({'cpf': ['11144477735', '52998224725', '111.444.777-35', '39053344705'],
+                                  'nome': ['João', 'Maria', 'João', 'Pedro']})
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def comparar(self, cpf, processos):
+        sessao = self.snapshot.sessao()
+        try:
+            return sessao.comparar(cpf, processos)
+        finally:
+            sessao.fechar()
+
+    def executar(self, respostas, exportador=None, **opcoes):
+        consultados = []
+
+        def consulta_falsa(cpf, nome, cliente=None, limitador=None, analise=None):
+            consultados.append(cpf)
+            return dict(respostas[cpf])
+
+        with mock.patch.object(lote, 'consultar_esaj', consulta_falsa):
+            saida = lote.processar_consultas(self.cpfs, exportador=exportador, monitor=self.snapshot,
+                                             em_andamento=ConsultasEmAndamento(), **opcoes)
+        return saida, consultados
+
+    def test_apenas_alteracoes(self):
+        """A segunda execução lista somente os CPFs e processos que mudaram"""
+        self.executar({'11144477735': resultado(PROCESSO_A), '52998224725': resultado(PROCESSO_B),
+                       '39053344705': resultado(PROCESSO_C)})
+
+        (encontrados, nao_encontrados, erros, estatisticas), consultados = self.executar(
+            {'11144477735': resultado(PROCESSO_A, PROCESSO_C), '52998224725': resultado(),
+             '39053344705': resultado(PROCESSO_C)}
+        )
+        self.assertEqual(len(consultados), 3)
+        # Pedro não mudou e fica de fora; Maria deixou de ter processos, mas teve um removido
+        self.assertEqual([(r.cpf, [p.numero for p in r.processos], [p.numero for p in r.removidos])
+                          for r in encontrados],
+                         [('11144477735', [PROCESSO_C['numero']], []),
+                          ('52998224725', [], [PROCESSO_B['numero']]),
+                          ('111.444.777-35', [PROCESSO_C['numero']], [])])
+        self.assertEqual(nao_encontrados, [])
+        self.assertEqual(erros, [])
+        self.assertEqual((estatisticas['processos_novos'], estatisticas['processos_removidos'],
+                          estatisticas['cpfs_alterados']), (1, 1, 2))
+
+    def test_exportador_e_erros(self):
+        """O CSV de alterações traz novos e removidos; erros não alteram o snapshot"""
+        self.executar({'11144477735': resultado(PROCESSO_A, PROCESSO_B), '52998224725': resultado(PROCESSO_C),
+                       '39053344705': resultado()})
+
+        exportador = ExportadorResultados(os.path.join(self.diretorio.name, "lote"), monitoramento=True)
+        with mock.patch.dict(lote.RETENTATIVA_CONFIG, {'max_tentativas': 1}):
+            self.executar({'11144477735': resultado(PROCESSO_B),
+                           '52998224725': {'sucesso': False, 'erro': 'Timeout na consulta', 'timeout': True},
+                           '39053344705': resultado()},
+                          exportador=exportador)
+        exportador.fechar()
+
+        self.assertEqual(set(exportador.caminhos), {'alteracoes', 'erros'})
+        alteracoes = exportador.previa('alteracoes')
+        self.assertEqual(alteracoes['Situacao'].tolist(), ['removido', 'removido'])
+        self.assertEqual(alteracoes['Numero_Processo'].tolist(), [PROCESSO_A['numero']] * 2)
+        self.assertEqual((exportador.contagens['removidos'], exportador.contagens['erros'],
+                          exportador.contagens['nao_encontrados']), (2, 1, 1))
+        self.assertEqual(self.comparar('52998224725', [PROCESSO_C]), ([], []))
+
+    def test_interrupcao_nao_perde_alteracoes(self):
+        """Interromper o lote descarta as comparações pendentes e a retomada reaplica as do diário"""
+        self.executar({'11144477735': resultado(PROCESSO_A), '52998224725': resultado(PROCESSO_B),
+                       '39053344705': resultado()})
+        respostas = {'11144477735': resultado(PROCESSO_C), '52998224725': resultado(PROCESSO_B, PROCESSO_C),
+                     '39053344705': resultado()}
+        concluidos = []
+
+        def interromper(cpf, nome, resultado):
+            concluidos.append(cpf)
+            if len(concluidos) == 2:
+                raise KeyboardInterrupt
+
+        with mock.patch.dict(CHECKPOINT_CONFIG, {'diretorio': self.diretorio.name}):
+            with self.assertRaises(KeyboardInterrupt):
+                self.executar(respostas, id_lote='interrompido', ao_concluir=interromper, workers=1)
+            # Nada da execução interrompida chegou ao snapshot
+            self.assertEqual(self.snapshot.estatisticas(), {'cpfs': 3, 'processos': 2})
+
+            (encontrados, _, _, estatisticas), _ = self.executar(respostas, id_lote='interrompido')
+
+        # Do diário: João com as alterações já calculadas e Maria (consultada,
+        # mas não entregue antes da interrupção), comparada agora
+        self.assertEqual(estatisticas['retomados'], 3)
+        self.assertEqual([(r.cpf, [p.numero for p in r.processos], [p.numero for p in r.removidos])
+                          for r in encontrados],
+                         [('11144477735', [PROCESSO_C['numero']], [PROCESSO_A['numero']]),
+                          ('52998224725', [PROCESSO_C['numero']], []),
+                          ('111.444.777-35', [PROCESSO_C['numero']], [PROCESSO_A['numero']])])
+        self.assertEqual(self.comparar('11144477735', [PROCESSO_C]), ([], []))
+        self.assertEqual(self.comparar('52998224725', [PROCESSO_B, PROCESSO_C]), ([], []))
@@ -0,0 +1,104 @@
+"""
+Testes para o módulo parser_esaj
+"""
+import unittest
+import sys
+import os
+
+# Adicionar os diretórios src e benchmarks ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from extracao_original import extrair_nome_html, extrair_processos_html
+from parser_esaj import ParserEsaj
+
+PROCESSO = """<li>
+  <div id="divProcesso{id}" class="row">
+    <div class="col-md-3">
+      <a href="/cpopg/show.do?processo.codigo={id}" class="linkProcesso">
+        {numero}
+      </a>
+    </div>
+    <div class="classeProcesso">{classe}</div>
+    <div class="dataLocalDistribuicaoProcesso">{data} - Foro Central</div>
+  </div>
+</li>
+"""
+
+PAGINA = """<html><body>
+<div class="unj-base-alt nomeParte">
+    JOSÉ DA CONCEIÇÃO
+</div>
+<h2>3 Processos encontrados</h2>
+<ul>
+{processos}
+<li>
+  <div id="divProcessoSemData" class="row">
+    <a class="linkProcesso">0000001-00.2020.8.26.0053</a>
+    <div class="classeProcesso">Precatório</div>
+  </div>
+</li>
+</ul>
+</body></html>
+"""
+
+class TestParserEsaj(unittest.TestCase):
+    """Testes para o parser de passagem única"""
+
+    def setUp(self):
+        processos = "".join(
+            PROCESSO.format(id=i, numero=f"00{i:05d}-12.2019.8.26.0053", classe="Requisição de Pequeno Valor",
+                            data=f"{i % 28 + 1:02d}/03/2019")
+            for i in range(3)
+        )
+        self.html = PAGINA.format(processos=processos)
+        self.parser = ParserEsaj()
+
+    def test_saida_igual_a_extracao_original(self):
+        """O parser deve produzir a mesma saída das funções originais"""
+        for encoding in ("utf-8", "ISO-8859-1"):
+            resultado = self.parser.analisar(self.html.encode(encoding), encoding)
+            self.assertEqual(resultado["nome_extraido"], extrair_nome_html(self.html))
+            self.assertEqual(resultado["processos"], extrair_processos_html(self.html))
+
+        self.assertEqual(resultado["nome_extraido"], "JOSÉ DA CONCEIÇÃO")
+        self.assertEqual(len(resultado["processos"]), 3)
+
+    def test_pagina_sem_processos(self):
+        """Página de 'não encontrado' não tem marcadores nem processos"""
+        conteudo = "<html><li>Não existem informações disponíveis.</li></html>".encode("utf-8")
+        self.assertFalse(ParserEsaj.tem_processos(conteudo))
+        self.assertEqual(self.parser.analisar(conteudo), {"nome_extraido": "", "processos": []})
+        self.assertTrue(ParserEsaj.tem_processos(self.html.encode("utf-8")))
+
+    def test_decisao_parcial(self):
+        """A decisão sai do início da página; sem a região dos marcadores, fica pendente"""
+        encontrado = self.html.encode("utf-8")
+        corte = encontrado.index(b"Processos encontrados") + len(b"Processos encontrados")
+        self.assertTrue(ParserEsaj.decidir_parcial(encontrado[:corte]))
+        self.assertIsNone(ParserEsaj.decidir_parcial(b'<div id="cabecalho">'))
+        for encoding in ("utf-8", "ISO-8859-1"):
+            nao_encontrado = ('<li>Não existem informações disponíveis '
+                              'para os parâmetros informados.</li>').encode(encoding)
+            self.assertFalse(ParserEsaj.decidir_parcial(nao_encontrado))
+
+    def test_marcadores_conflitantes(self):
+        """Com os dois marcadores no início da página, as duas verificações concluem que não há processos"""
+        primeiro_bloco = ('<div id="cabecalho"><span>0 Processos encontrados</span>'
+                          '<li>Não existem informações disponíveis.</li>'
+                          '<a class="linkProcesso">0000000-00.2020.8.26.0000</a>').encode("utf-8")
+        self.assertIs(ParserEsaj.decidir_parcial(primeiro_bloco), False)
+        self.assertFalse(ParserEsaj.tem_processos(primeiro_bloco))
+
+    def test_paginacao(self):
+        """Detecta total informado, a maior página dos links de paginação e o tamanho da página"""
+        pagina = (PAGINA.format(processos=PROCESSO.format(id="1", numero="0001", classe="Precatório", data="01/01/2020"))
+                  .replace("3 Processos encontrados", "60 Processos encontrados")
+                  + '<a href="/cpopg/trocarPagina.do?paginaConsulta=2&amp;cbPesquisa=DOCPARTE">2</a>'
+                  + '<a href="/cpopg/trocarPagina.do?paginaConsulta=3&amp;cbPesquisa=DOCPARTE">3</a>')
+        # Dois blocos de processo: o do modelo sem data conta no tamanho da página
+        self.assertEqual(ParserEsaj.paginacao(pagina.encode("utf-8")), (60, 3, 2))
+        self.assertEqual(ParserEsaj.paginacao(b"<html>sem lista</html>"), (None, 1, 0))
+
+if __name__ == '__main__':
+    unittest.main()
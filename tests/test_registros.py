@@ -0,0 +1,69 @@
+"""
+Testes para o módulo registros
+"""
+import unittest
+import sys
+import os
+import pandas as pd
+from unittest import mock
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import lote
+from lote import processar_consultas
+from registros import ConsultaResultado, Processo, colunas_encontrados, converter_processos
+from utils import reformatar_dados_para_csv
+
+PROCESSOS = [
+    {'numero': '0001234-56.2020.8.26.0100', 'classe': 'Precatório', 'data': '01/02/2020'},
+    {'numero': '0006543-21.2021.8.26.0100', 'classe': 'Requisição', 'data': '03/04/2021'}
+]
+
+class TestRegistros(unittest.TestCase):
+    """Testes para os registros compactos de resultado"""
+
+    def test_acesso_como_dicionario(self):
+        """Os registros aceitam o acesso por chave usado pelo código existente"""
+        resultado = ConsultaResultado('11144477735', 'João', '01/01/2025 10:00:00', nome_extraido='JOAO',
+                                      processos=converter_processos(PROCESSOS))
+        self.assertEqual(resultado['cpf'], '11144477735')
+        self.assertEqual(resultado['total_processos'], 2)
+        self.assertEqual(resultado.get('total_processos'), 2)
+        self.assertEqual(resultado['processos'][0]['numero'], PROCESSOS[0]['numero'])
+        self.assertIsNone(resultado.get('inexistente'))
+        with self.assertRaises(KeyError):
+            resultado['inexistente']
+        self.assertEqual(Processo.de_dict(PROCESSOS[1]).como_dict(), PROCESSOS[1])
+        self.assertFalse(hasattr(resultado, '__dict__'))
+
+    def test_colunas_iguais_ao_formato_por_linha(self):
+        """As colunas montadas diretamente reproduzem uma linha por processo"""
+        resultados = [
+            {'cpf': '11144477735', 'nome': 'João', 'nome_extraido': 'JOAO', 'processos': PROCESSOS,
+             'data_consulta': '01/01/2025 10:00:00'},
+            ConsultaResultado('52998224725', 'Maria', '01/01/2025 10:00:01', nome_extraido='MARIA')
+        ]
+        df = reformatar_dados_para_csv(resultados)
+        self.assertEqual(df['CPF'].tolist(), ['11144477735', '11144477735', '52998224725'])
+        self.assertEqual(df['Sequencia_Processo'].tolist(), [1, 2, 0])
+        self.assertEqual(df['Numero_Processo'].tolist()[2], '')
+        self.assertEqual(list(df.columns), list(colunas_encontrados([]).keys()))
+
+    def test_processar_consultas_retorna_registros(self):
+        """Linhas do mesmo CPF compartilham a tupla de processos e não guardam HTML"""
+        def consulta_falsa(cpf, nome, cliente=None, limitador=None, analise=None):
+            return {'sucesso': True, 'encontrado': True, 'nome_extraido': 'JOAO', 'processos': PROCESSOS,
+                    'total_processos': 2, 'html': '<html>'}
+
+        cpfs = pd.DataFrame({'cpf': ['11144477735', '111.444.777-35'], 'nome': ['A', 'B']})
+        with mock.patch.object(lote, 'consultar_esaj', consulta_falsa):
+            encontrados, _, _, _ = processar_consultas(cpfs)
+
+        self.assertTrue(all(isinstance(r, ConsultaResultado) for r in encontrados))
+        self.assertIs(encontrados[0].processos, encontrados[1].processos)
+        self.assertIsInstance(encontrados[0].processos[0], Processo)
+        self.assertNotIn('html', ConsultaResultado.__slots__)
+
+if __name__ == '__main__':
+    unittest.main()
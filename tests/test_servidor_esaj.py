@@ -0,0 +1,72 @@
+"""
+Testes para o e-SAJ falso usado nos benchmarks
+"""
+import unittest
+import sys
+import os
+import random
+from unittest import mock
+
+# Adicionar os diretórios src e benchmarks ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from cliente import EsajClient
+from config import ESAJ_CONFIG
+from servidor_esaj import POR_PAGINA, ServidorEsajFalso, criar_latencia
+from utils import consultar_esaj
+
+class TestServidorEsajFalso(unittest.TestCase):
+    """Testes do servidor local contra `consultar_esaj`"""
+
+    def consultar(self, servidor, cpfs):
+        cliente = EsajClient(pool_size=2, timeout=5)
+        try:
+            with mock.patch.dict(ESAJ_CONFIG, {"base_url": servidor.url_base,
+                                               "url_paginacao": servidor.url_paginacao}):
+                return [consultar_esaj(cpf, "Teste", cliente) for cpf in cpfs]
+        finally:
+            cliente.fechar()
+
+    def test_criar_latencia(self):
+        """Especificações válidas sorteiam valores não negativos; inválidas são rejeitadas"""
+        rng = random.Random(0)
+        self.assertEqual(criar_latencia("fixa:0.2")(rng), 0.2)
+        for especificacao in ("uniforme:0.1:0.2", "normal:0.01:1", "lognormal:0.05:0.5", "exponencial:0.1"):
+            self.assertGreaterEqual(min(criar_latencia(especificacao)(rng) for _ in range(100)), 0)
+        for invalida in ("gama:1", "fixa", "normal:a:b"):
+            with self.assertRaises(ValueError):
+                criar_latencia(invalida)
+
+    def test_desfechos_por_cpf(self):
+        """Encontrados, não encontrados e paginados batem com o desfecho sorteado pelo CPF"""
+        cpfs = [f"{i:011d}" for i in range(40)]
+        with ServidorEsajFalso(encontrados=0.5, paginados=0.3, tamanho_enfeite=0) as servidor:
+            resultados = self.consultar(servidor, cpfs)
+            estatisticas = servidor.estatisticas()
+
+        paginados = 0
+        for cpf, resultado in zip(cpfs, resultados):
+            total, por_pagina = servidor.desfecho(cpf)
+            self.assertTrue(resultado['sucesso'])
+            self.assertNotIn('html', resultado)
+            self.assertEqual(resultado['total_processos'], total)
+            self.assertEqual(len(resultado['processos']), total)
+            if por_pagina:
+                paginados += 1
+                self.assertEqual(resultado['paginas'], -(-total // POR_PAGINA))
+        self.assertGreater(paginados, 0)
+        self.assertEqual(estatisticas['requisicoes'], len(cpfs) + estatisticas['paginas'])
+
+    def test_erros_transitorios(self):
+        """429 e 500 são devolvidos como falha com o status da resposta"""
+        with ServidorEsajFalso(erros_429=0.5, erros_500=0.5, tamanho_enfeite=0) as servidor:
+            resultados = self.consultar(servidor, [f"{i:011d}" for i in range(20)])
+            estatisticas = servidor.estatisticas()
+
+        self.assertTrue(all(not r['sucesso'] for r in resultados))
+        self.assertEqual({r['status_code'] for r in resultados}, {429, 500})
+        self.assertEqual(estatisticas.get('status_429', 0) + estatisticas.get('status_500', 0), 20)
+
+if __name__ == '__main__':
+    unittest.main()
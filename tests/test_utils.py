@@ -4,11 +4,26 @@ Testes para o módulo utils
 import unittest
 import sys
 import os
+import tempfile
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
 # Adicionar o diretório src ao path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
 
-from utils import normalizar_cpf, validar_cpf
+import pandas as pd
+
+import utils
+from utils import formatar_duracao, normalizar_cpf, validar_cpf, validar_cpfs_vetorizado, LeitorCsvEmBlocos
+from analise import analisar_pagina
+from cliente import EsajClient
+from concorrencia import LimitadorTaxa
+from config import ESAJ_CONFIG
+from paginas_esaj import gerar_pagina
 
 class TestUtils(unittest.TestCase):
     """Testes para funções utilitárias"""
@@ -43,6 +58,190 @@ class TestUtils(unittest.TestCase):
         
         # CPF com menos de 11 dígitos (deve ser normalizado primeiro)
         self.assertFalse(validar_cpf("123456789"))
+    
+    def test_validar_cpfs_vetorizado(self):
+        """Testa se a validação vetorizada equivale às funções escalares"""
+        cpfs = pd.Series([
+            "11144477735", "111.444.777-35", "11111111111", "12345678901",
+            "123456789", "1234567890", "123456789012", "52998224725",
+            "", None, "abc", "39053344705", "٣9053344705", "00000000191"
+        ], dtype=object)
+        
+        resultado = validar_cpfs_vetorizado(cpfs)
+        
+        for i, cpf in cpfs.items():
+            tamanho_ok = 9 <= len(''.join(c for c in str(cpf) if c.isdigit())) <= 11
+            self.assertEqual(resultado.loc[i, "cpf_normalizado"], normalizar_cpf(cpf))
+            self.assertEqual(bool(resultado.loc[i, "cpf_tamanho_ok"]), tamanho_ok)
+            self.assertEqual(bool(resultado.loc[i, "cpf_valido"]), tamanho_ok and validar_cpf(cpf))
+    
+    def test_leitor_csv_em_blocos(self):
+        """Testa a leitura em blocos com CPFs inválidos gravados em disco"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            entrada = os.path.join(diretorio, "entrada.csv")
+            invalidos = os.path.join(diretorio, "invalidos.csv")
+            with open(entrada, "w", encoding="utf-8") as f:
+                f.write("Nome,CPF\n")
+                for i in range(25):
+                    f.write(f"Pessoa {i},{'111.444.777-35' if i % 5 else '12345678901'}\n")
+            
+            leitor = LeitorCsvEmBlocos(entrada, tamanho_bloco=10, caminho_invalidos=invalidos)
+            blocos = list(leitor)
+            
+            self.assertEqual(leitor.estimar_total(), 25)
+            self.assertEqual([len(b) for b in blocos], [8, 8, 4])
+            self.assertTrue(all(b["cpf_valido"].all() for b in blocos))
+            self.assertEqual(blocos[0]["cpf_normalizado"].iloc[0], "11144477735")
+            self.assertEqual((leitor.total_validos, leitor.total_invalidos), (20, 5))
+            self.assertEqual(len(pd.read_csv(invalidos, dtype={"cpf": str})), 5)
+            
+            # Arquivo indicado pelo chamador: não é apagado pelo leitor
+            leitor.remover_invalidos()
+            self.assertTrue(os.path.exists(invalidos))
+            
+            temporario = LeitorCsvEmBlocos(entrada, tamanho_bloco=10)
+            list(temporario)
+            caminho_temporario = temporario.caminho_invalidos
+            self.assertTrue(os.path.exists(caminho_temporario))
+            temporario.remover_invalidos()
+            self.assertFalse(os.path.exists(caminho_temporario))
+    
+    def test_configurar_logging_uma_vez(self):
+        """Testa se o logging é configurado uma única vez e grava fora da thread chamadora"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo_log = os.path.join(diretorio, "consulta.log")
+            with mock.patch.dict(utils.LOG_CONFIG, {"log_file": arquivo_log, "log_level": "INFO"}):
+                utils.encerrar_logging()
+                raiz = logging.getLogger()
+                handlers_antes = len(raiz.handlers)
+                
+                logger = utils.configurar_logging()
+                utils.configurar_logging()
+                self.assertEqual(len(raiz.handlers), handlers_antes + 1)
+                
+                logger.info("linha de resumo")
+                logger.debug("detalhe de processo")
+                utils.encerrar_logging()
+                self.assertEqual(len(raiz.handlers), handlers_antes)
+            
+            with open(arquivo_log, encoding="utf-8") as f:
+                conteudo = f.read()
+            self.assertIn("linha de resumo", conteudo)
+            self.assertNotIn("detalhe de processo", conteudo)
+
+    def test_formatar_duracao(self):
+        """Teste de formatação de tempo decorrido e restante"""
+        self.assertEqual(formatar_duracao(None), "-")
+        self.assertEqual(formatar_duracao(45.4), "45s")
+        self.assertEqual(formatar_duracao(200), "3min 20s")
+        self.assertEqual(formatar_duracao(3900), "1h 05min")
+
+class _HandlerPaginado(BaseHTTPRequestHandler):
+    """Lista de 60 processos em páginas de 25 (search.do = página 1)"""
+    protocol_version = "HTTP/1.1"
+    paginas_pedidas = []
+    # Processos da primeira página sem classe (não extraídos pelo parser)
+    incompletos_primeira = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        pagina = int(parse_qs(url.query).get("paginaConsulta", ["1"])[0])
+        type(self).paginas_pedidas.append(pagina)
+        corpo = gerar_pagina(60, por_pagina=25, pagina=pagina, tamanho_enfeite=0).encode("utf-8")
+        if pagina == 1:
+            corpo = corpo.replace(b'class="classeProcesso"', b'class="outra"', type(self).incompletos_primeira)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+class TestConsultaPaginada(unittest.TestCase):
+    """Testes para a busca das demais páginas da lista de processos"""
+
+    def consultar(self, incompletos_primeira=0):
+        _HandlerPaginado.paginas_pedidas = []
+        _HandlerPaginado.incompletos_primeira = incompletos_primeira
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), _HandlerPaginado)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{servidor.server_address[1]}/cpopg"
+        cliente = EsajClient(pool_size=4, timeout=5)
+        try:
+            with mock.patch.dict(ESAJ_CONFIG, {"base_url": f"{base}/search.do",
+                                               "url_paginacao": f"{base}/trocarPagina.do"}):
+                resultado = utils.consultar_esaj("11144477735", "Fulano", cliente, limitador=LimitadorTaxa(200))
+        finally:
+            cliente.fechar()
+            servidor.shutdown()
+            servidor.server_close()
+        return resultado
+
+    def test_todas_as_paginas(self):
+        """Os processos de todas as páginas são reunidos e as páginas contadas"""
+        resultado = self.consultar()
+        esperado = analisar_pagina(gerar_pagina(60, tamanho_enfeite=0).encode("utf-8"), "utf-8")["processos"]
+        self.assertTrue(resultado["sucesso"])
+        self.assertEqual(resultado["paginas"], 3)
+        self.assertEqual(resultado["total_processos"], 60)
+        self.assertEqual(resultado["processos"], esperado)
+        self.assertEqual(sorted(_HandlerPaginado.paginas_pedidas), [1, 2, 3])
+
+    def test_processos_nao_extraidos_nao_aumentam_paginas(self):
+        """O tamanho da página vem dos blocos de processo, não dos processos extraídos"""
+        resultado = self.consultar(incompletos_primeira=10)
+
+        # 60 / 15 extraídos sugeriria 4 páginas; a página tem 25 blocos
+        self.assertEqual(resultado["paginas"], 3)
+        self.assertEqual(resultado["total_processos"], 50)
+        self.assertEqual(sorted(_HandlerPaginado.paginas_pedidas), [1, 2, 3])
+
+class _HandlerMarcadoresConflitantes(BaseHTTPRequestHandler):
+    """Página com "Processos encontrados" e "não existem informações" no primeiro bloco"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        corpo = ('<html><span>0 Processos encontrados</span>'
+                 '<li>Não existem informações disponíveis.</li>'
+                 + '<!-- enfeite -->' * 5000 + '</html>').encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+class TestMarcadoresConflitantes(unittest.TestCase):
+    """A decisão da leitura parcial é a mesma da página lida inteira"""
+
+    def consultar(self, leitura_parcial):
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), _HandlerMarcadoresConflitantes)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        cliente = EsajClient(pool_size=1, timeout=5)
+        try:
+            with mock.patch.dict(ESAJ_CONFIG, {"base_url": f"http://127.0.0.1:{servidor.server_address[1]}/cpopg/search.do",
+                                               "leitura_parcial": leitura_parcial}):
+                resultado = utils.consultar_esaj("11144477735", "Fulano", cliente, limitador=LimitadorTaxa(200))
+        finally:
+            cliente.fechar()
+            servidor.shutdown()
+            servidor.server_close()
+        return resultado
+
+    def test_nao_encontrado_com_e_sem_leitura_parcial(self):
+        """A leitura interrompida não é reavaliada e dá o mesmo resultado da leitura completa"""
+        parcial = self.consultar(leitura_parcial=True)
+        completa = self.consultar(leitura_parcial=False)
+
+        self.assertGreater(parcial["bytes_evitados"], 0)
+        for resultado in (parcial, completa):
+            self.assertTrue(resultado["sucesso"])
+            self.assertFalse(resultado["encontrado"])
+            self.assertEqual(resultado["total_processos"], 0)
 
 if __name__ == '__main__':
     unittest.main()